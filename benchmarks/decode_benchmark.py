@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# /benchmarks/decode_benchmark.py
+# Stanislav Lazarov
+
+# Micro-benchmark of the message decoding path.
+
+# Overview:
+# ---------
+# 1) Builds `uE` and `uS` payloads shaped like the ones recorded from Bittrex
+#    (minified keys, raw deflate, base64).
+# 2) Times the legacy decoding routine against `Decoder` with every installed JSON backend.
+# 3) Prints microseconds per message, so regressions are easy to spot.
+#
+# Usage: python benchmarks/decode_benchmark.py [iterations]
+
+from __future__ import print_function
+
+import json
+import random
+import sys
+from base64 import b64decode, b64encode
+from timeit import timeit
+from zlib import compressobj, decompress, DEFLATED, MAX_WBITS
+
+from bittrex_websocket._decoder import Decoder, available_json_backends
+
+
+def compress(obj):
+    deflater = compressobj(9, DEFLATED, -MAX_WBITS)
+    data = deflater.compress(json.dumps(obj, separators=(',', ':')).encode()) + deflater.flush()
+    return b64encode(data).decode()
+
+
+def exchange_delta(rng, nonce):
+    def levels(count):
+        return [{'TY': rng.randint(0, 2), 'R': round(rng.uniform(0.01, 0.02), 8),
+                 'Q': round(rng.uniform(0, 100), 8)} for _ in range(count)]
+
+    fills = [{'OT': rng.choice(['BUY', 'SELL']), 'R': round(rng.uniform(0.01, 0.02), 8),
+              'Q': round(rng.uniform(0, 10), 8), 'T': 1530000000000 + nonce} for _ in range(rng.randint(0, 3))]
+    return {'M': 'BTC-ETH', 'N': nonce, 'Z': levels(rng.randint(1, 6)), 'S': levels(rng.randint(1, 6)), 'f': fills}
+
+
+def summary_delta(rng, nonce, markets=300):
+    rows = []
+    for i in range(markets):
+        last = rng.uniform(0.0001, 0.1)
+        rows.append({'M': 'BTC-M{:03d}'.format(i), 'H': last * 1.1, 'L': last * 0.9, 'V': rng.uniform(0, 1e6),
+                     'l': last, 'm': rng.uniform(0, 500), 'T': 1530000000000, 'B': last * 0.999,
+                     'A': last * 1.001, 'G': rng.randint(0, 2000), 'g': rng.randint(0, 2000),
+                     'PD': last * 0.95, 'x': 1500000000000})
+    return {'N': nonce, 'D': rows}
+
+
+def legacy_process_message(message):
+    # Decoding routine used before `Decoder` was introduced.
+    try:
+        deflated_msg = decompress(b64decode(message, validate=True), -MAX_WBITS)
+    except SyntaxError:
+        deflated_msg = decompress(b64decode(message, validate=True))
+    return json.loads(deflated_msg.decode())
+
+
+def run(name, func, payloads, iterations):
+    seconds = timeit(lambda: [func(payload) for payload in payloads], number=iterations)
+    print('{:<28} {:>10.2f} us/msg'.format(name, seconds / (iterations * len(payloads)) * 1e6))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(42)
+    samples = {
+        'uE': [compress(exchange_delta(rng, nonce)) for nonce in range(100)],
+        'uS': [compress(summary_delta(rng, nonce)) for nonce in range(5)],
+    }
+    for channel, payloads in samples.items():
+        print('[{}] {} payloads, {} iterations'.format(channel, len(payloads), iterations))
+        run('legacy process_message', legacy_process_message, payloads, iterations)
+        for backend in available_json_backends():
+            run('Decoder({})'.format(backend), Decoder(backend).decode, payloads, iterations)
+        print()
+
+
+if __name__ == "__main__":
+    main()
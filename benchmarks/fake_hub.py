@@ -0,0 +1,252 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# /benchmarks/fake_hub.py
+# Stanislav Lazarov
+
+# Local stand-in for the Bittrex SignalR hub.
+
+# Overview:
+# ---------
+# 1) Answers `negotiate` over plain HTTP and accepts the `connect` websocket on the same port.
+# 2) Acknowledges subscriptions and answers `QueryExchangeState`/`QuerySummaryState` and the
+#    authentication invokes with synthetic data.
+# 3) Broadcasts synthetic `uE` deltas for the subscribed markets at a fixed rate, and `uS`
+#    deltas for every market at a fixed interval, with consecutive nonces.
+#
+# Every broadcast payload carries its send time under 'TS' (epoch seconds) so that clients can
+# measure the end-to-end latency. Point a client at it with:
+#
+#     BittrexSocket(url='http://127.0.0.1:8765/signalr')
+#
+# Usage: python benchmarks/fake_hub.py [--port 8765] [--rate 1000] [--levels 5] ...
+
+from __future__ import print_function
+
+import argparse
+import asyncio
+import json
+import random
+from base64 import b64encode
+from time import time
+from uuid import uuid4
+from zlib import compressobj, DEFLATED, MAX_WBITS
+
+try:
+    # websockets >= 10 moved the API signalr_aio was written against.
+    from websockets.legacy.server import serve
+except ImportError:
+    from websockets import serve
+from websockets.exceptions import ConnectionClosed
+
+from bittrex_websocket.constants import BittrexMethods, BittrexParameters
+
+# Seconds between two broadcast rounds, messages due in between are sent together.
+TICK = 0.005
+
+
+def compress(obj):
+    deflater = compressobj(6, DEFLATED, -MAX_WBITS)
+    data = deflater.compress(json.dumps(obj, separators=(',', ':')).encode()) + deflater.flush()
+    return b64encode(data).decode()
+
+
+class SyntheticMarket(object):
+    """
+    Random walk of a single market's book, producing snapshots and consecutive deltas.
+    """
+
+    def __init__(self, name, rng, levels=5, fills=1):
+        self.name = name
+        self.rng = rng
+        self.levels = levels
+        self.fills = fills
+        self.nonce = 0
+        self.price = rng.uniform(0.001, 0.1)
+
+    def _rate(self, side):
+        offset = self.rng.randint(1, 50) * self.price * 0.0005
+        return round(self.price - offset if side == 'Z' else self.price + offset, 8)
+
+    def _levels(self, side, count):
+        return [{'TY': self.rng.randint(0, 2), 'R': self._rate(side), 'Q': round(self.rng.uniform(0, 100), 8)}
+                for _ in range(count)]
+
+    def snapshot(self):
+        return {'M': None, 'N': self.nonce,
+                'Z': [{'R': self._rate('Z'), 'Q': round(self.rng.uniform(0, 100), 8)} for _ in range(50)],
+                'S': [{'R': self._rate('S'), 'Q': round(self.rng.uniform(0, 100), 8)} for _ in range(50)],
+                'f': []}
+
+    def delta(self):
+        self.nonce += 1
+        self.price *= 1 + self.rng.uniform(-0.0005, 0.0005)
+        fills = [{'OT': self.rng.choice(['BUY', 'SELL']), 'R': round(self.price, 8),
+                  'Q': round(self.rng.uniform(0, 10), 8), 'T': int(time() * 1000)}
+                 for _ in range(self.rng.randint(0, self.fills))]
+        return {'M': self.name, 'N': self.nonce, 'Z': self._levels('Z', self.levels),
+                'S': self._levels('S', self.levels), 'f': fills, 'TS': time()}
+
+    def summary(self):
+        price = self.price
+        return {'M': self.name, 'H': price * 1.1, 'L': price * 0.9, 'V': self.rng.uniform(0, 1e6), 'l': price,
+                'm': self.rng.uniform(0, 500), 'T': int(time() * 1000), 'B': price * 0.999, 'A': price * 1.001,
+                'G': self.rng.randint(0, 2000), 'g': self.rng.randint(0, 2000), 'PD': price * 0.95,
+                'x': 1500000000000}
+
+
+class FakeHub(object):
+    """
+    Minimal SignalR 1.5 server speaking the subset of the protocol `signalr_aio` uses.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, rate=1000.0, levels=5, fills=1, markets=300,
+                 summary_interval=1.0, seed=42):
+        """
+        :param rate: `uE` messages per second per connection, spread over the subscribed markets.
+        :type rate: float
+        :param levels: Order book changes per side in each `uE` message.
+        :type levels: int
+        :param fills: Maximum fills in each `uE` message.
+        :type fills: int
+        :param markets: Markets listed in summaries.
+        :type markets: int
+        :param summary_interval: Seconds between `uS` messages.
+        :type summary_interval: float
+        """
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.levels = levels
+        self.fills = fills
+        self.summary_interval = summary_interval
+        rng = random.Random(seed)
+        self.markets = {}
+        for i in range(markets):
+            name = 'BTC-M{:03d}'.format(i)
+            self.markets[name] = SyntheticMarket(name, rng, levels, fills)
+        self.summary_nonce = 0
+        self.sent = 0
+
+    # ========
+    # Protocol
+    # ========
+
+    def _negotiate(self, path, request_headers):
+        if '/negotiate' not in path:
+            return None
+        body = json.dumps({'Url': '/signalr', 'ConnectionToken': uuid4().hex, 'ConnectionId': str(uuid4()),
+                           'KeepAliveTimeout': 20.0, 'DisconnectTimeout': 30.0, 'ConnectionTimeout': 110.0,
+                           'TryWebSockets': True, 'ProtocolVersion': '1.5', 'TransportConnectTimeout': 5.0,
+                           'LongPollDelay': 0.0})
+        return 200, [('Content-Type', 'application/json')], body.encode()
+
+    async def _handler(self, ws, path=None):
+        session = {'markets': [], 'summaries': False, 'cursor': 0}
+        await ws.send(json.dumps({'C': 'd-0,0', 'S': 1, 'M': []}))
+        broadcaster = asyncio.ensure_future(self._broadcast(ws, session))
+        try:
+            async for message in ws:
+                await self._on_invoke(ws, session, json.loads(message))
+        except ConnectionClosed:
+            pass
+        finally:
+            broadcaster.cancel()
+
+    def _get_market(self, ticker):
+        if ticker not in self.markets:
+            self.markets[ticker] = SyntheticMarket(ticker, random.Random(ticker), self.levels, self.fills)
+        return self.markets[ticker]
+
+    async def _on_invoke(self, ws, session, invoke):
+        method, args = invoke['M'], invoke.get('A', [])
+        if method == BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS:
+            self._get_market(args[0])
+            session['markets'].append(args[0])
+            response = {'R': True}
+        elif method in (BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS, BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS):
+            session['summaries'] = True
+            response = {'R': True}
+        elif method == BittrexMethods.QUERY_EXCHANGE_STATE:
+            response = {'R': compress(self._get_market(args[0]).snapshot())}
+        elif method == BittrexMethods.QUERY_SUMMARY_STATE:
+            rows = [market.summary() for market in self.markets.values()]
+            response = {'R': compress({'N': self.summary_nonce, 's': rows})}
+        elif method == BittrexMethods.GET_AUTH_CONTENT:
+            response = {'R': uuid4().hex}
+        elif method == BittrexMethods.AUTHENTICATE:
+            response = {'R': True}
+        else:
+            response = {'E': "'{}' method could not be resolved.".format(method)}
+        response['I'] = str(invoke['I'])
+        await ws.send(json.dumps(response))
+
+    async def _send(self, ws, session, callback, payload):
+        session['cursor'] += 1
+        frame = {'C': 'd-{}'.format(session['cursor']), 'M': [{'H': 'C2', 'M': callback, 'A': [payload]}]}
+        await ws.send(json.dumps(frame))
+        self.sent += 1
+
+    async def _broadcast(self, ws, session):
+        due = 0.0
+        last = time()
+        next_summary = last + self.summary_interval
+        position = 0
+        while True:
+            await asyncio.sleep(TICK)
+            now = time()
+            markets = session['markets']
+            if markets:
+                due += self.rate * (now - last)
+                while due >= 1:
+                    market = self.markets[markets[position % len(markets)]]
+                    position += 1
+                    due -= 1
+                    await self._send(ws, session, BittrexParameters.MARKET_DELTA, compress(market.delta()))
+            last = now
+            if session['summaries'] and now >= next_summary:
+                next_summary += self.summary_interval
+                self.summary_nonce += 1
+                rows = [market.summary() for market in self.markets.values()]
+                await self._send(ws, session, BittrexParameters.SUMMARY_DELTA,
+                                 compress({'N': self.summary_nonce, 'D': rows, 'TS': time()}))
+
+    # =======
+    # Running
+    # =======
+
+    @property
+    def url(self):
+        return 'http://{}:{}/signalr'.format(self.host, self.port)
+
+    async def start(self):
+        return await serve(self._handler, self.host, self.port, process_request=self._negotiate,
+                           max_size=None, compression=None)
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.start())
+        print('Fake hub listening on {}'.format(self.url))
+        loop.run_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local stand-in for the Bittrex SignalR hub.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=1000.0, help='uE messages per second per connection')
+    parser.add_argument('--levels', type=int, default=5, help='book changes per side in each uE message')
+    parser.add_argument('--fills', type=int, default=1, help='maximum fills in each uE message')
+    parser.add_argument('--markets', type=int, default=300, help='markets listed in summaries')
+    parser.add_argument('--summary-interval', type=float, default=1.0, help='seconds between uS messages')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    FakeHub(args.host, args.port, args.rate, args.levels, args.fills, args.markets, args.summary_interval).run()
+
+
+if __name__ == "__main__":
+    main()
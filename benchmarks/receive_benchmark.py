@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# /benchmarks/receive_benchmark.py
+# Stanislav Lazarov
+
+# End-to-end benchmark of the receive path against the local fake hub.
+
+# Overview:
+# ---------
+# 1) Starts `fake_hub.FakeHub` in a child process, broadcasting `uE` deltas at --rate.
+# 2) Points a `BittrexSocket` at it and subscribes to --markets markets, optionally keeping
+#    local order books, typed messages or a decode pool.
+# 3) After --warmup seconds, measures for --duration seconds:
+#    - messages/sec delivered to `on_public`,
+#    - latency percentiles from the hub's send time to `on_public`,
+#    - memory: peak RSS and, with --tracemalloc, the peak of Python allocations.
+#
+# Raise --rate until the delivered rate stops following it to find the saturation point.
+#
+# Usage: python benchmarks/receive_benchmark.py [--rate 2000] [--markets 50] [--order-books] ...
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import resource
+import tracemalloc
+from time import sleep, time
+
+from fake_hub import FakeHub
+
+from bittrex_websocket import BittrexSocket
+
+
+class ProbeSocket(BittrexSocket):
+    def __init__(self, *args, **kwargs):
+        self.measuring = False
+        self.count = 0
+        self.latencies = []
+        super().__init__(*args, **kwargs)
+
+    async def on_public(self, msg):
+        if self.measuring:
+            self.count += 1
+            sent = msg.get('TS') if type(msg) is dict else None
+            if sent is not None:
+                self.latencies.append(time() - sent)
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_hub(port, rate, levels):
+    FakeHub(port=port, rate=rate, levels=levels).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end receive path benchmark.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=2000.0, help='uE messages per second sent by the hub')
+    parser.add_argument('--levels', type=int, default=5, help='book changes per side in each uE message')
+    parser.add_argument('--markets', type=int, default=50)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--json-backend', default=None)
+    parser.add_argument('--order-books', action='store_true', help='keep local order books')
+    parser.add_argument('--typed', action='store_true', help='deliver typed messages')
+    parser.add_argument('--decode-pool', type=int, default=0, help='decode pool workers, 0 to decode inline')
+    parser.add_argument('--tracemalloc', action='store_true', help='trace Python allocations (slower)')
+    args = parser.parse_args()
+
+    hub = multiprocessing.Process(target=run_hub, args=(args.port, args.rate, args.levels), daemon=True)
+    hub.start()
+    sleep(1)
+
+    ws = ProbeSocket(url='http://127.0.0.1:{}/signalr'.format(args.port), json_backend=args.json_backend)
+    if args.typed:
+        ws.enable_typed_messages()
+    if args.decode_pool:
+        ws.enable_decode_pool(args.decode_pool)
+    tickers = ['BTC-M{:03d}'.format(i) for i in range(args.markets)]
+    if args.order_books:
+        ws.subscribe_to_order_book(tickers)
+    else:
+        ws.subscribe_to_exchange_deltas(tickers)
+    sleep(args.warmup)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ws.measuring = True
+    start = time()
+    sleep(args.duration)
+    ws.measuring = False
+    elapsed = time() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    latencies = sorted(ws.latencies)
+    print('Sent rate         {:>10.0f} msg/s'.format(args.rate))
+    print('Delivered rate    {:>10.0f} msg/s'.format(ws.count / elapsed))
+    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p99.9', 0.999)):
+        print('Latency {:<9} {:>10.3f} ms'.format(name, percentile(latencies, fraction) * 1e3))
+    print('Latency max       {:>10.3f} ms'.format((latencies[-1] if latencies else float('nan')) * 1e3))
+    print('Peak RSS          {:>10.1f} MB (+{:.1f} MB while measuring)'.format(
+        rss_after / 1024.0, (rss_after - rss_before) / 1024.0))
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        print('Python heap       {:>10.1f} MB (peak {:.1f} MB)'.format(current / 2 ** 20, peak / 2 ** 20))
+        tracemalloc.stop()
+
+    ws.disconnect()
+    hub.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# /benchmarks/selective_decode_benchmark.py
+# Stanislav Lazarov
+
+# Micro-benchmark of selective summary decoding.
+
+# Overview:
+# ---------
+# 1) Builds `uS` payloads with 300 markets, shaped like the ones sent by Bittrex.
+# 2) Times the legacy decoding routine and `Decoder.decode` against `SummaryFilter.decode`
+#    with whitelists of increasing size, for every installed JSON backend.
+# 3) Prints microseconds per message.
+#
+# Usage: python benchmarks/selective_decode_benchmark.py [iterations]
+
+from __future__ import print_function
+
+import random
+import sys
+
+from decode_benchmark import compress, summary_delta, legacy_process_message, run
+
+from bittrex_websocket._decoder import Decoder, available_json_backends
+from bittrex_websocket._selective import SummaryFilter
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(42)
+    payloads = [compress(summary_delta(rng, nonce)) for nonce in range(5)]
+    markets = ['BTC-M{:03d}'.format(i) for i in range(300)]
+    whitelists = [rng.sample(markets, count) for count in (1, 20, 100, 300)]
+    print('[uS] {} payloads of {} rows, {} iterations'.format(len(payloads), len(markets), iterations))
+    run('legacy process_message', legacy_process_message, payloads, iterations)
+    for backend in available_json_backends():
+        decoder = Decoder(backend)
+        print()
+        run('Decoder({}).decode'.format(backend), decoder.decode, payloads, iterations)
+        for whitelist in whitelists:
+            summary_filter = SummaryFilter(whitelist)
+            run('SummaryFilter({} markets)'.format(len(whitelist)),
+                lambda payload: summary_filter.decode(decoder, payload), payloads, iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,15 @@
 from bittrex_websocket import _logger
 from bittrex_websocket.websocket_client import BittrexSocket
-from bittrex_websocket.constants import BittrexMethods
+from bittrex_websocket.constants import BittrexMethods, JsonBackends, DeliveryPolicies, FanoutEncodings
+from bittrex_websocket.order_book import OrderBook
+from bittrex_websocket.messages import MarketDelta, OrderLevel, Fill, Summaries, SummaryDelta, BalanceDelta, \
+    OrderDelta, Bar
+from bittrex_websocket.summary_table import SummaryTable
+from bittrex_websocket.async_client import AsyncBittrexSocket
+from bittrex_websocket.sharded_client import ShardedBittrexSocket
+from bittrex_websocket.recorder import Recorder, Replayer
+from bittrex_websocket.account import AccountState
+from bittrex_websocket.bars import FillAggregator
+from bittrex_websocket.shared_memory import SharedBookPublisher, SharedBookReader
+from bittrex_websocket.fanout import FanoutServer
+from bittrex_websocket.book_store import BookStore
@@ -184,7 +184,7 @@ class WebSocket(ABC):
         """
 
     @abstractmethod
-    def authenticate(self, api_key, api_secret):
+    def authenticate(self, api_key, api_secret, timeout=10.0):
         """
         Verifies a user’s identity to the server and begins receiving account-level notifications
 
@@ -192,6 +192,8 @@ class WebSocket(ABC):
         :type api_key: str
         :param api_secret: Your api_secret with the relevant permissions.
         :type api_secret: str
+        :param timeout: Seconds to wait for the server to accept the authentication.
+        :type timeout: float
 
         https://github.com/slazarov/beta#authenticate
         """
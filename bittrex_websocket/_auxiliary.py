@@ -4,36 +4,46 @@
 # bittrex_websocket/_auxiliary.py
 # Stanislav Lazarov
 
+import asyncio
 import logging
 from uuid import uuid4
 import hashlib
 import hmac
 
-try:
-    from pybase64 import b64decode, b64encode
-except:
-    from base64 import b64decode, b64encode
-from zlib import decompress, MAX_WBITS
+from signalr_aio.transports._parameters import WebSocketParameters
 
-try:
-    from ujson import loads
-except:
-    from json import loads
+from ._decoder import Decoder
 
 logger = logging.getLogger(__name__)
 
+_decoder = Decoder()
 
-async def process_message(message):
-    try:
-        deflated_msg = decompress(b64decode(message, validate=True), -MAX_WBITS)
-    except SyntaxError:
-        deflated_msg = decompress(b64decode(message, validate=True))
-    return loads(deflated_msg.decode())
 
+def process_message(message):
+    return _decoder.decode(message)
 
-async def create_signature(api_secret, challenge):
-    api_sign = hmac.new(api_secret.encode(), challenge.encode(), hashlib.sha512).hexdigest()
-    return api_sign
+
+def cancel_threadsafe(loop, task):
+    """
+    Cancels a worker task of `loop` from any thread. Workers are usually stopped from the
+    control thread while their loop runs in the socket thread.
+    """
+    if task is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(task.cancel)
+
+
+def create_signer(api_secret):
+    """
+    :return: HMAC-SHA512 keyed with `api_secret`, to be passed to `create_signature`.
+    """
+    return hmac.new(api_secret.encode(), digestmod=hashlib.sha512)
+
+
+def create_signature(signer, challenge):
+    # Copying the keyed object skips deriving the key pads again for every challenge.
+    api_sign = signer.copy()
+    api_sign.update(challenge.encode())
+    return api_sign.hexdigest()
 
 
 class BittrexConnection(object):
@@ -41,3 +51,33 @@ class BittrexConnection(object):
         self.conn = conn
         self.corehub = hub
         self.id = uuid4().hex
+
+    def invoke(self, method, *args):
+        """
+        Same as `corehub.server.invoke`, but returns the invocation id used to match the response.
+        """
+        invoke_id = self.conn.increment_send_counter()
+        self.conn.send({'H': self.corehub.name, 'M': method, 'A': args, 'I': invoke_id})
+        return invoke_id
+
+    async def start_in_executor(self):
+        """
+        Same as `conn.start` on a running loop, except that the blocking HTTP negotiation runs
+        in the default executor instead of on the loop.
+
+        :return: The socket task.
+        :rtype: asyncio.Future
+        """
+        conn = self.conn
+        conn.hub = self.corehub.name
+        transport = self.transport
+        loop = asyncio.get_event_loop()
+        transport._ws_params = await loop.run_in_executor(None, WebSocketParameters, conn)
+        socket = asyncio.ensure_future(transport.socket(transport.ws_loop))
+        transport.futures.append(socket)
+        return socket
+
+    @property
+    def transport(self):
+        # signalr_aio does not expose its transport, which owns the socket task.
+        return self.conn._Connection__transport
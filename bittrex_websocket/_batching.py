@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_batching.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+
+from ._auxiliary import cancel_threadsafe
+
+logger = logging.getLogger(__name__)
+
+
+class Batcher(object):
+    """
+    Accumulates public messages per market and hands them over in batches.
+
+    A market is flushed as soon as it holds `max_messages` messages, and every market is
+    flushed each `interval` seconds. With `coalesce_summaries` only the newest summary row
+    of each market is kept between flushes.
+    """
+
+    def __init__(self, handler, max_messages=100, interval=0.1, coalesce_summaries=False):
+        """
+        :param handler: Coroutine function called with (market, msgs).
+        :param max_messages: Flush a market once it has this many messages.
+        :type max_messages: int
+        :param interval: Seconds between periodic flushes of all markets.
+        :type interval: float
+        :param coalesce_summaries: Keep only the newest summary row per market.
+        :type coalesce_summaries: bool
+        """
+        self.handler = handler
+        self.max_messages = max_messages
+        self.interval = interval
+        self.coalesce_summaries = coalesce_summaries
+        self._batches = {}
+        self._summaries = {}
+        self._loop = None
+        self._flush_task = None
+
+    async def add(self, market, msg):
+        self._ensure_timer()
+        batch = self._batches.get(market)
+        if batch is None:
+            batch = self._batches[market] = []
+        batch.append(msg)
+        if len(batch) + (market in self._summaries) >= self.max_messages:
+            await self.flush(market)
+
+    async def add_summary(self, market, row):
+        if self.coalesce_summaries:
+            self._ensure_timer()
+            self._summaries[market] = row
+        else:
+            await self.add(market, row)
+
+    async def flush(self, market=None):
+        """
+        Delivers the pending messages of `market`, or of every market if None.
+        """
+        markets = [market] if market is not None else list(set(self._batches) | set(self._summaries))
+        for market in markets:
+            msgs = self._batches.pop(market, [])
+            row = self._summaries.pop(market, None)
+            if row is not None:
+                msgs.append(row)
+            if msgs:
+                await self.handler(market, msgs)
+
+    def stop(self):
+        cancel_threadsafe(self._loop, self._flush_task)
+
+    def _ensure_timer(self):
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+            self._loop = loop
+            self._flush_task = asyncio.ensure_future(self._flush_periodically(), loop=loop)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Error while flushing batched messages.')
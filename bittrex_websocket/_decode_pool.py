@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_decode_pool.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from ._auxiliary import cancel_threadsafe
+
+logger = logging.getLogger(__name__)
+
+
+class DecodePool(object):
+    """
+    Decodes messages on a thread or process pool and hands them back to the event loop.
+
+    Messages are delivered in the order they were received: decoding runs in parallel, but
+    a single delivery task awaits the results first in, first out. zlib releases the GIL
+    while inflating, so a thread pool already keeps large payloads off the loop.
+    """
+
+    def __init__(self, decoder, workers=None, use_processes=False):
+        """
+        :param decoder: The `Decoder` used by the workers.
+        :type decoder: Decoder
+        :param workers: Number of workers. Defaults to the executor's default.
+        :type workers: int
+        :param use_processes: Use a process pool instead of a thread pool.
+        :type use_processes: bool
+        """
+        self.decoder = decoder
+        if use_processes:
+            self.executor = ProcessPoolExecutor(workers)
+        else:
+            self.executor = ThreadPoolExecutor(workers)
+        self._loop = None
+        self._pending = None
+        self._delivery_task = None
+
+    def submit(self, message, handler):
+        """
+        Schedules `message` for decoding. Must be called from the event loop.
+
+        :param message: Base64 encoded, deflated payload.
+        :type message: str
+        :param handler: Coroutine function called with the decoded message.
+        """
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            self._start(loop)
+        future = loop.run_in_executor(self.executor, self.decoder.decode, message)
+        self._pending.put_nowait((future, handler))
+
+    def pending(self):
+        return 0 if self._pending is None else self._pending.qsize()
+
+    def shutdown(self):
+        cancel_threadsafe(self._loop, self._delivery_task)
+        self.executor.shutdown(wait=False)
+
+    def _start(self, loop):
+        if self._delivery_task is not None:
+            self._delivery_task.cancel()
+        self._loop = loop
+        self._pending = asyncio.Queue()
+        self._delivery_task = asyncio.ensure_future(self._deliver(), loop=loop)
+
+    async def _deliver(self):
+        while True:
+            future, handler = await self._pending.get()
+            try:
+                msg = await future
+            except Exception:
+                logger.exception('Failed to decode message.')
+                continue
+            try:
+                await handler(msg)
+            except Exception:
+                logger.exception('Error while handling decoded message.')
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_decoder.py
+# Stanislav Lazarov
+
+import json
+import logging
+from time import perf_counter
+from zlib import decompress, MAX_WBITS
+
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+from .constants import JsonBackends, ErrorMessages, MetricStages
+
+logger = logging.getLogger(__name__)
+
+# First byte of a zlib-wrapped stream (deflate, 32K window). Bittrex sends raw deflate.
+_ZLIB_HEADER = 0x78
+
+
+def _json_loads(data):
+    # `json.loads` sniffs the encoding of bytes input, handing it a str is faster.
+    return json.loads(data.decode())
+
+
+def _decompress(data):
+    # A zlib header is CMF=0x78 followed by a flag byte making the pair a multiple of 31.
+    if data[0] == _ZLIB_HEADER and (data[0] << 8 | data[1]) % 31 == 0:
+        return decompress(data, MAX_WBITS)
+    return decompress(data, -MAX_WBITS)
+
+
+def _load_backends():
+    backends = {}
+    try:
+        import orjson
+        backends[JsonBackends.ORJSON] = orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+        backends[JsonBackends.UJSON] = ujson.loads
+    except ImportError:
+        pass
+    backends[JsonBackends.JSON] = _json_loads
+    return backends
+
+
+_BACKENDS = _load_backends()
+
+
+def available_json_backends():
+    """
+    :return: Names of the importable JSON backends, fastest first.
+    :rtype: []
+    """
+    return [name for name in JsonBackends.PREFERENCE if name in _BACKENDS]
+
+
+class Decoder(object):
+    """
+    Turns the base64 encoded, deflated payloads sent by Bittrex into Python objects.
+
+    Decoding is synchronous on purpose: it is pure CPU work and wrapping it in a coroutine
+    only adds overhead on the hottest path of the client. The inflated bytes are passed
+    straight to orjson/ujson without building an intermediate str, and the deflate format
+    is picked from the stream header instead of retrying on failure.
+    """
+
+    def __init__(self, json_backend=None):
+        """
+        :param json_backend: One of `JsonBackends`. Defaults to the fastest installed backend.
+        :type json_backend: str
+        """
+        if json_backend is None:
+            json_backend = available_json_backends()[0]
+        elif json_backend not in _BACKENDS:
+            raise ValueError(ErrorMessages.JSON_BACKEND_UNAVAILABLE.format(json_backend))
+        self.json_backend = json_backend
+        self.loads = _BACKENDS[json_backend]
+
+    def inflate(self, message):
+        """
+        :param message: Base64 encoded, deflated payload.
+        :type message: str
+        :return: The inflated JSON document.
+        :rtype: bytes
+        """
+        return _decompress(b64decode(message, validate=True))
+
+    def decode(self, message):
+        """
+        :param message: Base64 encoded, deflated payload.
+        :type message: str
+        :return: The decoded message.
+        :rtype: dict
+        """
+        return self.loads(self.inflate(message))
+
+    def decode_timed(self, message, metrics):
+        """
+        Same as `decode`, recording the time spent in each step.
+
+        :param metrics: Where the timings are recorded.
+        :type metrics: Metrics
+        """
+        start = perf_counter()
+        data = b64decode(message, validate=True)
+        decoded = perf_counter()
+        data = _decompress(data)
+        inflated = perf_counter()
+        msg = self.loads(data)
+        metrics.observe(MetricStages.BASE64, decoded - start)
+        metrics.observe(MetricStages.INFLATE, inflated - decoded)
+        metrics.observe(MetricStages.JSON, perf_counter() - inflated)
+        return msg
+
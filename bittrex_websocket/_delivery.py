@@ -0,0 +1,165 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_delivery.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+from collections import deque
+from time import perf_counter
+
+from ._auxiliary import cancel_threadsafe
+from .constants import DeliveryPolicies, MetricStages, ErrorMessages, BittrexMethods
+from .messages import Summaries
+
+logger = logging.getLogger(__name__)
+
+
+def merge_summaries(pending, msg):
+    """
+    Conflates two summary messages of the same channel per market: the rows of `msg` replace
+    those of the same markets in `pending`, the rows of other markets are kept.
+
+    :param pending: The undelivered message, a decoded dict or `Summaries`.
+    :param msg: The newer message, of the same type.
+    :return: `msg` carrying the merged rows.
+    """
+    if isinstance(msg, Summaries):
+        rows = {row.market: row for row in pending.deltas}
+        rows.update((row.market, row) for row in msg.deltas)
+        return Summaries(msg.invoke_type, msg.nonce, list(rows.values()))
+    field = 's' if msg['invoke_type'] == BittrexMethods.QUERY_SUMMARY_STATE else 'D'
+    rows = {row['M']: row for row in pending[field]}
+    rows.update((row['M'], row) for row in msg[field])
+    merged = dict(msg)
+    merged[field] = list(rows.values())
+    return merged
+
+
+class DeliveryQueue(object):
+    """
+    Bounded per-market buffers between decoding and the user callbacks.
+
+    The socket reader only appends to the buffers; a separate task hands the messages to the
+    callbacks, taking markets in turn so that one busy market cannot starve the others. That
+    task runs on the socket's event loop too, so this absorbs bursts and handlers that await,
+    but a handler that blocks the loop without awaiting still stalls reading. Each
+    handler of a market has its own buffer, in which the order is kept. When a buffer is full
+    the `policy` decides:
+
+    - BLOCK: the reader waits for room, which eventually stalls the socket.
+    - DROP_OLDEST: the oldest buffered message of the market is dropped.
+    - CONFLATE: only the newest message of each market and handler is kept, regardless of `max_size`.
+      Pending summary messages are merged per market row instead, see `merge_summaries`.
+
+    Messages put with `droppable=False` (account-level data) are never dropped and block instead.
+    """
+
+    def __init__(self, max_size=1000, policy=DeliveryPolicies.BLOCK, metrics=None):
+        """
+        :param max_size: Messages buffered per market.
+        :type max_size: int
+        :param policy: One of `DeliveryPolicies`.
+        :type policy: str
+        :param metrics: Records the handler time when set.
+        :type metrics: Metrics
+        """
+        if policy not in DeliveryPolicies.ALL:
+            raise ValueError(ErrorMessages.INVALID_DELIVERY_POLICY.format(policy))
+        self.max_size = max(1, max_size)
+        self.policy = policy
+        self.metrics = metrics
+        self.dropped = {}
+        self._buffers = {}
+        self._ready = deque()
+        self._room = {}
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+
+    async def put(self, key, handler, msg, droppable=True, merge=None):
+        """
+        :param key: The market, or any other key whose messages must stay in order.
+        :param handler: Coroutine function called with `msg`.
+        :param merge: Under CONFLATE, called with the pending and the new message to combine
+            them instead of dropping the pending one.
+        """
+        self._ensure_task()
+        # Handlers sharing a market must not replace or crowd out each other's messages.
+        slot = (key, handler)
+        buffer = self._buffers.get(slot)
+        if buffer is None:
+            buffer = self._buffers[slot] = deque()
+        item = (handler, msg)
+        if droppable and self.policy == DeliveryPolicies.CONFLATE:
+            if buffer:
+                # The slot is already scheduled, its pending messages are replaced.
+                if merge is not None:
+                    item = (handler, merge(buffer[-1][1], msg))
+                else:
+                    self._drop(key, len(buffer))
+                buffer.clear()
+                buffer.append(item)
+                return
+        elif droppable and self.policy == DeliveryPolicies.DROP_OLDEST:
+            if len(buffer) >= self.max_size:
+                buffer.popleft()
+                self._drop(key, 1)
+                buffer.append(item)
+                return
+        else:
+            while len(buffer) >= self.max_size:
+                room = self._room.get(slot)
+                if room is None:
+                    room = self._room[slot] = asyncio.Event()
+                room.clear()
+                await room.wait()
+        if not buffer:
+            self._ready.append(slot)
+        buffer.append(item)
+        self._wakeup.set()
+
+    def pending(self):
+        return sum(len(buffer) for buffer in list(self._buffers.values()))
+
+    def stop(self):
+        cancel_threadsafe(self._loop, self._task)
+
+    def _drop(self, key, count):
+        self.dropped[key] = self.dropped.get(key, 0) + count
+
+    def _ensure_task(self):
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            if self._task is not None:
+                self._task.cancel()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._room = {}
+            self._task = asyncio.ensure_future(self._deliver(), loop=loop)
+
+    async def _deliver(self):
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            slot = self._ready.popleft()
+            key = slot[0]
+            buffer = self._buffers[slot]
+            handler, msg = buffer.popleft()
+            if buffer:
+                self._ready.append(slot)
+            room = self._room.get(slot)
+            if room is not None:
+                room.set()
+            try:
+                if self.metrics is None:
+                    await handler(msg)
+                else:
+                    start = perf_counter()
+                    await handler(msg)
+                    self.metrics.observe(MetricStages.HANDLER, perf_counter() - start)
+            except Exception:
+                logger.exception('Error while delivering message for [{}].'.format(key))
@@ -6,3 +6,15 @@
 
 from websockets.exceptions import ConnectionClosed, InvalidStatusCode
 from requests.exceptions import ConnectionError
+
+
+class InvokeError(Exception):
+    """
+    Raised through the future of an invoke the server did not acknowledge.
+    """
+
+    def __init__(self, method, ticker, reason):
+        super().__init__('[{}] for [{}]: {}'.format(method, ticker, reason))
+        self.method = method
+        self.ticker = ticker
+        self.reason = reason
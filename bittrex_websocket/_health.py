@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_health.py
+# Stanislav Lazarov
+
+import logging
+
+from .constants import BittrexParameters, BittrexMethods, StallTypes
+
+logger = logging.getLogger(__name__)
+
+_NAN = float('nan')
+
+# Subscription -> callback channel expected to keep delivering
+_WATCHED_CHANNELS = {BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS: BittrexParameters.SUMMARY_DELTA,
+                     BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS: BittrexParameters.SUMMARY_DELTA_LITE}
+
+
+class HealthMonitor(object):
+    """
+    Detects connections, channels and markets that silently stopped delivering.
+
+    A half-open socket raises nothing, so the time of the last received frame (SignalR
+    keep-alives included), of the last message of each channel and of the last delta of
+    each market are tracked and compared with their timeouts by `check`. A stall is reported
+    once per timeout; once a channel or market has been reported `max_strikes` times without
+    receiving anything in between, the connection itself is reported instead.
+
+    Exchange deltas of quiet markets can legitimately pause for minutes, so `market_timeout`
+    has to be well above that. The round trip latency of probe invokes is kept as well.
+    """
+
+    def __init__(self, connection_timeout=60.0, channel_timeout=30.0, market_timeout=600.0, max_strikes=2):
+        """
+        :param connection_timeout: Seconds without any frame before the connection is considered stalled.
+        :type connection_timeout: float
+        :param channel_timeout: Seconds without summary deltas before the subscription is considered stalled.
+        :type channel_timeout: float
+        :param market_timeout: Seconds without exchange deltas before a market is considered stalled.
+        :type market_timeout: float
+        :param max_strikes: Stalls of a channel or market in a row before the connection is reported.
+        :type max_strikes: int
+        """
+        self.connection_timeout = connection_timeout
+        self.channel_timeout = channel_timeout
+        self.market_timeout = market_timeout
+        self.max_strikes = max_strikes
+        self.last_frame = None
+        self.channels = {}
+        self.markets = {}
+        self.latency = None
+        self.probe_failures = 0
+        self.stalls = {kind: 0 for kind in (StallTypes.CONNECTION, StallTypes.CHANNEL, StallTypes.MARKET)}
+        self._strikes = {}
+
+    def reset(self, now):
+        """
+        Starts the timeouts over, called for every new connection.
+        """
+        self.last_frame = now
+        self.channels = {}
+        self.markets = {}
+        self._strikes = {}
+
+    def on_frame(self, now):
+        self.last_frame = now
+
+    def on_channel(self, channel, now):
+        self.channels[channel] = now
+        self._strikes.pop(channel, None)
+
+    def on_market(self, market, now):
+        self.markets[market] = now
+        self._strikes.pop(market, None)
+
+    def on_probe(self, latency):
+        self.latency = latency
+
+    def on_probe_failure(self):
+        self.probe_failures += 1
+
+    def check(self, now, subscriptions):
+        """
+        :param subscriptions: (method, ticker) of the acknowledged subscriptions.
+        :type subscriptions: []
+        :return: The stalls found, as (`StallTypes`, key) with key None for the connection.
+        :rtype: []
+        """
+        if self.last_frame is None:
+            return []
+        if now - self.last_frame >= self.connection_timeout:
+            return [self._report(StallTypes.CONNECTION, None, now)]
+        stalls = []
+        for method, ticker in subscriptions:
+            if method == BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS:
+                kind, key, ages, timeout = StallTypes.MARKET, ticker, self.markets, self.market_timeout
+            elif method in _WATCHED_CHANNELS:
+                key = _WATCHED_CHANNELS[method]
+                kind, ages, timeout = StallTypes.CHANNEL, self.channels, self.channel_timeout
+            else:
+                continue
+            if key not in ages:
+                # Watched from the first check after the subscription.
+                ages[key] = now
+            elif now - ages[key] >= timeout:
+                stall = self._report(kind, key, now)
+                if stall[0] == StallTypes.CONNECTION:
+                    return [stall]
+                stalls.append(stall)
+        return stalls
+
+    def _report(self, kind, key, now):
+        if kind != StallTypes.CONNECTION:
+            # Re-armed, so the stall is reported again only after another timeout.
+            (self.markets if kind == StallTypes.MARKET else self.channels)[key] = now
+            strikes = self._strikes[key] = self._strikes.get(key, 0) + 1
+            if strikes > self.max_strikes:
+                logger.warning('[{}] still silent after {} resubscriptions.'.format(key, strikes - 1))
+                del self._strikes[key]
+                kind, key = StallTypes.CONNECTION, None
+        if kind == StallTypes.CONNECTION:
+            self.last_frame = now
+        self.stalls[kind] += 1
+        return kind, key
+
+    def snapshot(self, now):
+        """
+        :return: Seconds since the last frame, per channel and per market, plus latency and stall counts.
+            Unknown values are NaN.
+        :rtype: dict
+        """
+        # Called from other threads, e.g. the metrics server, while the loop updates the dicts.
+        # Copying a dict is atomic, iterating over a live one is not.
+        channels, markets = dict(self.channels), dict(self.markets)
+        return {'last_frame_age': _NAN if self.last_frame is None else now - self.last_frame,
+                'channel_ages': {channel: now - stamp for channel, stamp in channels.items()},
+                'market_ages': {market: now - stamp for market, stamp in markets.items()},
+                'probe_latency': _NAN if self.latency is None else self.latency,
+                'probe_failures': self.probe_failures,
+                'stalls': dict(self.stalls)}
@@ -0,0 +1,254 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_invoker.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+from collections import deque
+from time import monotonic
+
+from ._auxiliary import cancel_threadsafe
+from ._exceptions import InvokeError
+
+logger = logging.getLogger(__name__)
+
+
+class Invocation(object):
+    """
+    A single server call together with the future resolved by its response.
+    """
+
+    def __init__(self, method, args=(), ticker=None, future=None, replay=False, timeout=None, max_retries=None):
+        """
+        :param method: Hub method, one of `BittrexMethods`.
+        :type method: str
+        :param args: Arguments sent with the invoke.
+        :type args: tuple
+        :param ticker: The ticker the invoke refers to, if any.
+        :type ticker: str
+        :param future: Resolved with True once the server acknowledges the invoke.
+        :type future: concurrent.futures.Future
+        :param replay: Whether the invoke is a persistent subscription, repeated after a reconnection.
+        :type replay: bool
+        :param timeout: Overrides the scheduler's response timeout.
+        :type timeout: float
+        :param max_retries: Overrides the scheduler's retries.
+        :type max_retries: int
+        """
+        self.method = method
+        self.args = args
+        self.ticker = ticker
+        self.future = future
+        self.replay = replay
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.invoke_id = None
+        self.attempts = 0
+        self.timeout_handle = None
+
+    def cancel_timeout(self):
+        if self.timeout_handle is not None:
+            self.timeout_handle.cancel()
+            self.timeout_handle = None
+
+    def set_result(self, result):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(result)
+
+    def set_exception(self, exception):
+        if self.future is not None and not self.future.done():
+            self.future.set_exception(exception)
+
+
+class InvokeRegistry(object):
+    """
+    Keeps track of invokes by their SignalR invocation id.
+
+    Invokes stay in `in_flight` only until the server answers. Acknowledged persistent
+    subscriptions are kept in `subscriptions`, one per (method, ticker), so they can be
+    replayed after a reconnection; one-shot queries are forgotten once answered.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.subscriptions = {}
+
+    def __len__(self):
+        return len(self.in_flight) + len(self.subscriptions)
+
+    def register(self, invocation):
+        self.in_flight[invocation.invoke_id] = invocation
+
+    def pop(self, invoke_id):
+        return self.in_flight.pop(invoke_id, None)
+
+    def acknowledge(self, invocation):
+        if invocation.replay:
+            self.subscriptions[(invocation.method, invocation.ticker)] = invocation
+
+    def take_in_flight(self):
+        """
+        Empties `in_flight`.
+
+        :return: The removed invocations, in the order they were sent.
+        :rtype: []
+        """
+        invocations = sorted(self.in_flight.values(), key=lambda item: item.invoke_id)
+        self.in_flight.clear()
+        return invocations
+
+
+class InvokeScheduler(object):
+    """
+    Sends invokes through a token bucket and matches them with the server responses.
+
+    Invokes are pipelined: they are sent as fast as the bucket allows without waiting for
+    earlier responses. Each one is tracked by its SignalR invocation id until the server
+    answers; errors and timeouts are retried up to `max_retries` times. Everything except
+    `attach`, `submit` and `stop` runs on the connection's event loop.
+    """
+
+    def __init__(self, registry, rate=40.0, burst=20, max_retries=3, timeout=10.0, on_ack=None):
+        """
+        :param registry: Where invokes are tracked while in flight and once acknowledged.
+        :type registry: InvokeRegistry
+        :param rate: Sustained invokes per second.
+        :type rate: float
+        :param burst: Invokes that can be sent back to back before `rate` applies.
+        :type burst: int
+        :param max_retries: Retries of a failed or unanswered invoke before giving up.
+        :type max_retries: int
+        :param timeout: Seconds to wait for a response before retrying.
+        :type timeout: float
+        :param on_ack: Called on the loop with each acknowledged `Invocation`.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.on_ack = on_ack
+        self.registry = registry
+        self.connection = None
+        self._loop = None
+        self._queue = deque()
+        self._wakeup = None
+        self._task = None
+        self._tokens = burst
+        self._stamp = monotonic()
+
+    # ===========
+    # Thread-safe
+    # ===========
+
+    def attach(self, connection):
+        """
+        Starts sending through `connection`. Called with every new connection.
+        """
+        self._loop = connection.transport.ws_loop
+        self._loop.call_soon_threadsafe(self._attach, connection)
+
+    def submit(self, invocation):
+        self._loop.call_soon_threadsafe(self._enqueue, invocation)
+
+    def pending(self):
+        return len(self._queue)
+
+    def stop(self):
+        cancel_threadsafe(self._loop, self._task)
+
+    def call_later(self, delay, callback, *args):
+        # Schedules `callback` on the connection's event loop.
+        self._loop.call_soon_threadsafe(self._loop.call_later, delay, callback, *args)
+
+    # =======
+    # On loop
+    # =======
+
+    def on_response(self, invoke_id, result=None, error=None):
+        """
+        Resolves the invocation answered by a server response.
+
+        :return: The answered `Invocation` or None if the id is unknown.
+        """
+        invocation = self.registry.pop(invoke_id)
+        if invocation is None:
+            return None
+        invocation.cancel_timeout()
+        if error is not None or result is False:
+            self._retry(invocation, error or 'Server refused the invoke')
+        else:
+            self.registry.acknowledge(invocation)
+            if self.on_ack is not None:
+                self.on_ack(invocation)
+            invocation.set_result(True)
+        return invocation
+
+    def _attach(self, connection):
+        # The previous connection will not answer anymore, resend its invokes first.
+        for invocation in reversed(self.registry.take_in_flight()):
+            invocation.cancel_timeout()
+            self._queue.appendleft(invocation)
+        self.connection = connection
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._drain(), loop=self._loop)
+        if self._queue:
+            self._wakeup.set()
+
+    def _enqueue(self, invocation):
+        self._queue.append(invocation)
+        self._wakeup.set()
+
+    def push(self, invocation):
+        """
+        Sends `invocation` ahead of everything that is queued.
+        """
+        self._queue.appendleft(invocation)
+        self._wakeup.set()
+
+    async def _drain(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._acquire()
+            if self._queue:
+                self._send(self._queue.popleft())
+
+    async def _acquire(self):
+        while True:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def _send(self, invocation):
+        invocation.attempts += 1
+        invocation.invoke_id = self.connection.invoke(invocation.method, *invocation.args)
+        self.registry.register(invocation)
+        timeout = self.timeout if invocation.timeout is None else invocation.timeout
+        invocation.timeout_handle = self._loop.call_later(timeout, self._on_timeout, invocation.invoke_id)
+
+    def _on_timeout(self, invoke_id):
+        invocation = self.registry.pop(invoke_id)
+        if invocation is not None:
+            invocation.timeout_handle = None
+            timeout = self.timeout if invocation.timeout is None else invocation.timeout
+            self._retry(invocation, 'No response within {}s'.format(timeout))
+
+    def _retry(self, invocation, reason):
+        max_retries = self.max_retries if invocation.max_retries is None else invocation.max_retries
+        if invocation.attempts <= max_retries:
+            logger.warning('Invoke [{}] for [{}] failed: {}. Retrying.'.format(
+                invocation.method, invocation.ticker, reason))
+            self._enqueue(invocation)
+        else:
+            logger.error('Invoke [{}] for [{}] failed: {}. Giving up.'.format(
+                invocation.method, invocation.ticker, reason))
+            invocation.set_exception(InvokeError(invocation.method, invocation.ticker, reason))
@@ -28,10 +28,11 @@ class SubscribeEvent(Event):
     Handles the event of subscribing specific ticker(s) to specific channels.
     """
 
-    def __init__(self, invoke, *payload):
+    def __init__(self, invoke, *payload, futures=None):
         self.type = EventTypes.SUBSCRIBE
         self.invoke = invoke
         self.payload = payload
+        self.futures = futures
 
 
 class ReconnectEvent(Event):
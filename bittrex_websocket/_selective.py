@@ -0,0 +1,50 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/_selective.py
+# Stanislav Lazarov
+
+import re
+
+# Top-level nonce of a summary message, summary rows have no 'N' key.
+_NONCE = re.compile(rb'"N"\s*:\s*(\d+)')
+# Ticker of a summary row
+_MARKET = re.compile(rb'"M"\s*:\s*"([^"]*)"')
+
+
+class SummaryFilter(object):
+    """
+    Decodes only the rows of whitelisted markets from summary delta payloads.
+
+    The payload still has to be inflated, but instead of parsing the whole document into a
+    few hundred dicts, the tickers are picked out of the inflated bytes by a single regex
+    scan and only the rows of wanted markets are parsed. Summary rows are flat objects, so a
+    row spans from the last opening brace before its ticker to the first closing brace after.
+    """
+
+    def __init__(self, markets):
+        """
+        :param markets: Tickers whose rows are kept.
+        :type markets: []
+        """
+        self.markets = frozenset(markets)
+        self._names = frozenset(market.encode() for market in self.markets)
+
+    def decode(self, decoder, message):
+        """
+        :param decoder: Provides `inflate` and the JSON `loads` in use.
+        :type decoder: Decoder
+        :param message: Base64 encoded, deflated `uS` or `uL` payload.
+        :type message: str
+        :return: The message with only the whitelisted rows in 'D'.
+        :rtype: dict
+        """
+        data = decoder.inflate(message)
+        nonce = _NONCE.search(data)
+        names = self._names
+        loads = decoder.loads
+        rows = []
+        for match in _MARKET.finditer(data):
+            if match.group(1) in names:
+                rows.append(loads(data[data.rfind(b'{', 0, match.start()):data.find(b'}', match.end()) + 1]))
+        return {'N': int(nonce.group(1)) if nonce is not None else None, 'D': rows}
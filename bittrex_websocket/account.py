@@ -0,0 +1,147 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/account.py
+# Stanislav Lazarov
+
+import logging
+
+from .constants import OrderDeltaTypes
+from .messages import MessageFactory, BalanceDelta, OrderDelta
+
+logger = logging.getLogger(__name__)
+
+
+class AccountState(object):
+    """
+    Balances and open orders maintained from `uB` and `uO` messages.
+
+    Balances are kept by currency and open orders by order UUID, with an index by market.
+    Filled and cancelled orders are removed. The websocket has no query for the initial
+    state, so it is either built up as deltas arrive after `authenticate` or seeded from the
+    REST API with `seed`. Each channel carries its own nonce sequence: stale deltas are
+    ignored and gaps are counted, in which case a fresh `seed` is advisable.
+    """
+
+    def __init__(self, use_decimal=False):
+        """
+        :param use_decimal: Represent balances and quantities as Decimal instead of float.
+        :type use_decimal: bool
+        """
+        self.factory = MessageFactory(use_decimal)
+        self.balances = {}
+        self.orders = {}
+        self.orders_by_market = {}
+        self.balance_nonce = None
+        self.order_nonce = None
+        self.gaps = 0
+
+    def seed(self, balances=None, orders=None):
+        """
+        Loads the state returned by the REST API. Entries not listed are dropped.
+
+        :param balances: Result of `account/getbalances`.
+        :type balances: []
+        :param orders: Result of `market/getopenorders`.
+        :type orders: []
+        """
+        num = self.factory.num
+        if balances is not None:
+            self.balances = {}
+            for balance in balances:
+                self.balances[balance['Currency']] = BalanceDelta(
+                    None, balance.get('Uuid'), None, balance['Currency'], num(balance.get('Balance')),
+                    num(balance.get('Available')), num(balance.get('Pending')), balance.get('CryptoAddress'),
+                    balance.get('Requested'), None, None)
+        if orders is not None:
+            self.orders = {}
+            self.orders_by_market = {}
+            for order in orders:
+                partial = order.get('QuantityRemaining') != order.get('Quantity')
+                self._store(OrderDelta(
+                    None, None, OrderDeltaTypes.PARTIAL if partial else OrderDeltaTypes.OPEN, order.get('Uuid'),
+                    None, order['OrderUuid'], order['Exchange'], order.get('OrderType'), num(order.get('Quantity')),
+                    num(order.get('QuantityRemaining')), num(order.get('Limit')), num(order.get('CommissionPaid')),
+                    num(order.get('Price')), num(order.get('PricePerUnit')), order.get('Opened'), order.get('Closed'),
+                    True, order.get('CancelInitiated'), order.get('ImmediateOrCancel'),
+                    order.get('IsConditional'), order.get('Condition'), order.get('ConditionTarget'), None))
+
+    def invalidate(self):
+        """
+        Forgets the nonces, the next connection restarts both sequences.
+        """
+        self.balance_nonce = None
+        self.order_nonce = None
+
+    def on_delta(self, msg):
+        """
+        :param msg: Decoded `uB` or `uO` message.
+        :type msg: dict
+        :return: The applied `BalanceDelta` or `OrderDelta`, None if the message was stale.
+        """
+        if 'd' in msg:
+            return self.on_balance_delta(msg)
+        elif 'o' in msg:
+            return self.on_order_delta(msg)
+        return None
+
+    def on_balance_delta(self, msg):
+        if not self._check_nonce('balance_nonce', msg.get('N')):
+            return None
+        balance = self.factory.balance_delta(msg)
+        self.balances[balance.currency] = balance
+        return balance
+
+    def on_order_delta(self, msg):
+        if not self._check_nonce('order_nonce', msg.get('N')):
+            return None
+        order = self.factory.order_delta(msg)
+        if order.type in (OrderDeltaTypes.FILL, OrderDeltaTypes.CANCEL):
+            self._discard(order.order_uuid)
+        else:
+            self._store(order)
+        return order
+
+    def _check_nonce(self, attr, nonce):
+        if nonce is None:
+            return True
+        last = getattr(self, attr)
+        if last is not None:
+            if nonce <= last:
+                logger.debug('Dropping stale account delta [{}] at nonce [{}].'.format(nonce, last))
+                return False
+            elif nonce > last + 1:
+                logger.warning('Nonce gap in account deltas: expected [{}], received [{}].'.format(last + 1, nonce))
+                self.gaps += 1
+        setattr(self, attr, nonce)
+        return True
+
+    def _store(self, order):
+        self._discard(order.order_uuid)
+        self.orders[order.order_uuid] = order
+        self.orders_by_market.setdefault(order.market, {})[order.order_uuid] = order
+
+    def _discard(self, order_uuid):
+        order = self.orders.pop(order_uuid, None)
+        if order is not None:
+            market_orders = self.orders_by_market.get(order.market)
+            if market_orders is not None:
+                market_orders.pop(order_uuid, None)
+                if not market_orders:
+                    del self.orders_by_market[order.market]
+
+    # ==============
+    # Query Methods
+    # ==============
+
+    def balance(self, currency):
+        return self.balances.get(currency)
+
+    def open_orders(self, market=None):
+        """
+        :return: The open orders of `market`, or all of them if None.
+        :rtype: []
+        """
+        if market is None:
+            return list(self.orders.values())
+        return list(self.orders_by_market.get(market, {}).values())
@@ -0,0 +1,220 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/async_client.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+
+from ._queue_events import *
+from .constants import EventTypes, ErrorMessages
+from ._exceptions import *
+from .websocket_client import BittrexSocket
+from .account import AccountState
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBittrexSocket(BittrexSocket):
+    """
+    asyncio-native client running inside the caller's event loop.
+
+    Unlike `BittrexSocket` there is no control thread: subscriptions, reconnections and the
+    socket itself all run as tasks of the loop the client is connected from. Subscribing
+    returns once the server has acknowledged the subscription. Messages are received either
+    by overriding `on_public`/`on_private` or by iterating over the client:
+
+        async with AsyncBittrexSocket() as ws:
+            await ws.subscribe_to_exchange_deltas(['BTC-ETH'])
+            async for msg in ws:
+                print(msg)
+    """
+
+    def __init__(self, url=None, json_backend=None, max_queue_size=0):
+        """
+        :param url: Custom connection url.
+        :type url: str
+        :param json_backend: JSON library used to parse messages, one of `JsonBackends`.
+        :type json_backend: str
+        :param max_queue_size: Maximum number of messages waiting to be iterated over, 0 for no limit.
+            A full queue stops the socket from reading until the caller catches up.
+        :type max_queue_size: int
+        """
+        self.max_queue_size = max_queue_size
+        self._messages = None
+        self._pending_events = []
+        self._run_task = None
+        self._closing = False
+        self._stopped = False
+        super().__init__(url, json_backend)
+
+    def _start_main_thread(self):
+        # Nothing to start until `connect` is awaited from the caller's loop.
+        pass
+
+    def _submit(self, event):
+        if event.type == EventTypes.CLOSE:
+            self._closing = True
+            if self.connection is not None:
+                self.connection.conn.close()
+        elif self.connection is None:
+            self._pending_events.append(event)
+        elif event.type == EventTypes.SUBSCRIBE:
+            self._handle_subscribe(event.invoke, event.payload, event.futures)
+        # Connecting and reconnecting are driven by `_run`.
+
+    async def _start_connection(self):
+        self.connection = self._create_connection()
+        self._log_connection_attempt()
+        events, self._pending_events = self._pending_events, []
+        for event in events:
+            self._submit(event)
+        # Invokes submitted meanwhile wait in signalr_aio's queue until the socket is open.
+        return await self.connection.start_in_executor()
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    await (await self._start_connection())
+                except ConnectionClosed as e:
+                    if self._stall_reason is not None:
+                        # Closed by the health monitor.
+                        error_message = self._stall_reason
+                    elif e.code == 1000 or self._closing:
+                        logger.info('Bittrex connection successfully closed.')
+                        break
+                    else:
+                        error_message = e.args[0]
+                except InvalidStatusCode as e:
+                    error_message = 'Status code not 101: {}'.format(e.status_code)
+                except (OSError, ValueError) as e:
+                    # Negotiation failures (requests' ConnectionError is an OSError, bad JSON a ValueError).
+                    error_message = 'Connection attempt failed: {}'.format(e)
+                else:
+                    if self._stall_reason is None:
+                        logger.info('Bittrex connection successfully closed.')
+                        break
+                    error_message = self._stall_reason
+                if self._closing:
+                    break
+                logger.error('{}.'.format(error_message))
+                logger.error('Initiating reconnection procedure')
+                self._pending_events = self._prepare_reconnect()
+                await asyncio.sleep(self._reconnect_delay())
+        finally:
+            self._stopped = True
+            self._stop_workers()
+            self._end_iteration()
+
+    def _end_iteration(self):
+        # Nobody may be iterating over a full queue, the oldest message makes room for the end marker.
+        if self._messages.full():
+            self._messages.get_nowait()
+        self._messages.put_nowait(None)
+
+    # ==============
+    # Public Methods
+    # ==============
+
+    async def connect(self):
+        """
+        Opens the connection on the running event loop.
+        Subscriptions requested earlier are sent as soon as the connection exists.
+
+        :raises RuntimeError: If the client has been disconnected before.
+        """
+        if self._stopped:
+            raise RuntimeError(ErrorMessages.CLIENT_DISCONNECTED)
+        if self._run_task is None:
+            self._closing = False
+            self._messages = asyncio.Queue(self.max_queue_size)
+            self._run_task = asyncio.ensure_future(self._run())
+
+    async def disconnect(self):
+        """
+        Closes the connection and waits for the socket to shut down.
+        """
+        if self._run_task is not None:
+            self._submit(CloseEvent())
+            if self.connection is None:
+                # Waiting to reconnect, nothing to close.
+                self._run_task.cancel()
+            try:
+                await self._run_task
+            except asyncio.CancelledError:
+                pass
+            self._run_task = None
+
+    async def subscribe_to_exchange_deltas(self, tickers):
+        return await self._wait(super().subscribe_to_exchange_deltas(tickers))
+
+    async def subscribe_to_summary_deltas(self):
+        return await self._wait(super().subscribe_to_summary_deltas())
+
+    async def subscribe_to_summary_lite_deltas(self):
+        return await self._wait(super().subscribe_to_summary_lite_deltas())
+
+    async def query_summary_state(self):
+        return await self._wait(super().query_summary_state())
+
+    async def query_exchange_state(self, tickers):
+        return await self._wait(super().query_exchange_state(tickers))
+
+    async def subscribe_to_order_book(self, tickers):
+        return await self._wait(super().subscribe_to_order_book(tickers))
+
+    async def subscribe_to_summary_table(self, use_numpy=True):
+        return await self._wait(super().subscribe_to_summary_table(use_numpy))
+
+    @staticmethod
+    async def _wait(futures):
+        # Waits for the server to acknowledge the invokes.
+        if isinstance(futures, list):
+            return await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+        return await asyncio.wrap_future(futures)
+
+    async def authenticate(self, api_key, api_secret, timeout=10.0):
+        """
+        Returns once the server has accepted the signed challenge.
+
+        :raises InvokeError: If that did not happen within `timeout` seconds.
+        """
+        return await self._wait(super().authenticate(api_key, api_secret, timeout))
+
+    async def subscribe_to_account_state(self, api_key, api_secret, use_decimal=False):
+        if self.account_state is None:
+            self.account_state = AccountState(use_decimal)
+        await self.authenticate(api_key, api_secret)
+        return self.account_state
+
+    # ======================
+    # Public Channel Methods
+    # ======================
+
+    async def on_public(self, msg):
+        await self._messages.put(msg)
+
+    async def on_private(self, msg):
+        await self._messages.put(msg)
+
+    # ==================
+    # Iterator Interface
+    # ==================
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        msg = await self._messages.get()
+        if msg is None:
+            raise StopAsyncIteration
+        return msg
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/bars.py
+# Stanislav Lazarov
+
+import logging
+from array import array
+from collections import deque
+from operator import itemgetter
+
+from .messages import Bar
+
+logger = logging.getLogger(__name__)
+
+_NAN = float('nan')
+_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'notional', 'trades', 'first', 'last')
+
+
+class BarSeries(object):
+    """
+    Fixed-size ring buffer of consecutive bars of a single market.
+
+    Every interval has a slot, including intervals without fills, so a fill is placed in its
+    bar with index arithmetic even when it arrives late. Open and close follow the fill
+    timestamps rather than the arrival order. Late fills open earlier bars as long as the
+    series holds fewer than `capacity` bars; fills older than that are dropped.
+    """
+
+    def __init__(self, market, interval, capacity):
+        """
+        :param interval: Bar length in seconds.
+        :type interval: int
+        :param capacity: Number of bars kept.
+        :type capacity: int
+        """
+        self.market = market
+        self.interval = interval
+        self.capacity = capacity
+        self.newest = None
+        self._head = -1
+        self._count = 0
+        self._columns = {name: array('d', [0.0]) * capacity for name in _COLUMNS}
+
+    def __len__(self):
+        return self._count
+
+    def _advance(self, start):
+        # Opens empty bars up to and including the one starting at `start`.
+        steps = 1 if self.newest is None else int((start - self.newest) // self.interval)
+        for _ in range(min(steps, self.capacity)):
+            self._head = (self._head + 1) % self.capacity
+            self._clear(self._head)
+        self._count = min(self._count + steps, self.capacity)
+        self.newest = start
+
+    def _backfill(self, offset):
+        # Opens empty bars before the oldest one, down to `offset` bars before the newest.
+        for older in range(self._count, offset + 1):
+            self._clear((self._head - older) % self.capacity)
+        self._count = offset + 1
+
+    def _clear(self, slot):
+        columns = self._columns
+        for name in ('open', 'high', 'low', 'close'):
+            columns[name][slot] = _NAN
+        for name in ('volume', 'notional', 'trades'):
+            columns[name][slot] = 0.0
+
+    def add(self, timestamp, price, quantity):
+        """
+        :param timestamp: Fill time in epoch seconds.
+        :type timestamp: float
+        :return: False if the fill is older than `capacity` bars.
+        :rtype: bool
+        """
+        start = timestamp - timestamp % self.interval
+        if self.newest is None or start > self.newest:
+            self._advance(start)
+        offset = int((self.newest - start) // self.interval)
+        if offset >= self._count:
+            if offset >= self.capacity:
+                return False
+            self._backfill(offset)
+        slot = (self._head - offset) % self.capacity
+        columns = self._columns
+        if not columns['trades'][slot]:
+            columns['open'][slot] = columns['high'][slot] = columns['low'][slot] = columns['close'][slot] = price
+            columns['first'][slot] = columns['last'][slot] = timestamp
+        else:
+            if price > columns['high'][slot]:
+                columns['high'][slot] = price
+            if price < columns['low'][slot]:
+                columns['low'][slot] = price
+            if timestamp < columns['first'][slot]:
+                columns['first'][slot] = timestamp
+                columns['open'][slot] = price
+            if timestamp >= columns['last'][slot]:
+                columns['last'][slot] = timestamp
+                columns['close'][slot] = price
+        columns['volume'][slot] += quantity
+        columns['notional'][slot] += price * quantity
+        columns['trades'][slot] += 1
+        return True
+
+    def bars(self, count=None):
+        """
+        :return: The newest `count` bars, or all of them, oldest first.
+        :rtype: []
+        """
+        count = self._count if count is None else min(count, self._count)
+        columns = self._columns
+        bars = []
+        for offset in range(count - 1, -1, -1):
+            slot = (self._head - offset) % self.capacity
+            volume = columns['volume'][slot]
+            bars.append(Bar(self.market, self.newest - offset * self.interval, columns['open'][slot],
+                            columns['high'][slot], columns['low'][slot], columns['close'][slot], volume,
+                            columns['notional'][slot] / volume if volume else _NAN, int(columns['trades'][slot])))
+        return bars
+
+
+class FillAggregator(object):
+    """
+    Rolls the fills of exchange deltas and `QueryExchangeState` snapshots into OHLCV/VWAP bars.
+
+    Snapshots repeat fills already received as deltas (and the other way round after a
+    resync), so fills are deduplicated by their id over the last `dedupe_window` fills of
+    each market. Memory per market is fixed by `capacity` and `dedupe_window`.
+    """
+
+    def __init__(self, interval=60, capacity=1440, dedupe_window=1000):
+        """
+        :param interval: Bar length in seconds.
+        :type interval: int
+        :param capacity: Bars kept per market.
+        :type capacity: int
+        :param dedupe_window: Fill ids remembered per market.
+        :type dedupe_window: int
+        """
+        self.interval = interval
+        self.capacity = capacity
+        self.dedupe_window = dedupe_window
+        self.series = {}
+        self._seen = {}
+
+    def on_fills(self, market, fills):
+        """
+        :param market: The ticker the fills belong to.
+        :type market: str
+        :param fills: The 'f' list of a `uE` message or a `QueryExchangeState` response.
+        :type fills: []
+        :return: Number of fills in bars still kept once all of them are added.
+        :rtype: int
+        """
+        if not fills:
+            return 0
+        series = self.series.get(market)
+        if series is None:
+            series = self.series[market] = BarSeries(market, self.interval, self.capacity)
+            self._seen[market] = (set(), deque())
+        seen, order = self._seen[market]
+        added = []
+        # Snapshots list the newest fill first.
+        for fill in sorted(fills, key=itemgetter('T')):
+            fill_id = fill.get('FI', fill.get('I'))
+            price = fill['R'] if 'R' in fill else fill['P']
+            if fill_id is None:
+                fill_id = (fill['T'], fill.get('OT'), price, fill['Q'])
+            if fill_id in seen:
+                continue
+            seen.add(fill_id)
+            order.append(fill_id)
+            if len(order) > self.dedupe_window:
+                seen.discard(order.popleft())
+            timestamp = fill['T'] / 1000.0
+            if series.add(timestamp, price, fill['Q']):
+                added.append(timestamp)
+        # Later fills of the same call may have pushed the bars of earlier ones out.
+        oldest = series.newest - (len(series) - 1) * self.interval
+        return sum(1 for timestamp in added if timestamp >= oldest)
+
+    def bars(self, market, count=None):
+        """
+        :return: The newest `count` bars of `market`, or all of them, oldest first.
+        :rtype: []
+        """
+        series = self.series.get(market)
+        return [] if series is None else series.bars(count)
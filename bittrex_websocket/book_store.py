@@ -0,0 +1,256 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/book_store.py
+# Stanislav Lazarov
+
+import logging
+import os
+import struct
+from bisect import bisect_right
+from time import time
+
+from .constants import OrderBookDeltaTypes, ErrorMessages
+from .order_book import OrderBook
+
+logger = logging.getLogger(__name__)
+
+# Every data file starts with the magic and the format version.
+_MAGIC = b'BTXB\x01'
+# Record kind, timestamp, body length
+_RECORD = struct.Struct('<BdI')
+# Checkpoint body: nonce, bid count, ask count, then (rate, quantity) pairs, best first
+# Delta body: nonce, bid count, ask count, then (rate, quantity) pairs, quantity 0 removes the level
+_BODY = struct.Struct('<qII')
+# Index entry: checkpoint timestamp, offset in the data file
+_INDEX = struct.Struct('<dQ')
+_CHECKPOINT = 0
+_DELTA = 1
+_DATA_FILE = 'book.bin'
+_INDEX_FILE = 'book.idx'
+
+
+def _pack(kind, timestamp, nonce, bids, asks):
+    values = [value for level in bids for value in level]
+    values += [value for level in asks for value in level]
+    body = _BODY.pack(nonce, len(bids), len(asks)) + struct.pack('<{}d'.format(len(values)), *values)
+    return _RECORD.pack(kind, timestamp, len(body)) + body
+
+
+def _unpack(body):
+    nonce, bid_count, ask_count = _BODY.unpack_from(body)
+    values = struct.unpack_from('<{}d'.format(2 * (bid_count + ask_count)), body, _BODY.size)
+    split = 2 * bid_count
+    return nonce, values[:split], values[split:]
+
+
+class _MarketFile(object):
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        data_path = os.path.join(path, _DATA_FILE)
+        self.data = open(data_path, 'ab')
+        self.index = open(os.path.join(path, _INDEX_FILE), 'ab')
+        self.offset = self.data.tell()
+        if not self.offset:
+            self.data.write(_MAGIC)
+            self.offset = len(_MAGIC)
+        self.checkpoint_time = None
+        self.deltas = 0
+        # Nonce of the last stored record
+        self.nonce = None
+
+    def write(self, record):
+        self.data.write(record)
+        self.offset += len(record)
+
+    def flush(self):
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class BookStore(object):
+    """
+    On-disk history of local order books for point-in-time reconstruction.
+
+    Each market gets a directory with an append-only data file and a time index. The data
+    file holds full checkpoints of the book, written whenever a `QueryExchangeState`
+    snapshot has been loaded and then every `checkpoint_interval` seconds or
+    `checkpoint_deltas` deltas, and between them the applied `uE` deltas packed as doubles.
+    The index holds the time and offset of every checkpoint, so `book_at` starts from the
+    closest checkpoint before the requested time and replays only the deltas after it.
+
+    Deltas are stored only while the book is synced; after a gap the store resumes with the
+    checkpoint of the next snapshot.
+    """
+
+    def __init__(self, directory, checkpoint_interval=60.0, checkpoint_deltas=1000):
+        """
+        :param directory: Where the market directories are created.
+        :type directory: str
+        :param checkpoint_interval: Seconds between checkpoints of a market.
+        :type checkpoint_interval: float
+        :param checkpoint_deltas: Deltas after which a checkpoint is written regardless of time.
+        :type checkpoint_deltas: int
+        """
+        self.directory = directory
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_deltas = checkpoint_deltas
+        self._files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    # =======
+    # Writing
+    # =======
+
+    def on_snapshot(self, book, timestamp=None):
+        """
+        Writes a checkpoint once `book` has loaded a snapshot.
+
+        :param book: The local order book, after `OrderBook.on_snapshot`.
+        :type book: OrderBook
+        :param timestamp: Receive time, defaults to now.
+        :type timestamp: float
+        """
+        if book.synced:
+            self._checkpoint(book, self._market_file(book.market), time() if timestamp is None else timestamp)
+
+    def on_delta(self, book, msg, timestamp=None):
+        """
+        Writes a delta that `book` has applied.
+
+        :param book: The local order book, after `OrderBook.on_delta`.
+        :type book: OrderBook
+        :param msg: Decoded `uE` message.
+        :type msg: dict
+        :param timestamp: Receive time, defaults to now.
+        :type timestamp: float
+        """
+        market_file = self._files.get(book.market)
+        if market_file is None or market_file.checkpoint_time is None:
+            return
+        if msg['N'] <= market_file.nonce:
+            # Stale or duplicate, the book ignored it.
+            return
+        if not book.synced:
+            # Gap; the next snapshot starts over with a checkpoint.
+            market_file.checkpoint_time = None
+            return
+        timestamp = time() if timestamp is None else timestamp
+        if market_file.deltas >= self.checkpoint_deltas or \
+                timestamp - market_file.checkpoint_time >= self.checkpoint_interval:
+            self._checkpoint(book, market_file, timestamp)
+            return
+        bids = [(delta['R'], 0.0 if delta['TY'] == OrderBookDeltaTypes.REMOVE else delta['Q']) for delta in msg['Z']]
+        asks = [(delta['R'], 0.0 if delta['TY'] == OrderBookDeltaTypes.REMOVE else delta['Q']) for delta in msg['S']]
+        market_file.write(_pack(_DELTA, timestamp, msg['N'], bids, asks))
+        market_file.deltas += 1
+        market_file.nonce = msg['N']
+
+    def flush(self):
+        for market_file in self._files.values():
+            market_file.flush()
+
+    def close(self):
+        for market_file in self._files.values():
+            market_file.close()
+        self._files.clear()
+
+    def _market_file(self, market):
+        market_file = self._files.get(market)
+        if market_file is None:
+            market_file = self._files[market] = _MarketFile(os.path.join(self.directory, market))
+        return market_file
+
+    @staticmethod
+    def _checkpoint(book, market_file, timestamp):
+        offset = market_file.offset
+        market_file.write(_pack(_CHECKPOINT, timestamp, book.nonce, list(book.bids.top()), list(book.asks.top())))
+        market_file.index.write(_INDEX.pack(timestamp, offset))
+        market_file.checkpoint_time = timestamp
+        market_file.deltas = 0
+        market_file.nonce = book.nonce
+
+    # =======
+    # Reading
+    # =======
+
+    def markets(self):
+        """
+        :return: Markets with a stored history.
+        :rtype: []
+        """
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.exists(os.path.join(self.directory, name, _INDEX_FILE)))
+
+    def checkpoints(self, market):
+        """
+        :return: Timestamps of the checkpoints of `market`, oldest first.
+        :rtype: []
+        """
+        return [timestamp for timestamp, _ in self._read_index(market)]
+
+    def book_at(self, market, timestamp):
+        """
+        :param market: The ticker.
+        :type market: str
+        :param timestamp: Point in time, epoch seconds.
+        :type timestamp: float
+        :return: The book as it was at `timestamp`, None if nothing was stored before then.
+        :rtype: OrderBook
+        """
+        index = self._read_index(market)
+        position = bisect_right([entry[0] for entry in index], timestamp) - 1
+        if position < 0:
+            return None
+        if market in self._files:
+            self._files[market].flush()
+        path = os.path.join(self.directory, market, _DATA_FILE)
+        book = OrderBook(market)
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(ErrorMessages.INVALID_BOOK_STORE.format(path))
+            f.seek(index[position][1])
+            kind, _, size = _RECORD.unpack(f.read(_RECORD.size))
+            nonce, bids, asks = _unpack(f.read(size))
+            book.bids.load([{'R': bids[i], 'Q': bids[i + 1]} for i in range(0, len(bids), 2)])
+            book.asks.load([{'R': asks[i], 'Q': asks[i + 1]} for i in range(0, len(asks), 2)])
+            book.nonce = nonce
+            book.synced = True
+            while True:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    break
+                kind, record_time, size = _RECORD.unpack(header)
+                if record_time > timestamp or kind == _CHECKPOINT:
+                    break
+                body = f.read(size)
+                if len(body) < size:
+                    break
+                nonce, bids, asks = _unpack(body)
+                self._apply_side(book.bids, bids)
+                self._apply_side(book.asks, asks)
+                book.nonce = nonce
+        return book
+
+    @staticmethod
+    def _apply_side(side, values):
+        for i in range(0, len(values), 2):
+            if values[i + 1]:
+                side.set(values[i], values[i + 1])
+            else:
+                side.remove(values[i])
+
+    def _read_index(self, market):
+        if market in self._files:
+            self._files[market].flush()
+        path = os.path.join(self.directory, market, _INDEX_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'rb') as f:
+            data = f.read()
+        # An entry cut short by a crash is ignored.
+        return list(_INDEX.iter_unpack(data[:len(data) - len(data) % _INDEX.size]))
@@ -31,6 +31,15 @@ class BittrexParameters(Constant):
     ORDER_DELTA = 'uO'
 
 
+class ReconnectParameters(Constant):
+    # Seconds before the first retry, doubled after every failed attempt up to MAX_DELAY.
+    # The actual wait is drawn uniformly below the limit so that clients do not retry in lockstep.
+    BASE_DELAY = 0.1
+    MAX_DELAY = 30.0
+    # Seconds a connection has to stay up for the backoff to start over
+    RESET_AFTER = 60.0
+
+
 class BittrexMethods(Constant):
     SUBSCRIBE_TO_EXCHANGE_DELTAS = 'SubscribeToExchangeDeltas'
     SUBSCRIBE_TO_SUMMARY_DELTAS = 'SubscribeToSummaryDeltas'
@@ -39,10 +48,95 @@ class BittrexMethods(Constant):
     QUERY_EXCHANGE_STATE = 'QueryExchangeState'
     GET_AUTH_CONTENT = 'GetAuthContext'
     AUTHENTICATE = 'Authenticate'
+    # Methods replayed after a reconnection. The authentication challenge triggers `Authenticate`.
+    PERSISTENT = (SUBSCRIBE_TO_EXCHANGE_DELTAS, SUBSCRIBE_TO_SUMMARY_DELTAS, SUBSCRIBE_TO_SUMMARY_LITE_DELTAS,
+                  GET_AUTH_CONTENT)
+    # Methods whose payload is a list of per-market summary rows
+    SUMMARIES = (SUBSCRIBE_TO_SUMMARY_DELTAS, SUBSCRIBE_TO_SUMMARY_LITE_DELTAS, QUERY_SUMMARY_STATE)
+    # Callback -> subscription it belongs to
+    BY_CALLBACK = {BittrexParameters.MARKET_DELTA: SUBSCRIBE_TO_EXCHANGE_DELTAS,
+                   BittrexParameters.SUMMARY_DELTA: SUBSCRIBE_TO_SUMMARY_DELTAS,
+                   BittrexParameters.SUMMARY_DELTA_LITE: SUBSCRIBE_TO_SUMMARY_LITE_DELTAS}
+
+
+class RecordChannels(Constant):
+    # Channels written by the recorder. The position in ALL is the code stored on disk, append only.
+    ALL = (BittrexParameters.MARKET_DELTA, BittrexParameters.SUMMARY_DELTA, BittrexParameters.SUMMARY_DELTA_LITE,
+           BittrexParameters.BALANCE_DELTA, BittrexParameters.ORDER_DELTA, BittrexMethods.QUERY_EXCHANGE_STATE,
+           BittrexMethods.QUERY_SUMMARY_STATE)
+    PUBLIC = (BittrexParameters.MARKET_DELTA, BittrexParameters.SUMMARY_DELTA, BittrexParameters.SUMMARY_DELTA_LITE)
+    PRIVATE = (BittrexParameters.BALANCE_DELTA, BittrexParameters.ORDER_DELTA)
+    QUERIES = (BittrexMethods.QUERY_EXCHANGE_STATE, BittrexMethods.QUERY_SUMMARY_STATE)
+
+
+class MetricStages(Constant):
+    # Gap between consecutive payloads
+    RECEIVE = 'receive'
+    BASE64 = 'base64'
+    INFLATE = 'inflate'
+    JSON = 'json'
+    # Local state updates and conversion up to the user callback
+    DISPATCH = 'dispatch'
+    HANDLER = 'handler'
+    # Round trip of the health monitor's probe invokes
+    PROBE = 'probe'
+    ALL = (RECEIVE, BASE64, INFLATE, JSON, DISPATCH, HANDLER, PROBE)
+
+
+class DeliveryPolicies(Constant):
+    # What happens to a market's messages once its delivery buffer is full
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    CONFLATE = 'conflate'
+    ALL = (BLOCK, DROP_OLDEST, CONFLATE)
+
+
+class FanoutEncodings(Constant):
+    # Compressed payload as received, or decoded messages packed with `struct`
+    RAW = 'raw'
+    BINARY = 'binary'
+    ALL = (RAW, BINARY)
+
+
+class StallTypes(Constant):
+    # Nothing received at all, not even keep-alives
+    CONNECTION = 'connection'
+    # A summary subscription went quiet
+    CHANNEL = 'channel'
+    # No exchange deltas for a subscribed market
+    MARKET = 'market'
+
+
+class OrderBookDeltaTypes(Constant):
+    ADD = 0
+    REMOVE = 1
+    UPDATE = 2
+
+
+class OrderDeltaTypes(Constant):
+    OPEN = 0
+    PARTIAL = 1
+    FILL = 2
+    CANCEL = 3
+
+
+class JsonBackends(Constant):
+    ORJSON = 'orjson'
+    UJSON = 'ujson'
+    JSON = 'json'
+    # Order in which backends are picked when none is requested
+    PREFERENCE = (ORJSON, UJSON, JSON)
 
 
 class ErrorMessages(Constant):
     INVALID_TICKER_INPUT = 'Tickers must be submitted as a list.'
+    JSON_BACKEND_UNAVAILABLE = 'JSON backend [{}] is not installed.'
+    INVALID_RECORDING = 'File [{}] is not a recording.'
+    INVALID_DELIVERY_POLICY = 'Delivery policy [{}] is not one of DeliveryPolicies.'
+    INVALID_SHARED_REGION = 'File [{}] is not a shared book region.'
+    INVALID_FANOUT_ENCODING = 'Fan-out encoding [{}] is not one of FanoutEncodings.'
+    INVALID_BOOK_STORE = 'File [{}] is not a book store.'
+    CLIENT_DISCONNECTED = 'The client was disconnected and its workers stopped, create a new one to connect again.'
 
 
 class OtherConstants(Constant):
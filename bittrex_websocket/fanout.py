@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/fanout.py
+# Stanislav Lazarov
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from binascii import a2b_base64
+from collections import deque
+
+from .constants import BittrexMethods, RecordChannels, FanoutEncodings, ErrorMessages
+from .summary_table import SummaryColumns
+
+logger = logging.getLogger(__name__)
+
+# Frame
+# -----
+# Body length (uint32), channel code (uint8, position in `RecordChannels.ALL`),
+# ticker length (uint8), ticker (ascii, that of a query response, empty otherwise), body.
+#
+# RAW body: the deflated payload as received, base64 already stripped.
+# BINARY body, little-endian:
+#   Exchange deltas and states: ticker (uint8 length + ascii), nonce (int64, -1 if none),
+#     bid, ask and fill counts (uint16 each), levels (type uint8, rate, quantity),
+#     fills (side uint8 0 buy/1 sell, rate, quantity, timestamp int64 ms).
+#   Summaries: nonce (int64), row count (uint16), rows (ticker, `SummaryColumns.NAMES` as doubles, NaN if missing).
+#   Balance and order deltas: the decoded message as UTF-8 JSON.
+_FRAME = struct.Struct('<IBB')
+_EXCHANGE = struct.Struct('<qHHH')
+_SUMMARIES = struct.Struct('<qH')
+_ROW = struct.Struct('<{}d'.format(len(SummaryColumns.NAMES)))
+_NAN = float('nan')
+_CODES = {channel: code for code, channel in enumerate(RecordChannels.ALL)}
+# Public subscription -> callback channel
+_CHANNELS = {method: channel for channel, method in BittrexMethods.BY_CALLBACK.items()}
+_ROW_KEYS = tuple(SummaryColumns.ALL[name] for name in SummaryColumns.NAMES)
+
+
+def _ticker(market):
+    name = market.encode('ascii')
+    return bytes((len(name),)) + name
+
+
+def _encode_exchange(msg):
+    bids, asks, fills = msg.get('Z') or (), msg.get('S') or (), msg.get('f') or ()
+    nonce = msg.get('N')
+    values = []
+    for level in bids:
+        values += (level.get('TY', 0), level['R'], level['Q'])
+    for level in asks:
+        values += (level.get('TY', 0), level['R'], level['Q'])
+    for fill in fills:
+        values += (0 if fill.get('OT') == 'BUY' else 1, fill['R'] if 'R' in fill else fill['P'], fill['Q'], fill['T'])
+    layout = '<' + 'Bdd' * (len(bids) + len(asks)) + 'Bddq' * len(fills)
+    return b''.join((_ticker(msg.get('M') or msg.get('ticker') or ''),
+                     _EXCHANGE.pack(-1 if nonce is None else nonce, len(bids), len(asks), len(fills)),
+                     struct.pack(layout, *values)))
+
+
+def _encode_summaries(msg, rows):
+    nonce = msg.get('N')
+    parts = [_SUMMARIES.pack(-1 if nonce is None else nonce, len(rows))]
+    for row in rows:
+        get = row.get
+        parts.append(_ticker(row['M']))
+        parts.append(_ROW.pack(*[_NAN if get(key) is None else get(key) for key in _ROW_KEYS]))
+    return b''.join(parts)
+
+
+def encode_binary(channel, msg):
+    """
+    :param channel: The channel the message was received in, one of `RecordChannels.ALL`.
+    :type channel: str
+    :param msg: The decoded message.
+    :type msg: dict
+    :return: The BINARY frame body.
+    :rtype: bytes
+    """
+    if channel == BittrexMethods.QUERY_SUMMARY_STATE:
+        return _encode_summaries(msg, msg['s'])
+    elif channel in RecordChannels.PRIVATE:
+        return json.dumps(msg).encode()
+    elif 'D' in msg:
+        return _encode_summaries(msg, msg['D'])
+    return _encode_exchange(msg)
+
+
+class _Client(object):
+    def __init__(self, writer, max_queue):
+        self.writer = writer
+        self.queue = deque(maxlen=max_queue)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+
+
+class FanoutServer(object):
+    """
+    Forwards the stream to any number of local processes over a Unix domain socket.
+
+    Each message is framed once and the same buffer is queued for every client. Every client
+    has its own bounded queue and writer task, so a slow reader only loses its own oldest
+    frames instead of holding up the socket or the other clients. With RAW encoding the
+    payloads are forwarded without being decoded, with BINARY the decoded messages are
+    packed with `struct`, see the frame layout above. Query responses are forwarded as well,
+    clients rebuild their state from them after a reconnection.
+
+    The server is started on the event loop of the socket when the first message arrives.
+    """
+
+    def __init__(self, path, encoding=FanoutEncodings.RAW, max_queue=10000):
+        """
+        :param path: Path of the Unix domain socket. An existing file is replaced.
+        :type path: str
+        :param encoding: One of `FanoutEncodings`.
+        :type encoding: str
+        :param max_queue: Frames buffered per client.
+        :type max_queue: int
+        """
+        if encoding not in FanoutEncodings.ALL:
+            raise ValueError(ErrorMessages.INVALID_FANOUT_ENCODING.format(encoding))
+        self.path = path
+        self.encoding = encoding
+        self.max_queue = max(1, max_queue)
+        self.clients = set()
+        self.dropped = 0
+        self._loop = None
+        self._server = None
+
+    def publish_raw(self, channel, payload, ticker=None):
+        """
+        :param channel: One of `RecordChannels.ALL`.
+        :type channel: str
+        :param payload: Base64 encoded, deflated payload as received.
+        :type payload: str
+        :param ticker: The ticker of a query response.
+        :type ticker: str
+        """
+        self._ensure_server()
+        if self.clients:
+            self._publish(channel, a2b_base64(payload), ticker)
+
+    def publish_message(self, channel, msg, ticker=None):
+        """
+        :param channel: One of `RecordChannels.ALL`, or a public subscription method.
+        :type channel: str
+        :param msg: The decoded message.
+        :type msg: dict
+        :param ticker: The ticker of a query response.
+        :type ticker: str
+        """
+        self._ensure_server()
+        if self.clients:
+            channel = _CHANNELS.get(channel, channel)
+            self._publish(channel, encode_binary(channel, msg), ticker)
+
+    def _publish(self, channel, body, ticker):
+        name = ticker.encode('ascii') if ticker else b''
+        frame = b''.join((_FRAME.pack(len(body), _CODES[channel], len(name)), name, body))
+        for client in self.clients:
+            if len(client.queue) == self.max_queue:
+                client.dropped += 1
+                self.dropped += 1
+            client.queue.append(frame)
+            client.ready.set()
+
+    def stop(self):
+        # Usually called from the control thread, hence the thread-safe close.
+        if self._server is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._close)
+
+    def _close(self):
+        self._server.close()
+        # Clients probing the path must not find a socket nobody listens on.
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        for client in list(self.clients):
+            client.writer.close()
+            # Wakes up its task, which then exits.
+            client.closed = True
+            client.ready.set()
+        self.clients.clear()
+
+    def _ensure_server(self):
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop:
+            if self._server is not None:
+                self._close()
+            self._loop = loop
+            self._server = None
+            asyncio.ensure_future(self._start(), loop=loop)
+
+    async def _start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._on_client, path=self.path)
+        logger.info('Fan-out server listening on [{}].'.format(self.path))
+
+    async def _on_client(self, reader, writer):
+        client = _Client(writer, self.max_queue)
+        self.clients.add(client)
+        try:
+            while not client.closed:
+                if not client.queue:
+                    client.ready.clear()
+                    await client.ready.wait()
+                    continue
+                frames = list(client.queue)
+                client.queue.clear()
+                writer.writelines(frames)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            if client.dropped:
+                logger.warning('Fan-out client dropped [{}] frames.'.format(client.dropped))
@@ -0,0 +1,267 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/messages.py
+# Stanislav Lazarov
+
+# Compact, typed representations of the minified Bittrex payloads.
+# For the key mapping check _abc.py or https://github.com/Bittrex/beta
+
+from decimal import Decimal
+
+from .constants import BittrexMethods
+
+
+class Message(object):
+    """
+    Message is base class providing an interface
+    for all subsequent(inherited) messages.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__)
+        return '{}({})'.format(type(self).__name__, fields)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+class OrderLevel(Message):
+    """
+    Price level of a snapshot (type is None) or a delta (ADD = 0, REMOVE = 1, UPDATE = 2).
+    """
+
+    __slots__ = ('type', 'rate', 'quantity')
+
+    def __init__(self, type, rate, quantity):
+        self.type = type
+        self.rate = rate
+        self.quantity = quantity
+
+
+class Fill(Message):
+    __slots__ = ('id', 'order_type', 'rate', 'quantity', 'timestamp')
+
+    def __init__(self, id, order_type, rate, quantity, timestamp):
+        self.id = id
+        self.order_type = order_type
+        self.rate = rate
+        self.quantity = quantity
+        self.timestamp = timestamp
+
+
+class Bar(Message):
+    """
+    OHLCV bar of a market's fills; start is the epoch second the bar opens at.
+    Prices are NaN and volume is 0 for intervals without fills.
+    """
+
+    __slots__ = ('market', 'start', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'trades')
+
+    def __init__(self, market, start, open, high, low, close, volume, vwap, trades):
+        self.market = market
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.vwap = vwap
+        self.trades = trades
+
+
+class MarketDelta(Message):
+    """
+    Exchange delta (`uE`) or exchange state snapshot (`QueryExchangeState`).
+    """
+
+    __slots__ = ('invoke_type', 'market', 'nonce', 'buys', 'sells', 'fills')
+
+    def __init__(self, invoke_type, market, nonce, buys, sells, fills):
+        self.invoke_type = invoke_type
+        self.market = market
+        self.nonce = nonce
+        self.buys = buys
+        self.sells = sells
+        self.fills = fills
+
+
+class SummaryDelta(Message):
+    """
+    Single market row of a summary delta, lite delta or summary state.
+    Lite deltas only carry market, last and base_volume; the rest is None.
+    """
+
+    __slots__ = ('market', 'high', 'low', 'volume', 'last', 'base_volume', 'timestamp', 'bid', 'ask',
+                 'open_buy_orders', 'open_sell_orders', 'prev_day', 'created')
+
+    def __init__(self, market, high, low, volume, last, base_volume, timestamp, bid, ask,
+                 open_buy_orders, open_sell_orders, prev_day, created):
+        self.market = market
+        self.high = high
+        self.low = low
+        self.volume = volume
+        self.last = last
+        self.base_volume = base_volume
+        self.timestamp = timestamp
+        self.bid = bid
+        self.ask = ask
+        self.open_buy_orders = open_buy_orders
+        self.open_sell_orders = open_sell_orders
+        self.prev_day = prev_day
+        self.created = created
+
+
+class Summaries(Message):
+    """
+    Summary delta (`uS`), lite delta (`uL`) or summary state (`QuerySummaryState`).
+    """
+
+    __slots__ = ('invoke_type', 'nonce', 'deltas')
+
+    def __init__(self, invoke_type, nonce, deltas):
+        self.invoke_type = invoke_type
+        self.nonce = nonce
+        self.deltas = deltas
+
+
+class BalanceDelta(Message):
+    __slots__ = ('nonce', 'uuid', 'account_id', 'currency', 'balance', 'available', 'pending',
+                 'crypto_address', 'requested', 'updated', 'auto_sell')
+
+    def __init__(self, nonce, uuid, account_id, currency, balance, available, pending,
+                 crypto_address, requested, updated, auto_sell):
+        self.nonce = nonce
+        self.uuid = uuid
+        self.account_id = account_id
+        self.currency = currency
+        self.balance = balance
+        self.available = available
+        self.pending = pending
+        self.crypto_address = crypto_address
+        self.requested = requested
+        self.updated = updated
+        self.auto_sell = auto_sell
+
+
+class OrderDelta(Message):
+    """
+    Order update; type is OPEN = 0, PARTIAL = 1, FILL = 2, CANCEL = 3.
+    """
+
+    __slots__ = ('nonce', 'account_id', 'type', 'uuid', 'id', 'order_uuid', 'market', 'order_type',
+                 'quantity', 'quantity_remaining', 'limit', 'commission_paid', 'price', 'price_per_unit',
+                 'opened', 'closed', 'is_open', 'cancel_initiated', 'immediate_or_cancel',
+                 'is_conditional', 'condition', 'condition_target', 'updated')
+
+    def __init__(self, nonce, account_id, type, uuid, id, order_uuid, market, order_type, quantity,
+                 quantity_remaining, limit, commission_paid, price, price_per_unit, opened, closed,
+                 is_open, cancel_initiated, immediate_or_cancel, is_conditional, condition,
+                 condition_target, updated):
+        self.nonce = nonce
+        self.account_id = account_id
+        self.type = type
+        self.uuid = uuid
+        self.id = id
+        self.order_uuid = order_uuid
+        self.market = market
+        self.order_type = order_type
+        self.quantity = quantity
+        self.quantity_remaining = quantity_remaining
+        self.limit = limit
+        self.commission_paid = commission_paid
+        self.price = price
+        self.price_per_unit = price_per_unit
+        self.opened = opened
+        self.closed = closed
+        self.is_open = is_open
+        self.cancel_initiated = cancel_initiated
+        self.immediate_or_cancel = immediate_or_cancel
+        self.is_conditional = is_conditional
+        self.condition = condition
+        self.condition_target = condition_target
+        self.updated = updated
+
+
+def _to_decimal(value):
+    # repr() of a parsed float is the shortest string that round-trips, i.e. the value Bittrex sent.
+    return None if value is None else Decimal(repr(value))
+
+
+def _to_float(value):
+    return value
+
+
+class MessageFactory(object):
+    """
+    Builds typed messages from decoded payloads.
+    """
+
+    def __init__(self, use_decimal=False):
+        """
+        :param use_decimal: Represent rates, quantities and balances as Decimal instead of float.
+        :type use_decimal: bool
+        """
+        self.use_decimal = use_decimal
+        self.num = _to_decimal if use_decimal else _to_float
+
+    def public(self, msg):
+        """
+        :param msg: Decoded public or query message carrying an `invoke_type` key.
+        :type msg: dict
+        """
+        invoke_type = msg['invoke_type']
+        if invoke_type in (BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, BittrexMethods.QUERY_EXCHANGE_STATE):
+            return self.market_delta(msg)
+        elif invoke_type == BittrexMethods.QUERY_SUMMARY_STATE:
+            return Summaries(invoke_type, msg.get('N'), [self.summary_delta(row) for row in msg['s']])
+        elif invoke_type in (BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS,
+                             BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS):
+            return Summaries(invoke_type, msg.get('N'), [self.summary_delta(row) for row in msg['D']])
+        return msg
+
+    def private(self, msg):
+        """
+        :param msg: Decoded `uB` or `uO` message.
+        :type msg: dict
+        """
+        if 'd' in msg:
+            return self.balance_delta(msg)
+        elif 'o' in msg:
+            return self.order_delta(msg)
+        return msg
+
+    def market_delta(self, msg):
+        num = self.num
+        buys = [OrderLevel(level.get('TY'), num(level['R']), num(level['Q'])) for level in msg['Z']]
+        sells = [OrderLevel(level.get('TY'), num(level['R']), num(level['Q'])) for level in msg['S']]
+        # Snapshot fills carry their id in 'I', delta fills in 'FI'.
+        fills = [Fill(fill.get('I', fill.get('FI')), fill['OT'], num(fill['R'] if 'R' in fill else fill['P']),
+                      num(fill['Q']), fill['T'])
+                 for fill in msg['f']]
+        market = msg['M'] if msg.get('M') is not None else msg.get('ticker')
+        return MarketDelta(msg['invoke_type'], market, msg['N'], buys, sells, fills)
+
+    def summary_delta(self, row):
+        num = self.num
+        get = row.get
+        return SummaryDelta(row['M'], num(get('H')), num(get('L')), num(get('V')), num(get('l')), num(get('m')),
+                            get('T'), num(get('B')), num(get('A')), get('G'), get('g'), num(get('PD')), get('x'))
+
+    def balance_delta(self, msg):
+        num = self.num
+        d = msg['d']
+        return BalanceDelta(msg.get('N'), d.get('U'), d.get('W'), d['c'], num(d.get('b')), num(d.get('a')),
+                            num(d.get('z')), d.get('p'), d.get('r'), d.get('u'), d.get('h'))
+
+    def order_delta(self, msg):
+        num = self.num
+        o = msg['o']
+        get = o.get
+        return OrderDelta(msg.get('N'), msg.get('w'), msg.get('TY'), get('U'), get('I'), get('OU'), get('E'),
+                          get('OT'), num(get('Q')), num(get('q')), num(get('X')), num(get('n')), num(get('P')),
+                          num(get('PU')), get('Y'), get('C'), get('i'), get('CI'), get('K'), get('k'), get('J'),
+                          get('j'), get('u'))
@@ -0,0 +1,168 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/metrics.py
+# Stanislav Lazarov
+
+import logging
+from bisect import bisect_left
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+
+from .constants import MetricStages
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds: powers of two from 1us to ~16s.
+_BOUNDS = [1e-6 * 2 ** i for i in range(25)]
+
+
+class Histogram(object):
+    """
+    Fixed log2 buckets, cheap enough to record every message.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        :return: Upper bound of the bucket holding the percentile, in seconds.
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_BOUNDS[i], self.max) if i < len(_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+        counts = list(self.counts)
+        cumulative, buckets = 0, []
+        for bound, count in zip(_BOUNDS + [float('inf')], counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'count': self.count, 'sum': self.total, 'mean': self.total / self.count if self.count else 0.0,
+                'p50': self.percentile(0.5), 'p90': self.percentile(0.9), 'p99': self.percentile(0.99),
+                'max': self.max, 'buckets': buckets}
+
+
+class Metrics(object):
+    """
+    Per-stage timing histograms and counters of the receive path.
+
+    Stages are listed in `MetricStages`. Decoding stages are only timed when messages are
+    decoded inline; with a decode pool the work happens in the workers.
+    """
+
+    def __init__(self):
+        self.stages = {stage: Histogram() for stage in MetricStages.ALL}
+        self.messages = {}
+        self.bytes = {}
+        self.counters = {}
+        self._last_receive = None
+
+    def observe(self, stage, seconds):
+        self.stages[stage].observe(seconds)
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def on_receive(self, channel, size, now):
+        """
+        Counts a payload and records the gap since the previous one.
+        Long gaps point to the exchange or the network rather than to the client.
+        """
+        self.messages[channel] = self.messages.get(channel, 0) + 1
+        self.bytes[channel] = self.bytes.get(channel, 0) + size
+        if self._last_receive is not None:
+            self.stages[MetricStages.RECEIVE].observe(now - self._last_receive)
+        self._last_receive = now
+
+    def snapshot(self):
+        # Runs in the caller's thread while the loop keeps recording: dicts are copied, which is
+        # atomic, before anything iterates over them.
+        stages = dict(self.stages)
+        return {'stages': {stage: histogram.snapshot() for stage, histogram in stages.items()},
+                'messages': dict(self.messages), 'bytes': dict(self.bytes), 'counters': dict(self.counters)}
+
+
+def render_prometheus(stats, prefix='bittrex'):
+    """
+    Renders the output of `BittrexSocket.stats` in the Prometheus text format.
+
+    :rtype: str
+    """
+    lines = []
+    for name, key, label in (('messages_total', 'messages', 'channel'), ('bytes_total', 'bytes', 'channel'),
+                             ('dropped_total', 'dropped', 'market')):
+        lines.append('# TYPE {}_{} counter'.format(prefix, name))
+        for value_label, value in sorted(stats.get(key, {}).items(), key=lambda item: str(item[0])):
+            lines.append('{}_{}{{{}="{}"}} {}'.format(prefix, name, label, value_label, value))
+    for name, value in sorted(stats.get('counters', {}).items()):
+        lines.append('# TYPE {}_{}_total counter'.format(prefix, name))
+        lines.append('{}_{}_total {}'.format(prefix, name, value))
+    for name, value in sorted(stats.get('gauges', {}).items()):
+        lines.append('# TYPE {}_{} gauge'.format(prefix, name))
+        lines.append('{}_{} {}'.format(prefix, name, value))
+    if stats.get('stages'):
+        metric = '{}_stage_seconds'.format(prefix)
+        lines.append('# TYPE {} histogram'.format(metric))
+        for stage, histogram in sorted(stats['stages'].items()):
+            for bound, count in histogram['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_bucket{{stage="{}",le="{}"}} {}'.format(metric, stage, le, count))
+            lines.append('{}_sum{{stage="{}"}} {}'.format(metric, stage, histogram['sum']))
+            lines.append('{}_count{{stage="{}"}} {}'.format(metric, stage, histogram['count']))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer(object):
+    """
+    Serves `render_prometheus(stats())` on /metrics from a daemon thread.
+    """
+
+    def __init__(self, stats, host='127.0.0.1', port=9100):
+        """
+        :param stats: Callable returning the stats dict to render.
+        """
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render_prometheus(stats()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer((host, port), Handler)
+        thread = Thread(target=self.server.serve_forever, daemon=True, name='MetricsServerThread')
+        thread.start()
+        logger.info('Serving metrics on http://{}:{}/metrics.'.format(host, self.server.server_port))
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
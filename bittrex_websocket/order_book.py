@@ -0,0 +1,234 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/order_book.py
+# Stanislav Lazarov
+
+import logging
+from bisect import bisect_left
+
+from .constants import OrderBookDeltaTypes
+
+logger = logging.getLogger(__name__)
+
+
+class BookSide(object):
+    """
+    One side of an order book, kept as a dict of price levels plus a sorted list of keys.
+
+    Keys are ordered so that the best price sits at the end of the list. Most deltas arrive
+    near the top of the book, so inserts and removals only shift a few elements.
+    """
+
+    __slots__ = ('_levels', '_keys', '_sign')
+
+    def __init__(self, descending):
+        self._levels = {}
+        self._keys = []
+        # Bids are best at the highest price, asks at the lowest one.
+        self._sign = 1 if descending else -1
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, price):
+        return price in self._levels
+
+    def clear(self):
+        self._levels.clear()
+        del self._keys[:]
+
+    def load(self, levels):
+        """
+        Replaces the contents of the side with a snapshot.
+
+        :param levels: Minified snapshot levels, e.g. [{'Q': 1.0, 'R': 0.05}].
+        :type levels: []
+        """
+        self._levels = {level['R']: level['Q'] for level in levels}
+        sign = self._sign
+        self._keys = sorted(price * sign for price in self._levels)
+
+    def set(self, price, quantity):
+        if price not in self._levels:
+            key = price * self._sign
+            keys = self._keys
+            keys.insert(bisect_left(keys, key), key)
+        self._levels[price] = quantity
+
+    def remove(self, price):
+        if self._levels.pop(price, None) is not None:
+            key = price * self._sign
+            keys = self._keys
+            del keys[bisect_left(keys, key)]
+
+    def best(self):
+        """
+        :return: (price, quantity) of the best level or None if the side is empty.
+        """
+        if self._keys:
+            price = self._keys[-1] * self._sign
+            return price, self._levels[price]
+
+    def top(self, depth=None):
+        """
+        Iterates over the levels from the best price outwards without copying the book.
+
+        :param depth: Maximum number of levels to yield. All levels if None.
+        :type depth: int
+        """
+        keys, levels, sign = self._keys, self._levels, self._sign
+        stop = -1 if depth is None else max(len(keys) - depth, 0) - 1
+        for i in range(len(keys) - 1, stop, -1):
+            price = keys[i] * sign
+            yield price, levels[price]
+
+    def quantity_at(self, price):
+        return self._levels.get(price, 0.0)
+
+
+class OrderBook(object):
+    """
+    Local order book for a single market.
+
+    The book is seeded from a `QueryExchangeState` snapshot and kept up to date with
+    `SubscribeToExchangeDeltas` messages. Deltas received before the snapshot are buffered
+    and replayed on top of it once it arrives.
+
+    Every delta must carry the nonce following the last applied one. Stale deltas are
+    dropped, while a gap puts the book back into buffering mode and is reported to the
+    caller, which is expected to query a fresh snapshot for the market.
+
+    While a fresh snapshot is awaited the last known levels are kept and `stale` is set,
+    so readers can keep serving them knowing they may be out of date.
+    """
+
+    # Buffered deltas kept while waiting for a snapshot before asking for another one.
+    MAX_BUFFER = 5000
+
+    def __init__(self, market):
+        self.market = market
+        self.nonce = None
+        self.synced = False
+        self.stale = False
+        self.gaps = 0
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self._buffer = []
+
+    def reset(self):
+        """
+        Drops the book state and starts buffering deltas until a new snapshot arrives.
+        """
+        self.nonce = None
+        self.synced = False
+        self.stale = False
+        self.bids.clear()
+        self.asks.clear()
+        del self._buffer[:]
+
+    def invalidate(self):
+        """
+        Keeps the levels as a stale warm-start copy and buffers deltas until a new snapshot arrives.
+        Used after a reconnection, when deltas missed in between can no longer be recovered.
+        """
+        self.nonce = None
+        self.synced = False
+        self.stale = True
+        del self._buffer[:]
+
+    def on_snapshot(self, msg):
+        """
+        Loads a `QueryExchangeState` response and replays buffered deltas newer than it.
+
+        :param msg: Decoded `QueryExchangeState` message.
+        :type msg: dict
+        :return: True if the buffered deltas do not connect to the snapshot and a new one is needed.
+        :rtype: bool
+        """
+        self.bids.load(msg['Z'])
+        self.asks.load(msg['S'])
+        self.nonce = msg['N']
+        self.synced = True
+        self.stale = False
+        buffered, self._buffer = sorted(self._buffer, key=lambda delta: delta['N']), []
+        for i, delta in enumerate(buffered):
+            if delta['N'] > self.nonce + 1:
+                self._on_gap(delta['N'])
+                self._buffer = buffered[i:]
+                return True
+            elif delta['N'] == self.nonce + 1:
+                self._apply(delta)
+        logger.info('Order book for [{}] synced at nonce [{}].'.format(self.market, self.nonce))
+        return False
+
+    def on_delta(self, msg):
+        """
+        Applies a `SubscribeToExchangeDeltas` message or buffers it while the book is not synced.
+
+        :param msg: Decoded `uE` message.
+        :type msg: dict
+        :return: True if the book lost sync and a new snapshot has to be queried.
+        :rtype: bool
+        """
+        if self.synced:
+            nonce = msg['N']
+            if nonce == self.nonce + 1:
+                self._apply(msg)
+            elif nonce > self.nonce:
+                self._on_gap(nonce)
+                self._buffer.append(msg)
+                return True
+            else:
+                logger.debug('Dropping stale delta [{}] for [{}] at nonce [{}].'.format(
+                    nonce, self.market, self.nonce))
+        else:
+            self._buffer.append(msg)
+            if len(self._buffer) > self.MAX_BUFFER:
+                # The snapshot never arrived; keep the newest half and ask again.
+                del self._buffer[:len(self._buffer) // 2]
+                return True
+        return False
+
+    def _on_gap(self, nonce):
+        logger.warning('Nonce gap for [{}]: expected [{}], received [{}].'.format(
+            self.market, self.nonce + 1, nonce))
+        self.gaps += 1
+        self.synced = False
+        self.stale = True
+
+    def _apply(self, msg):
+        self._apply_side(self.bids, msg['Z'])
+        self._apply_side(self.asks, msg['S'])
+        self.nonce = msg['N']
+
+    @staticmethod
+    def _apply_side(side, deltas):
+        for delta in deltas:
+            if delta['TY'] == OrderBookDeltaTypes.REMOVE:
+                side.remove(delta['R'])
+            else:
+                # ADD and UPDATE both set the resting quantity at the price level.
+                side.set(delta['R'], delta['Q'])
+
+    # ==============
+    # Query Methods
+    # ==============
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def top_bids(self, depth):
+        return self.bids.top(depth)
+
+    def top_asks(self, depth):
+        return self.asks.top(depth)
+
+    def bid_depth_at(self, price):
+        return self.bids.quantity_at(price)
+
+    def ask_depth_at(self, price):
+        return self.asks.quantity_at(price)
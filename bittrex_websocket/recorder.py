@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/recorder.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+import os
+import struct
+from functools import partial
+from time import time, monotonic
+
+from .constants import RecordChannels, ErrorMessages
+
+logger = logging.getLogger(__name__)
+
+# Every segment starts with the magic and the format version.
+_MAGIC = b'BTXR\x01'
+# Receive timestamp, channel code, ticker length, payload length
+_HEADER = struct.Struct('<dBHI')
+_CHANNEL_CODES = {channel: code for code, channel in enumerate(RecordChannels.ALL)}
+
+
+class Recorder(object):
+    """
+    Appends the raw compressed payloads received by a socket to a segmented binary log.
+
+    Payloads are stored exactly as received (base64 encoded deflate) together with their
+    receive timestamp and channel, so recordings stay small and replaying them exercises
+    the full decode path. A new segment is started once the current one reaches
+    `segment_size` bytes; existing segments are never rewritten.
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, prefix='bittrex'):
+        """
+        :param directory: Where segments are written. Created if missing.
+        :type directory: str
+        :param segment_size: Size in bytes after which a new segment is started.
+        :type segment_size: int
+        :param prefix: File name prefix of the segments.
+        :type prefix: str
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.prefix = prefix
+        self.records = 0
+        self._file = None
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        existing = segment_paths(directory, prefix)
+        self._index = _segment_index(existing[-1]) + 1 if existing else 0
+
+    def write(self, channel, payload, ticker=None, timestamp=None):
+        """
+        :param channel: One of `RecordChannels.ALL`.
+        :type channel: str
+        :param payload: The raw payload as received.
+        :type payload: str
+        :param ticker: The ticker of a query response.
+        :type ticker: str
+        :param timestamp: Receive time, defaults to now.
+        :type timestamp: float
+        """
+        if self._file is None or self._size >= self.segment_size:
+            self._rotate()
+        data = payload.encode('ascii') if type(payload) is str else payload
+        name = ticker.encode('ascii') if ticker else b''
+        record = _HEADER.pack(time() if timestamp is None else timestamp, _CHANNEL_CODES[channel],
+                              len(name), len(data))
+        self._file.write(record)
+        self._file.write(name)
+        self._file.write(data)
+        self._size += len(record) + len(name) + len(data)
+        self.records += 1
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        self.close()
+        path = os.path.join(self.directory, '{}-{:08d}.log'.format(self.prefix, self._index))
+        self._index += 1
+        self._file = open(path, 'ab')
+        self._file.write(_MAGIC)
+        self._size = len(_MAGIC)
+        logger.info('Recording to {}.'.format(path))
+
+
+def _segment_index(path):
+    return int(os.path.basename(path).rsplit('-', 1)[1].split('.')[0])
+
+
+def segment_paths(directory, prefix='bittrex'):
+    """
+    :return: The segments of a recording, oldest first.
+    :rtype: []
+    """
+    names = [name for name in os.listdir(directory)
+             if name.startswith(prefix + '-') and name.endswith('.log')]
+    return sorted((os.path.join(directory, name) for name in names), key=_segment_index)
+
+
+def read_records(path, prefix='bittrex'):
+    """
+    Iterates over a segment, or over all segments of a directory in order.
+
+    A record cut short by a crash ends its segment.
+
+    :return: Generator of (timestamp, channel, ticker, payload).
+    """
+    paths = segment_paths(path, prefix) if os.path.isdir(path) else [path]
+    for segment in paths:
+        with open(segment, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(ErrorMessages.INVALID_RECORDING.format(segment))
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                timestamp, code, name_size, data_size = _HEADER.unpack(header)
+                name = f.read(name_size)
+                data = f.read(data_size)
+                if len(data) < data_size:
+                    logger.warning('Truncated record at the end of {}.'.format(segment))
+                    break
+                yield timestamp, RecordChannels.ALL[code], name.decode('ascii') or None, data.decode('ascii')
+
+
+class Replayer(object):
+    """
+    Feeds a recording back through a socket's message handlers, offline.
+
+    Public and private payloads go through `_on_public`/`_on_private` and query responses
+    through the same path as live ones, so local order books and the summary table are
+    rebuilt exactly as they were. Use a socket that is not connected, e.g. an
+    `AsyncBittrexSocket` on which `connect` is never called.
+    """
+
+    def __init__(self, path, speed=1.0, prefix='bittrex'):
+        """
+        :param path: A segment or a directory of segments.
+        :type path: str
+        :param speed: Multiple of the original pace, None to replay as fast as possible.
+        :type speed: float
+        :param prefix: File name prefix of the segments.
+        :type prefix: str
+        """
+        self.path = path
+        self.speed = speed
+        self.prefix = prefix
+
+    async def replay(self, socket):
+        """
+        :param socket: The socket whose handlers receive the messages.
+        :type socket: BittrexSocket
+        :return: Number of replayed records.
+        :rtype: int
+        """
+        count = 0
+        start = first = None
+        for timestamp, channel, ticker, payload in read_records(self.path, self.prefix):
+            if self.speed:
+                if first is None:
+                    start, first = monotonic(), timestamp
+                delay = (timestamp - first) / self.speed - (monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if channel in RecordChannels.PUBLIC:
+                await socket._on_public([payload], channel)
+            elif channel in RecordChannels.PRIVATE:
+                await socket._on_private([payload], channel)
+            else:
+                await socket._decode(payload, partial(socket._on_query_message, channel, ticker))
+            count += 1
+        return count
@@ -0,0 +1,322 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/sharded_client.py
+# Stanislav Lazarov
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from queue import Queue, Empty
+from threading import Thread, Lock
+
+from ._abc import WebSocket
+from ._logger import add_stream_logger, remove_stream_logger
+from .constants import BittrexMethods, ErrorMessages
+from .websocket_client import BittrexSocket
+
+logger = logging.getLogger(__name__)
+
+# Seconds a reconnecting shard process waits for the parent to rebalance its markets.
+_REBALANCE_TIMEOUT = 5.0
+# Records handed to the user callbacks per event loop run.
+_DISPATCH_BATCH = 256
+
+
+class _Shard(BittrexSocket):
+    """
+    One connection of a `ShardedBittrexSocket`, forwarding every message to a shared sink.
+    """
+
+    def __init__(self, shard_id, sink, rebalance, url=None, json_backend=None):
+        self.shard_id = shard_id
+        self.sink = sink
+        self.rebalance = rebalance
+        super().__init__(url, json_backend)
+
+    def _prepare_reconnect(self):
+        # A fresh connection is the only chance to shed markets, Bittrex has no unsubscribe.
+        for ticker in self.rebalance(self.shard_id):
+            self.invokes.subscriptions.pop((BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, ticker), None)
+            self.order_books.pop(ticker, None)
+        return super()._prepare_reconnect()
+
+    async def on_public(self, msg):
+        self.sink(('public', self.shard_id, msg))
+
+    async def on_private(self, msg):
+        self.sink(('private', self.shard_id, msg))
+
+
+def _run_shard_process(shard_id, url, json_backend, records, commands, replies):
+    requests = [0]
+
+    def rebalance(shard_id):
+        # Replies carry the number of the request they answer. An answer that arrived after its
+        # request timed out is still applied, the parent has moved those markets already.
+        requests[0] += 1
+        records.put(('reconnect', shard_id, requests[0]))
+        deadline = time.monotonic() + _REBALANCE_TIMEOUT
+        tickers = []
+        while True:
+            try:
+                request, moved = replies.get(timeout=max(0.0, deadline - time.monotonic()))
+            except Empty:
+                return tickers
+            tickers += moved
+            if request == requests[0]:
+                return tickers
+
+    shard = _Shard(shard_id, records.put, rebalance, url, json_backend)
+    while True:
+        name, args = commands.get()
+        getattr(shard, name)(*args)
+        if name == 'disconnect':
+            shard.threads[0].join(_REBALANCE_TIMEOUT)
+            break
+
+
+class ShardedBittrexSocket(WebSocket):
+    """
+    Spreads markets over several connections, optionally each in its own process.
+
+    Every ticker is owned by exactly one shard, picked by the lowest message load, so the
+    merged stream handed to `on_public` keeps the order of each market. When a shard
+    reconnects it can hand its busiest markets over to quieter shards before resubscribing.
+    Summary and account-level channels are served by the first shard.
+
+    In process mode messages are decoded in the workers and pickled back to the parent;
+    local order books then live in the workers and `get_order_book` is not available.
+    """
+
+    def __init__(self, shards=2, use_processes=False, url=None, json_backend=None):
+        """
+        :param shards: Number of connections.
+        :type shards: int
+        :param use_processes: Run each connection in its own process.
+        :type use_processes: bool
+        :param url: Custom connection url.
+        :type url: str
+        :param json_backend: JSON library used to parse messages, one of `JsonBackends`.
+        :type json_backend: str
+        """
+        self.use_processes = use_processes
+        self.owners = {}
+        self.loads = {}
+        self.shards = []
+        self._book_tickers = set()
+        self._lock = Lock()
+        self._commands = []
+        self._replies = []
+        if use_processes:
+            self._records = multiprocessing.Queue()
+            for shard_id in range(shards):
+                commands, replies = multiprocessing.Queue(), multiprocessing.Queue()
+                process = multiprocessing.Process(
+                    target=_run_shard_process, name='BittrexShard-{}'.format(shard_id), daemon=True,
+                    args=(shard_id, url, json_backend, self._records, commands, replies))
+                process.start()
+                self.shards.append(process)
+                self._commands.append(commands)
+                self._replies.append(replies)
+        else:
+            self._records = Queue()
+            for shard_id in range(shards):
+                self.shards.append(_Shard(shard_id, self._records.put, self._rebalance, url, json_backend))
+        self._dispatcher = Thread(target=self._dispatch, daemon=True, name='ShardDispatcherThread')
+        self._dispatcher.start()
+
+    # ===============
+    # Shard Handling
+    # ===============
+
+    def _call(self, shard_id, name, *args):
+        if self.use_processes:
+            self._commands[shard_id].put((name, args))
+        else:
+            getattr(self.shards[shard_id], name)(*args)
+
+    def _broadcast(self, name, *args):
+        for shard_id in range(len(self.shards)):
+            self._call(shard_id, name, *args)
+
+    def _shard_loads(self):
+        totals = [0] * len(self.shards)
+        for ticker, shard_id in self.owners.items():
+            totals[shard_id] += self.loads.get(ticker, 0)
+        return totals
+
+    def _assign(self, tickers):
+        """
+        :return: Dict of shard id -> newly assigned tickers.
+        """
+        assigned = {}
+        with self._lock:
+            totals = self._shard_loads()
+            counts = [0] * len(self.shards)
+            for shard_id in self.owners.values():
+                counts[shard_id] += 1
+            for ticker in tickers:
+                if ticker in self.owners:
+                    continue
+                shard_id = min(range(len(self.shards)), key=lambda i: (totals[i], counts[i]))
+                self.owners[ticker] = shard_id
+                counts[shard_id] += 1
+                assigned.setdefault(shard_id, []).append(ticker)
+        return assigned
+
+    def _rebalance(self, shard_id):
+        """
+        Moves the busiest markets of a reconnecting shard to the quietest other shards.
+
+        :return: The tickers the reconnecting shard must not resubscribe to.
+        :rtype: []
+        """
+        moved = {}
+        if len(self.shards) < 2:
+            return []
+        with self._lock:
+            totals = self._shard_loads()
+            average = sum(totals) / float(len(totals))
+            owned = sorted((ticker for ticker, owner in self.owners.items() if owner == shard_id),
+                           key=lambda ticker: self.loads.get(ticker, 0), reverse=True)
+            remaining = len(owned)
+            for ticker in owned:
+                if totals[shard_id] <= average or remaining <= 1:
+                    break
+                load = self.loads.get(ticker, 0)
+                target = min((i for i in range(len(totals)) if i != shard_id), key=lambda i: totals[i])
+                if totals[target] + load >= totals[shard_id]:
+                    continue
+                self.owners[ticker] = target
+                totals[target] += load
+                totals[shard_id] -= load
+                remaining -= 1
+                moved.setdefault(target, []).append(ticker)
+            # Halve the counters so that the next rebalance favours recent activity.
+            self.loads = {ticker: load // 2 for ticker, load in self.loads.items()}
+        tickers = []
+        for target, target_tickers in moved.items():
+            logger.info('Moving {} from shard [{}] to shard [{}].'.format(target_tickers, shard_id, target))
+            self._subscribe_shard(target, target_tickers)
+            tickers.extend(target_tickers)
+        return tickers
+
+    def _subscribe_shard(self, shard_id, tickers):
+        books = [ticker for ticker in tickers if ticker in self._book_tickers]
+        deltas = [ticker for ticker in tickers if ticker not in self._book_tickers]
+        if books:
+            self._call(shard_id, 'subscribe_to_order_book', books)
+        if deltas:
+            self._call(shard_id, 'subscribe_to_exchange_deltas', deltas)
+
+    def _dispatch(self):
+        loop = asyncio.new_event_loop()
+        while True:
+            records = [self._records.get()]
+            try:
+                while len(records) < _DISPATCH_BATCH:
+                    records.append(self._records.get_nowait())
+            except Empty:
+                pass
+            loop.run_until_complete(self._deliver(records))
+
+    async def _deliver(self, records):
+        for kind, shard_id, msg in records:
+            try:
+                if kind == 'public':
+                    market = msg.get('M') if type(msg) is dict else getattr(msg, 'market', None)
+                    if market is not None:
+                        # Drop what a shard still receives for a market handed over to another one.
+                        if self.owners.get(market, shard_id) != shard_id:
+                            continue
+                        with self._lock:
+                            self.loads[market] = self.loads.get(market, 0) + 1
+                    await self.on_public(msg)
+                elif kind == 'private':
+                    await self.on_private(msg)
+                elif kind == 'reconnect':
+                    self._replies[shard_id].put((msg, self._rebalance(shard_id)))
+            except Exception:
+                logger.exception('Error while dispatching message from shard [{}].'.format(shard_id))
+
+    # ==============
+    # Public Methods
+    # ==============
+
+    def subscribe_to_exchange_deltas(self, tickers):
+        if type(tickers) is list:
+            for shard_id, shard_tickers in self._assign(tickers).items():
+                self._call(shard_id, 'subscribe_to_exchange_deltas', shard_tickers)
+        else:
+            raise TypeError(ErrorMessages.INVALID_TICKER_INPUT)
+
+    def subscribe_to_order_book(self, tickers):
+        if type(tickers) is list:
+            self._book_tickers.update(tickers)
+            for shard_id, shard_tickers in self._assign(tickers).items():
+                self._call(shard_id, 'subscribe_to_order_book', shard_tickers)
+        else:
+            raise TypeError(ErrorMessages.INVALID_TICKER_INPUT)
+
+    def get_order_book(self, ticker):
+        if self.use_processes or ticker not in self.owners:
+            return None
+        return self.shards[self.owners[ticker]].get_order_book(ticker)
+
+    def query_exchange_state(self, tickers):
+        if type(tickers) is list:
+            for ticker in tickers:
+                self._call(self.owners.get(ticker, 0), 'query_exchange_state', [ticker])
+        else:
+            raise TypeError(ErrorMessages.INVALID_TICKER_INPUT)
+
+    def subscribe_to_summary_deltas(self):
+        self._call(0, 'subscribe_to_summary_deltas')
+
+    def subscribe_to_summary_lite_deltas(self):
+        self._call(0, 'subscribe_to_summary_lite_deltas')
+
+    def query_summary_state(self):
+        self._call(0, 'query_summary_state')
+
+    def authenticate(self, api_key, api_secret, timeout=10.0):
+        self._call(0, 'authenticate', api_key, api_secret, timeout)
+
+    def enable_typed_messages(self, use_decimal=False):
+        self._broadcast('enable_typed_messages', use_decimal)
+
+    def enable_decode_pool(self, workers=None, use_processes=False):
+        self._broadcast('enable_decode_pool', workers, use_processes)
+
+    def enable_health_monitor(self, connection_timeout=60.0, channel_timeout=30.0, market_timeout=600.0,
+                              probe_interval=30.0, max_strikes=2, probe_timeout=5.0):
+        # Each shard watches its own connection.
+        self._broadcast('enable_health_monitor', connection_timeout, channel_timeout, market_timeout,
+                        probe_interval, max_strikes, probe_timeout)
+
+    def disconnect(self):
+        self._broadcast('disconnect')
+
+    # ======================
+    # Public Channel Methods
+    # ======================
+
+    async def on_public(self, msg):
+        pass
+
+    async def on_private(self, msg):
+        pass
+
+    # =============
+    # Other Methods
+    # =============
+
+    @staticmethod
+    def enable_log(file_name=None):
+        add_stream_logger(file_name=file_name)
+
+    @staticmethod
+    def disable_log():
+        remove_stream_logger()
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/shared_memory.py
+# Stanislav Lazarov
+
+import logging
+import mmap
+import os
+import struct
+from time import sleep
+
+from .constants import ErrorMessages
+from .summary_table import SummaryColumns
+
+logger = logging.getLogger(__name__)
+
+# Layout
+# ------
+# Header: magic, version, depth, max markets, market count.
+# Directory: one fixed-size ascii ticker per market, in slot order.
+# Slots: one per market, guarded by a sequence number (seqlock):
+#   sequence, nonce, bid count, ask count, stale flag, padding,
+#   depth x (rate, quantity) bids, depth x (rate, quantity) asks,
+#   summary columns in `SUMMARY_FIELDS` order (NaN until received).
+_MAGIC = b'BTXS'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIIII12x')
+_NAME = struct.Struct('<16s')
+_SLOT_HEADER = struct.Struct('<QqIIII')
+_SEQUENCE = struct.Struct('<Q')
+SUMMARY_FIELDS = SummaryColumns.NAMES
+_NAN = float('nan')
+# Reader retries before giving up on a slot that keeps changing
+_MAX_READ_ATTEMPTS = 1000
+
+
+def _slot_size(depth):
+    return _SLOT_HEADER.size + (4 * depth + len(SUMMARY_FIELDS)) * 8
+
+
+class SharedBookPublisher(object):
+    """
+    Writes the top of local order books and summary rows to a memory-mapped file.
+
+    Other processes map the same file with `SharedBookReader`, so one socket can feed any
+    number of local consumers without them decoding the stream again. Each market has a
+    fixed slot guarded by a sequence number that is odd while the slot is being written;
+    readers retry until they copied the slot between two equal, even sequence numbers.
+    There is a single writer, the thread running the socket's event loop.
+    """
+
+    def __init__(self, path, depth=10, max_markets=512):
+        """
+        :param path: File backing the shared region, e.g. under /dev/shm. Replaced, readers
+            still mapping the previous file keep their copy until they reopen the path.
+        :type path: str
+        :param depth: Levels published per book side.
+        :type depth: int
+        :param max_markets: Number of market slots.
+        :type max_markets: int
+        """
+        self.path = path
+        self.depth = depth
+        self.max_markets = max_markets
+        self.slots = {}
+        self._slot_size = _slot_size(depth)
+        self._directory = _HEADER.size
+        self._base = self._directory + max_markets * _NAME.size
+        self._book = struct.Struct('<{}d'.format(4 * depth))
+        size = self._base + max_markets * self._slot_size
+        # Truncating a file that readers have mapped would crash them (SIGBUS), so the region
+        # is built under a temporary name and renamed over the old one.
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        self._file = open(temp_path, 'w+b')
+        self._file.truncate(size)
+        self.buffer = mmap.mmap(self._file.fileno(), size)
+        _HEADER.pack_into(self.buffer, 0, _MAGIC, _VERSION, depth, max_markets, 0)
+        os.replace(temp_path, path)
+
+    def _slot(self, market):
+        offset = self.slots.get(market)
+        if offset is None:
+            if len(self.slots) >= self.max_markets:
+                return None
+            index = len(self.slots)
+            offset = self._base + index * self._slot_size
+            buffer = self.buffer
+            summary = offset + _SLOT_HEADER.size + 4 * self.depth * 8
+            struct.pack_into('<{}d'.format(len(SUMMARY_FIELDS)), buffer, summary, *[_NAN] * len(SUMMARY_FIELDS))
+            _NAME.pack_into(buffer, self._directory + index * _NAME.size, market.encode('ascii'))
+            self.slots[market] = offset
+            # Publishing the count last makes the ticker and its slot visible at once.
+            _HEADER.pack_into(buffer, 0, _MAGIC, _VERSION, self.depth, self.max_markets, len(self.slots))
+        return offset
+
+    def _begin(self, offset):
+        sequence = _SEQUENCE.unpack_from(self.buffer, offset)[0] + 1
+        _SEQUENCE.pack_into(self.buffer, offset, sequence)
+        return sequence
+
+    def _end(self, offset, sequence):
+        _SEQUENCE.pack_into(self.buffer, offset, sequence + 1)
+
+    def publish_book(self, book):
+        """
+        :param book: The local order book to publish.
+        :type book: OrderBook
+        """
+        offset = self._slot(book.market)
+        if offset is None:
+            return
+        depth = self.depth
+        values = [0.0] * (4 * depth)
+        bids = 0
+        for i, (rate, quantity) in enumerate(book.top_bids(depth)):
+            values[2 * i] = rate
+            values[2 * i + 1] = quantity
+            bids += 1
+        asks = 0
+        for i, (rate, quantity) in enumerate(book.top_asks(depth), depth):
+            values[2 * i] = rate
+            values[2 * i + 1] = quantity
+            asks += 1
+        buffer = self.buffer
+        sequence = self._begin(offset)
+        _SLOT_HEADER.pack_into(buffer, offset, sequence, book.nonce or 0, bids, asks, int(book.stale), 0)
+        self._book.pack_into(buffer, offset + _SLOT_HEADER.size, *values)
+        self._end(offset, sequence)
+
+    def publish_summaries(self, rows):
+        """
+        :param rows: Minified summary rows; lite rows only update the columns they carry.
+        :type rows: []
+        """
+        buffer = self.buffer
+        for row in rows:
+            offset = self._slot(row['M'])
+            if offset is None:
+                continue
+            summary = offset + _SLOT_HEADER.size + 4 * self.depth * 8
+            sequence = self._begin(offset)
+            for i, name in enumerate(SUMMARY_FIELDS):
+                value = row.get(SummaryColumns.ALL[name])
+                if value is not None:
+                    struct.pack_into('<d', buffer, summary + i * 8, value)
+            self._end(offset, sequence)
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
+
+
+class SharedBookReader(object):
+    """
+    Reads what a `SharedBookPublisher` in another process writes.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: File backing the shared region.
+        :type path: str
+        """
+        self._file = open(path, 'rb')
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.depth, self.max_markets, _ = _HEADER.unpack_from(self.buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(ErrorMessages.INVALID_SHARED_REGION.format(path))
+        self._slot_size = _slot_size(self.depth)
+        self._directory = _HEADER.size
+        self._base = self._directory + self.max_markets * _NAME.size
+        self._levels = struct.Struct('<{}d'.format(4 * self.depth))
+        self._summary = struct.Struct('<{}d'.format(len(SUMMARY_FIELDS)))
+        self.slots = {}
+
+    def markets(self):
+        """
+        :return: Tickers published so far.
+        :rtype: []
+        """
+        count = _HEADER.unpack_from(self.buffer, 0)[4]
+        for index in range(len(self.slots), count):
+            name = _NAME.unpack_from(self.buffer, self._directory + index * _NAME.size)[0]
+            self.slots[name.rstrip(b'\x00').decode('ascii')] = self._base + index * self._slot_size
+        return list(self.slots)
+
+    def _read(self, market):
+        # Copies a consistent image of the slot.
+        offset = self.slots.get(market)
+        if offset is None:
+            self.markets()
+            offset = self.slots.get(market)
+            if offset is None:
+                return None
+        buffer = self.buffer
+        for attempt in range(_MAX_READ_ATTEMPTS):
+            before = _SEQUENCE.unpack_from(buffer, offset)[0]
+            if not before & 1:
+                data = buffer[offset:offset + self._slot_size]
+                if _SEQUENCE.unpack_from(buffer, offset)[0] == before:
+                    return data
+            if attempt % 100 == 99:
+                sleep(0)
+        logger.warning('Slot for [{}] kept changing while being read.'.format(market))
+        return None
+
+    def book(self, market):
+        """
+        :return: Dict with nonce, stale, bids and asks as lists of (rate, quantity) or None.
+        :rtype: dict
+        """
+        data = self._read(market)
+        if data is None:
+            return None
+        _, nonce, bids, asks, stale, _ = _SLOT_HEADER.unpack_from(data, 0)
+        values = self._levels.unpack_from(data, _SLOT_HEADER.size)
+        depth = self.depth
+        return {'nonce': nonce, 'stale': bool(stale),
+                'bids': [(values[2 * i], values[2 * i + 1]) for i in range(bids)],
+                'asks': [(values[2 * i], values[2 * i + 1]) for i in range(depth, depth + asks)]}
+
+    def summary(self, market):
+        """
+        :return: Dict of `SUMMARY_FIELDS` (NaN until received) or None.
+        :rtype: dict
+        """
+        data = self._read(market)
+        if data is None:
+            return None
+        values = self._summary.unpack_from(data, _SLOT_HEADER.size + 4 * self.depth * 8)
+        return dict(zip(SUMMARY_FIELDS, values))
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# bittrex_websocket/summary_table.py
+# Stanislav Lazarov
+
+import logging
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+_NAN = float('nan')
+
+
+class SummaryColumns(object):
+    # Column name -> minified key in summary rows
+    HIGH = 'H'
+    LOW = 'L'
+    VOLUME = 'V'
+    LAST = 'l'
+    BASE_VOLUME = 'm'
+    BID = 'B'
+    ASK = 'A'
+    PREV_DAY = 'PD'
+    ALL = {'high': HIGH, 'low': LOW, 'volume': VOLUME, 'last': LAST, 'base_volume': BASE_VOLUME,
+           'bid': BID, 'ask': ASK, 'prev_day': PREV_DAY}
+    # Column names in a fixed order, for binary layouts
+    NAMES = ('high', 'low', 'volume', 'last', 'base_volume', 'bid', 'ask', 'prev_day')
+    # Keys carried by `SubscribeToSummaryLiteDeltas`
+    LITE = {'last': LAST, 'base_volume': BASE_VOLUME}
+
+
+class SummaryTable(object):
+    """
+    Columnar table of market summaries, one row per market.
+
+    The table is seeded from `QuerySummaryState` and updated in bulk from `uS`/`uL` deltas.
+    Columns are NumPy float64 arrays when NumPy is installed and `array('d')` otherwise;
+    missing values are NaN.
+
+    After a reconnection the rows are kept but `stale` is set until a fresh
+    `QuerySummaryState` is loaded.
+    """
+
+    def __init__(self, use_numpy=True):
+        """
+        :param use_numpy: Use NumPy columns if NumPy is installed.
+        :type use_numpy: bool
+        """
+        self.use_numpy = use_numpy and numpy is not None
+        # Lite deltas are a separate stream with their own nonce sequence.
+        self.nonce = None
+        self.lite_nonce = None
+        # Market -> nonce of the last `uS` delta written to its row
+        self.row_nonces = {}
+        self.stale = False
+        self.markets = []
+        self.index = {}
+        self._size = 0
+        self._columns = {name: self._new_column(16) for name in SummaryColumns.ALL}
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, market):
+        return market in self.index
+
+    def _new_column(self, capacity):
+        if self.use_numpy:
+            return numpy.full(capacity, numpy.nan)
+        return array('d', [_NAN]) * capacity
+
+    def _grow(self, size):
+        capacity = len(self._columns['last'])
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, column in self._columns.items():
+            new_column = self._new_column(capacity)
+            new_column[:len(column)] = column
+            self._columns[name] = new_column
+
+    def _rows_of(self, rows):
+        """
+        :return: Row indices of `rows`, registering unseen markets.
+        """
+        index = self.index
+        new_markets = [row['M'] for row in rows if row['M'] not in index]
+        if new_markets:
+            self._grow(self._size + len(new_markets))
+            for market in new_markets:
+                if market not in index:
+                    index[market] = self._size
+                    self.markets.append(market)
+                    self._size += 1
+        return [index[row['M']] for row in rows]
+
+    def update(self, rows, nonce=None, lite=False):
+        """
+        Writes a batch of minified summary rows into the table.
+
+        :param rows: Rows of a `QuerySummaryState`, `uS` or `uL` message.
+        :type rows: []
+        :param nonce: Nonce of the message. Older messages are ignored.
+        :type nonce: int
+        :param lite: The rows only carry the lite delta fields.
+        :type lite: bool
+        """
+        if nonce is not None:
+            attr = 'lite_nonce' if lite else 'nonce'
+            last_nonce = getattr(self, attr)
+            if last_nonce is not None and nonce <= last_nonce:
+                return
+            setattr(self, attr, nonce)
+            if not lite:
+                row_nonces = self.row_nonces
+                for row in rows:
+                    row_nonces[row['M']] = nonce
+        self._write(rows, lite)
+
+    def _write(self, rows, lite=False):
+        if not rows:
+            return
+        positions = self._rows_of(rows)
+        keys = SummaryColumns.LITE if lite else SummaryColumns.ALL
+        columns = self._columns
+        if self.use_numpy:
+            positions = numpy.array(positions)
+            for name, key in keys.items():
+                values = [row.get(key) for row in rows]
+                columns[name][positions] = numpy.array(values, dtype=float)
+        else:
+            for name, key in keys.items():
+                column = columns[name]
+                for position, row in zip(positions, rows):
+                    value = row.get(key)
+                    column[position] = _NAN if value is None else value
+
+    def invalidate(self):
+        """
+        Flags the rows as stale and forgets the nonces, the next connection may restart them.
+        """
+        self.nonce = None
+        self.lite_nonce = None
+        self.row_nonces = {}
+        self.stale = True
+
+    def on_summary_state(self, msg):
+        # The snapshot is loaded even if deltas arrived first, except for the rows of markets
+        # that a newer delta already updated.
+        rows = msg['s']
+        nonce = msg.get('N')
+        if nonce is not None:
+            row_nonces = self.row_nonces
+            rows = [row for row in rows if row_nonces.get(row['M'], nonce) <= nonce]
+            if self.nonce is None or nonce > self.nonce:
+                self.nonce = nonce
+        self._write(rows)
+        self.stale = False
+
+    def on_summary_delta(self, msg, lite=False):
+        self.update(msg['D'], msg.get('N'), lite)
+
+    # ==============
+    # Query Methods
+    # ==============
+
+    def column(self, name):
+        """
+        :param name: One of high, low, volume, last, base_volume, bid, ask, prev_day.
+        :type name: str
+        :return: A view of the column, aligned with `markets`.
+        """
+        if self.use_numpy:
+            return self._columns[name][:self._size]
+        return memoryview(self._columns[name])[:self._size]
+
+    def row(self, market):
+        """
+        :return: Dict of column values for `market`.
+        :rtype: dict
+        """
+        position = self.index[market]
+        return {name: column[position] for name, column in self._columns.items()}
+
+    def spread(self):
+        """
+        :return: Ask - Bid for every market.
+        """
+        if self.use_numpy:
+            return self.column('ask') - self.column('bid')
+        return array('d', (ask - bid for ask, bid in zip(self.column('ask'), self.column('bid'))))
+
+    def change(self):
+        """
+        :return: Percentage change of Last against PrevDay for every market.
+        """
+        if self.use_numpy:
+            prev_day = self.column('prev_day')
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                return (self.column('last') - prev_day) / prev_day * 100.0
+        return array('d', ((last - prev) / prev * 100.0 if prev else _NAN
+                           for last, prev in zip(self.column('last'), self.column('prev_day'))))
@@ -4,13 +4,37 @@
 # bittrex_websocket/websocket_client.py
 # Stanislav Lazarov
 
+import asyncio
 import logging
+import random
+import time
+from time import perf_counter
+from concurrent.futures import Future
+from functools import partial
 from ._logger import add_stream_logger, remove_stream_logger
-from threading import Thread
+from threading import Thread, Timer
 from ._queue_events import *
-from .constants import EventTypes, BittrexParameters, BittrexMethods, ErrorMessages, OtherConstants
-from ._auxiliary import process_message, create_signature, BittrexConnection
+from .constants import EventTypes, BittrexParameters, BittrexMethods, ErrorMessages, OtherConstants, \
+    ReconnectParameters, RecordChannels, MetricStages, DeliveryPolicies, FanoutEncodings, StallTypes
+from ._auxiliary import cancel_threadsafe, create_signer, create_signature, BittrexConnection
+from ._decoder import Decoder
+from ._decode_pool import DecodePool
+from ._batching import Batcher
+from ._delivery import DeliveryQueue, merge_summaries
+from ._selective import SummaryFilter
+from ._health import HealthMonitor
+from ._invoker import InvokeScheduler, InvokeRegistry, Invocation
 from ._abc import WebSocket
+from .order_book import OrderBook
+from .summary_table import SummaryTable
+from .account import AccountState
+from .bars import FillAggregator
+from .messages import MessageFactory
+from .recorder import Recorder
+from .metrics import Metrics, MetricsServer
+from .shared_memory import SharedBookPublisher
+from .fanout import FanoutServer
+from .book_store import BookStore
 from queue import Queue
 from ._exceptions import *
 from signalr_aio import Connection
@@ -25,13 +49,54 @@ logger = logging.getLogger(__name__)
 
 class BittrexSocket(WebSocket):
 
-    def __init__(self, url=None):
+    def __init__(self, url=None, json_backend=None):
+        """
+        :param url: Custom connection url.
+        :type url: str
+        :param json_backend: JSON library used to parse messages, one of `JsonBackends`.
+            Defaults to the fastest installed one (orjson, ujson, json).
+        :type json_backend: str
+        """
         self.control_queue = None
-        self.invokes = []
+        self.invokes = InvokeRegistry()
         self.tickers = None
         self.connection = None
         self.threads = []
         self.credentials = None
+        self.authenticated = False
+        self._auth_future = None
+        self.order_books = {}
+        self.summary_table = None
+        self.account_state = None
+        self.fill_aggregator = None
+        self.shared_memory = None
+        self.fanout = None
+        self.book_store = None
+        self.health = None
+        self.probe_interval = None
+        self.probe_timeout = None
+        self._watchdog_task = None
+        self._watchdog_loop = None
+        self._stall_reason = None
+        self.decoder = Decoder(json_backend)
+        self.decode_pool = None
+        self.message_factory = None
+        self.batcher = None
+        self.delivery = None
+        self.recorder = None
+        self.metrics = None
+        self.metrics_server = None
+        self.summary_filter = None
+        self.market_handlers = {}
+        self.channel_handlers = {}
+        self._public_handlers = {channel: partial(self._on_public_message, invoke_type=invoke_type)
+                                 for channel, invoke_type in BittrexMethods.BY_CALLBACK.items()}
+        self.invoker = InvokeScheduler(self.invokes, on_ack=self._on_invoke_ack)
+        self.reconnect_base_delay = ReconnectParameters.BASE_DELAY
+        self.reconnect_max_delay = ReconnectParameters.MAX_DELAY
+        self._reconnect_attempts = 0
+        self._connected_at = None
+        self._reconnect_timer = None
         self.url = BittrexParameters.URL if url is None else url
         self._start_main_thread()
 
@@ -49,162 +114,746 @@ class BittrexSocket(WebSocket):
                 if event.type == EventTypes.CONNECT:
                     self._handle_connect()
                 elif event.type == EventTypes.SUBSCRIBE:
-                    self._handle_subscribe(event.invoke, event.payload)
+                    self._handle_subscribe(event.invoke, event.payload, event.futures)
                 elif event.type == EventTypes.RECONNECT:
                     self._handle_reconnect(event.error_message)
                 elif event.type == EventTypes.CLOSE:
-                    self.connection.conn.close()
+                    if self._reconnect_timer is not None:
+                        self._reconnect_timer.cancel()
+                    # None while waiting to reconnect.
+                    if self.connection is not None:
+                        self.connection.conn.close()
+                    self._stop_workers()
                     break
                 self.control_queue.task_done()
 
+    def _submit(self, event):
+        self.control_queue.put(event)
+
+    def _stop_workers(self):
+        self.invoker.stop()
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+        if self.batcher is not None:
+            self.batcher.stop()
+        if self.delivery is not None:
+            self.delivery.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+        if self.fanout is not None:
+            self.fanout.stop()
+        if self.book_store is not None:
+            self.book_store.close()
+        # The connection may already be gone, e.g. when closed while waiting to reconnect.
+        if self._watchdog_task is not None:
+            cancel_threadsafe(self._watchdog_loop, self._watchdog_task)
+
     def _handle_connect(self):
+        self.connection = self._create_connection()
+        thread = Thread(target=self._connection_handler, daemon=True, name='SocketConnectionThread')
+        self.threads.append(thread)
+        thread.start()
+
+    def _create_connection(self):
         connection = Connection(self.url, Session())
         hub = connection.register_hub(BittrexParameters.HUB)
         connection.received += self._on_debug
         connection.error += self.on_error
-        hub.client.on(BittrexParameters.MARKET_DELTA, self._on_public)
-        hub.client.on(BittrexParameters.SUMMARY_DELTA, self._on_public)
-        hub.client.on(BittrexParameters.SUMMARY_DELTA_LITE, self._on_public)
-        hub.client.on(BittrexParameters.BALANCE_DELTA, self._on_private)
-        hub.client.on(BittrexParameters.ORDER_DELTA, self._on_private)
-        self.connection = BittrexConnection(connection, hub)
-        thread = Thread(target=self._connection_handler, daemon=True, name='SocketConnectionThread')
-        self.threads.append(thread)
-        thread.start()
+        for channel in RecordChannels.PUBLIC:
+            hub.client.on(channel, partial(self._on_public, channel=channel))
+        for channel in RecordChannels.PRIVATE:
+            hub.client.on(channel, partial(self._on_private, channel=channel))
+        connection = BittrexConnection(connection, hub)
+        self.invoker.attach(connection)
+        # Set by the first frame, once the socket is open.
+        self._connected_at = None
+        self._stall_reason = None
+        if self.health is not None:
+            self.health.reset(time.monotonic())
+            connection.transport.ws_loop.call_soon_threadsafe(self._start_watchdog)
+        return connection
 
-    def _connection_handler(self):
+    # ==============
+    # Health Monitor
+    # ==============
+
+    def _start_watchdog(self):
+        loop = asyncio.get_event_loop()
+        # A task of a previous connection's loop never completes once that loop has stopped.
+        if self._watchdog_task is None or self._watchdog_task.done() or self._watchdog_loop is not loop:
+            self._watchdog_loop = loop
+            self._watchdog_task = asyncio.ensure_future(self._watchdog())
+
+    async def _watchdog(self):
+        last_probe = time.monotonic()
+        while True:
+            await asyncio.sleep(1.0)
+            now = time.monotonic()
+            for kind, key in self.health.check(now, list(self.invokes.subscriptions)):
+                self._on_stall(kind, key)
+            if self.probe_interval and now - last_probe >= self.probe_interval:
+                last_probe = now
+                self._probe()
+
+    def _on_stall(self, kind, key):
+        if self.metrics is not None:
+            self.metrics.increment('stalls')
+        if kind == StallTypes.CONNECTION:
+            self._force_reconnect('Nothing received for {}s'.format(self.health.connection_timeout))
+        elif kind == StallTypes.CHANNEL:
+            logger.warning('No [{}] messages for {}s, resubscribing.'.format(key, self.health.channel_timeout))
+            self._submit(SubscribeEvent(BittrexMethods.BY_CALLBACK[key], None))
+            if key == BittrexParameters.SUMMARY_DELTA and self.summary_table is not None:
+                self._submit(SubscribeEvent(BittrexMethods.QUERY_SUMMARY_STATE, None))
+        else:
+            logger.warning('No deltas for [{}] for {}s, resubscribing.'.format(key, self.health.market_timeout))
+            self._submit(SubscribeEvent(BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, [key]))
+            book = self.order_books.get(key)
+            if book is not None:
+                # Deltas may have been missed without a nonce gap showing up yet.
+                book.invalidate()
+                if self.shared_memory is not None:
+                    self.shared_memory.publish_book(book)
+                self._resync_order_book(key)
+
+    def _force_reconnect(self, reason):
+        # Closing the socket ends `conn.start`, which turns into a reconnection because of `_stall_reason`.
+        if self.connection is not None and self._stall_reason is None:
+            logger.error('{}, reconnecting.'.format(reason))
+            self._stall_reason = reason
+            self.connection.conn.close()
+
+    def _probe(self):
+        # Re-sending an acknowledged subscription is a no-op for the server, but still answered.
+        # A lost probe counts as a failure rather than being retried, so latency excludes timeouts.
+        for method, ticker in self.invokes.subscriptions:
+            if method != BittrexMethods.GET_AUTH_CONTENT:
+                break
+        else:
+            return
+        invocation = self.invokes.subscriptions[(method, ticker)]
+        future = Future()
+        future.add_done_callback(partial(self._on_probe, perf_counter()))
+        self.invoker.push(Invocation(method, invocation.args, ticker, future,
+                                     timeout=self.probe_timeout, max_retries=0))
+
+    def _on_probe(self, start, future):
+        if future.exception() is None:
+            latency = perf_counter() - start
+            self.health.on_probe(latency)
+            if self.metrics is not None:
+                self.metrics.observe(MetricStages.PROBE, latency)
+        else:
+            self.health.on_probe_failure()
+
+    def _log_connection_attempt(self):
         if str(type(self.connection.conn.session)) == OtherConstants.CF_SESSION_TYPE:
             logger.info('Establishing connection to Bittrex through {}.'.format(self.url))
             logger.info('cfscrape detected, using a cfscrape session instead of requests.')
         else:
             logger.info('Establishing connection to Bittrex through {}.'.format(self.url))
+
+    def _connection_handler(self):
+        self._log_connection_attempt()
         try:
             self.connection.conn.start()
         except ConnectionClosed as e:
-            if e.code == 1000:
+            if self._stall_reason is not None:
+                # Closed by the health monitor.
+                self._submit(ReconnectEvent(self._stall_reason))
+            elif e.code == 1000:
                 logger.info('Bittrex connection successfully closed.')
             elif e.code == 1006:
                 event = ReconnectEvent(e.args[0])
-                self.control_queue.put(event)
-        except ConnectionError as e:
-            raise ConnectionError(e)
+                self._submit(event)
+        except (OSError, ValueError) as e:
+            # Negotiation failures (requests' ConnectionError is an OSError, bad JSON a ValueError).
+            self._submit(ReconnectEvent('Connection attempt failed: {}'.format(e)))
         except InvalidStatusCode as e:
             message = "Status code not 101: {}".format(e.status_code)
             event = ReconnectEvent(message)
-            self.control_queue.put(event)
+            self._submit(event)
 
-    def _handle_subscribe(self, invoke, payload):
+    def _handle_subscribe(self, invoke, payload, futures=None):
+        # Invokes are paced and matched with their responses by the invoker.
+        replay = invoke in BittrexMethods.PERSISTENT
         if invoke in [BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, BittrexMethods.QUERY_EXCHANGE_STATE]:
-            for ticker in payload[0]:
-                self.invokes.append({'invoke': invoke, 'ticker': ticker})
-                self.connection.corehub.server.invoke(invoke, ticker)
-                logger.info('Successfully subscribed to [{}] for [{}].'.format(invoke, ticker))
+            futures = futures or [None] * len(payload[0])
+            for ticker, future in zip(payload[0], futures):
+                self.invoker.submit(Invocation(invoke, (ticker,), ticker, future, replay))
         elif invoke == BittrexMethods.GET_AUTH_CONTENT:
-            self.connection.corehub.server.invoke(invoke, payload[0])
-            self.invokes.append({'invoke': invoke, 'ticker': payload[0]})
+            # The future resolves once `Authenticate` is acknowledged, not with the challenge.
+            future = futures[0] if futures else Future()
+            self._auth_future = future
+            self.invoker.submit(Invocation(invoke, (payload[0],), payload[0], None, replay))
+            self.invoker.call_later(self.credentials['timeout'], self._on_auth_timeout, future)
             logger.info('Retrieving authentication challenge.')
-        elif invoke == BittrexMethods.AUTHENTICATE:
-            self.connection.corehub.server.invoke(invoke, payload[0], payload[1])
-            logger.info('Challenge retrieved. Sending authentication. Awaiting messages...')
-            # No need to append invoke list, because AUTHENTICATE is called from successful GET_AUTH_CONTENT.
         else:
-            self.invokes.append({'invoke': invoke, 'ticker': None})
-            self.connection.corehub.server.invoke(invoke)
-            logger.info('Successfully invoked [{}].'.format(invoke))
+            self.invoker.submit(Invocation(invoke, future=futures and futures[0], replay=replay))
+
+    def _on_invoke_ack(self, invocation):
+        if not invocation.replay and invocation.method in BittrexMethods.PERSISTENT:
+            # Health probe
+            return
+        if invocation.method == BittrexMethods.AUTHENTICATE:
+            self.authenticated = True
+            logger.info('Successfully authenticated. Awaiting account-level messages...')
+        elif invocation.ticker is not None and invocation.method != BittrexMethods.GET_AUTH_CONTENT:
+            logger.info('Successfully subscribed to [{}] for [{}].'.format(invocation.method, invocation.ticker))
+        else:
+            logger.info('Successfully invoked [{}].'.format(invocation.method))
+
+    def _authenticate(self, challenge):
+        # Runs on the loop as soon as the challenge arrives, ahead of any queued invoke.
+        signature = create_signature(self.credentials['signer'], challenge)
+        invocation = Invocation(BittrexMethods.AUTHENTICATE, (self.credentials['api_key'], signature),
+                                future=self._auth_future)
+        self.invoker.push(invocation)
+        logger.info('Challenge retrieved. Sending authentication.')
+
+    def _on_auth_timeout(self, future):
+        if not future.done():
+            timeout = self.credentials['timeout']
+            logger.error('Authentication did not complete within {}s.'.format(timeout))
+            future.set_exception(InvokeError(BittrexMethods.AUTHENTICATE, None,
+                                             'Not authenticated within {}s'.format(timeout)))
 
     def _handle_reconnect(self, error_message):
         logger.error('{}.'.format(error_message))
         logger.error('Initiating reconnection procedure')
+        events = self._prepare_reconnect()
+        # The control thread stays free to handle `disconnect` in the meantime.
+        self._reconnect_timer = Timer(self._reconnect_delay(), self._restart, (events,))
+        self._reconnect_timer.daemon = True
+        self._reconnect_timer.start()
+
+    def _restart(self, events):
+        self._submit(ConnectEvent())
+        for event in events:
+            self._submit(event)
+
+    def _reconnect_delay(self):
+        """
+        :return: Seconds to wait before the next connection attempt, with exponential backoff and full jitter.
+        :rtype: float
+        """
+        if self._connected_at is not None and \
+                time.monotonic() - self._connected_at >= ReconnectParameters.RESET_AFTER:
+            self._reconnect_attempts = 0
+        limit = min(self.reconnect_max_delay, self.reconnect_base_delay * 2 ** self._reconnect_attempts)
+        self._reconnect_attempts += 1
+        delay = random.uniform(0, limit)
+        logger.info('Reconnecting in {:.2f}s (attempt {}).'.format(delay, self._reconnect_attempts))
+        return delay
+
+    def _prepare_reconnect(self):
+        """
+        Resets the connection state.
+
+        Local books and the summary table are kept as a stale warm-start copy until the
+        snapshots queried on the new connection arrive.
+
+        :return: The events replaying the subscriptions of the previous connection.
+        :rtype: []
+        """
+        if self.metrics is not None:
+            self.metrics.increment('reconnects')
         events = []
-        for item in self.invokes:
-            event = SubscribeEvent(item['invoke'], [item['ticker']])
-            events.append(event)
+        tickers = []
+        auth = None
+        for invocation in self.invokes.subscriptions.values():
+            if invocation.method == BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS:
+                tickers.append(invocation.ticker)
+            elif invocation.method == BittrexMethods.GET_AUTH_CONTENT:
+                auth = SubscribeEvent(invocation.method, *invocation.args)
+            else:
+                events.append(SubscribeEvent(invocation.method, *invocation.args))
+        # Deltas go first so that they are buffered by the time the snapshots arrive.
+        if tickers:
+            events.insert(0, SubscribeEvent(BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, tickers))
+        # The challenge is requested before anything else, its round trip overlaps with the
+        # public subscriptions and `Authenticate` is sent ahead of them once it arrives.
+        if auth is not None:
+            events.insert(0, auth)
+        self.authenticated = False
         # Reset previous connection
-        self.invokes, self.connection = [], None
-        # Restart
-        self.control_queue.put(ConnectEvent())
-        for event in events:
-            self.control_queue.put(event)
+        self.connection = None
+        # Snapshots are queried again for the state kept locally
+        for book in self.order_books.values():
+            book.invalidate()
+            if self.shared_memory is not None:
+                # Readers in other processes see the stale flag for the whole outage. The old
+                # socket has stopped, so there is no concurrent writer.
+                self.shared_memory.publish_book(book)
+        if self.order_books:
+            events.append(SubscribeEvent(BittrexMethods.QUERY_EXCHANGE_STATE, list(self.order_books)))
+        if self.summary_table is not None:
+            self.summary_table.invalidate()
+            events.append(SubscribeEvent(BittrexMethods.QUERY_SUMMARY_STATE, None))
+        if self.account_state is not None:
+            self.account_state.invalidate()
+        return events
 
     # ==============
     # Public Methods
     # ==============
 
+    # Ticker methods return one `concurrent.futures.Future` per ticker, the others a single one.
+    # Futures resolve to True once the server has acknowledged the invoke.
+
     def subscribe_to_exchange_deltas(self, tickers):
         if type(tickers) is list:
             invoke = BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS
-            event = SubscribeEvent(invoke, tickers)
-            self.control_queue.put(event)
+            futures = [Future() for _ in tickers]
+            event = SubscribeEvent(invoke, tickers, futures=futures)
+            self._submit(event)
+            return futures
         else:
             raise TypeError(ErrorMessages.INVALID_TICKER_INPUT)
 
     def subscribe_to_summary_deltas(self):
         invoke = BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS
-        event = SubscribeEvent(invoke, None)
-        self.control_queue.put(event)
+        future = Future()
+        event = SubscribeEvent(invoke, None, futures=[future])
+        self._submit(event)
+        return future
 
     def subscribe_to_summary_lite_deltas(self):
         invoke = BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS
-        event = SubscribeEvent(invoke, None)
-        self.control_queue.put(event)
+        future = Future()
+        event = SubscribeEvent(invoke, None, futures=[future])
+        self._submit(event)
+        return future
 
     def query_summary_state(self):
         invoke = BittrexMethods.QUERY_SUMMARY_STATE
-        event = SubscribeEvent(invoke, None)
-        self.control_queue.put(event)
+        future = Future()
+        event = SubscribeEvent(invoke, None, futures=[future])
+        self._submit(event)
+        return future
 
     def query_exchange_state(self, tickers):
         if type(tickers) is list:
             invoke = BittrexMethods.QUERY_EXCHANGE_STATE
-            event = SubscribeEvent(invoke, tickers)
-            self.control_queue.put(event)
+            futures = [Future() for _ in tickers]
+            event = SubscribeEvent(invoke, tickers, futures=futures)
+            self._submit(event)
+            return futures
         else:
             raise TypeError(ErrorMessages.INVALID_TICKER_INPUT)
 
-    def authenticate(self, api_key, api_secret):
-        self.credentials = {'api_key': api_key, 'api_secret': api_secret}
-        event = SubscribeEvent(BittrexMethods.GET_AUTH_CONTENT, api_key)
-        self.control_queue.put(event)
+    def subscribe_to_order_book(self, tickers):
+        """
+        Maintains a local order book for each ticker.
+
+        Subscribes to the exchange deltas first and then queries the exchange state, so that
+        no delta is lost between the snapshot and the live stream. Messages are still
+        forwarded to `on_public`, after the book has been updated.
+
+        :param tickers: A list of tickers you are interested in.
+        :type tickers: []
+        :return: One future per ticker, resolved once the exchange deltas subscription is acknowledged.
+        """
+        if type(tickers) is list:
+            for ticker in tickers:
+                if ticker not in self.order_books:
+                    self.order_books[ticker] = OrderBook(ticker)
+            futures = [Future() for _ in tickers]
+            self._submit(SubscribeEvent(BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, tickers, futures=futures))
+            self._submit(SubscribeEvent(BittrexMethods.QUERY_EXCHANGE_STATE, tickers))
+            return futures
+        else:
+            raise TypeError(ErrorMessages.INVALID_TICKER_INPUT)
+
+    def get_order_book(self, ticker):
+        """
+        :param ticker: The ticker passed to `subscribe_to_order_book`.
+        :type ticker: str
+        :return: The local `OrderBook` or None if the ticker is not tracked.
+        """
+        return self.order_books.get(ticker)
+
+    def subscribe_to_summary_table(self, use_numpy=True):
+        """
+        Maintains a columnar `SummaryTable` of all markets in `summary_table`.
+
+        Subscribes to the summary deltas and queries the summary state to seed the table.
+        Messages are still forwarded to `on_public`, after the table has been updated.
+
+        :param use_numpy: Use NumPy columns if NumPy is installed.
+        :type use_numpy: bool
+        :return: A future resolved once the summary deltas subscription is acknowledged.
+        """
+        if self.summary_table is None:
+            self.summary_table = SummaryTable(use_numpy)
+        future = Future()
+        self._submit(SubscribeEvent(BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS, None, futures=[future]))
+        self._submit(SubscribeEvent(BittrexMethods.QUERY_SUMMARY_STATE, None))
+        return future
+
+    def enable_bars(self, interval=60, capacity=1440):
+        """
+        Aggregates the fills of subscribed markets into OHLCV/VWAP bars, see `get_bars`.
+        Query the markets' exchange state as well to fill the bars from the recent fills.
+
+        :param interval: Bar length in seconds.
+        :type interval: int
+        :param capacity: Bars kept per market.
+        :type capacity: int
+        """
+        self.fill_aggregator = FillAggregator(interval, capacity)
+
+    def get_bars(self, ticker, count=None):
+        """
+        :return: The newest `count` bars of `ticker`, or all of them, oldest first.
+        :rtype: []
+        """
+        if self.fill_aggregator is None:
+            return []
+        return self.fill_aggregator.bars(ticker, count)
+
+    def enable_shared_memory(self, path, depth=10, max_markets=512):
+        """
+        Publishes the top of the local order books and the summary rows to a memory-mapped
+        file, for other processes to read with `SharedBookReader`.
+
+        :param path: File backing the shared region, e.g. under /dev/shm. Overwritten.
+        :type path: str
+        :param depth: Levels published per book side.
+        :type depth: int
+        :param max_markets: Number of market slots.
+        :type max_markets: int
+        """
+        self.shared_memory = SharedBookPublisher(path, depth, max_markets)
+
+    def enable_fanout(self, path, encoding=FanoutEncodings.RAW, max_queue=10000):
+        """
+        Serves the stream to other local processes over a Unix domain socket, see `FanoutServer`.
+
+        :param path: Path of the Unix domain socket. An existing file is replaced.
+        :type path: str
+        :param encoding: RAW forwards the compressed payloads, BINARY the decoded messages
+            packed with `struct`. One of `FanoutEncodings`.
+        :type encoding: str
+        :param max_queue: Frames buffered per client before its oldest ones are dropped.
+        :type max_queue: int
+        """
+        if self.fanout is not None:
+            self.fanout.stop()
+        self.fanout = FanoutServer(path, encoding, max_queue)
+
+    def enable_book_store(self, directory, checkpoint_interval=60.0, checkpoint_deltas=1000):
+        """
+        Stores the history of the local order books on disk, see `BookStore.book_at`.
+
+        :param directory: Where the market directories are created.
+        :type directory: str
+        :param checkpoint_interval: Seconds between full checkpoints of a market.
+        :type checkpoint_interval: float
+        :param checkpoint_deltas: Deltas after which a checkpoint is written regardless of time.
+        :type checkpoint_deltas: int
+        :return: The store, which can also be queried while it is being written.
+        :rtype: BookStore
+        """
+        if self.book_store is not None:
+            self.book_store.close()
+        self.book_store = BookStore(directory, checkpoint_interval, checkpoint_deltas)
+        return self.book_store
+
+    def enable_health_monitor(self, connection_timeout=60.0, channel_timeout=30.0, market_timeout=600.0,
+                              probe_interval=30.0, max_strikes=2, probe_timeout=5.0):
+        """
+        Watches for a connection, summary subscription or market that stops delivering without an error.
+
+        A stalled market is resubscribed and its order book resynced, a stalled summary
+        subscription is resubscribed, and a stalled connection is closed and reconnected.
+        A channel or market that stays silent after `max_strikes` resubscriptions also leads
+        to a reconnection. Ages, probe latency and stall counts are reported by `stats`.
+
+        :param connection_timeout: Seconds without any frame, keep-alives included, before reconnecting.
+        :type connection_timeout: float
+        :param channel_timeout: Seconds without summary deltas before resubscribing.
+        :type channel_timeout: float
+        :param market_timeout: Seconds without exchange deltas for a market before resubscribing.
+            Must exceed the quiet periods of the least active subscribed market.
+        :type market_timeout: float
+        :param probe_interval: Seconds between latency probes, None to disable them.
+        :type probe_interval: float
+        :param max_strikes: Resubscriptions of a silent channel or market before reconnecting.
+        :type max_strikes: int
+        :param probe_timeout: Seconds to wait for a probe response before counting a failure.
+        :type probe_timeout: float
+        """
+        self.health = HealthMonitor(connection_timeout, channel_timeout, market_timeout, max_strikes)
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        if self.connection is not None:
+            self.health.reset(time.monotonic())
+            self.connection.transport.ws_loop.call_soon_threadsafe(self._start_watchdog)
+
+    def get_account_state(self):
+        return self.account_state
+
+    def subscribe_to_account_state(self, api_key, api_secret, use_decimal=False):
+        """
+        Authenticates and maintains an `AccountState` from the balance and order deltas.
+        Changes are also passed to `on_account_change`.
+
+        :param use_decimal: Represent balances and quantities as Decimal instead of float.
+        :type use_decimal: bool
+        :return: The account state, which can be seeded from the REST API with `AccountState.seed`.
+        :rtype: AccountState
+        """
+        if self.account_state is None:
+            self.account_state = AccountState(use_decimal)
+        self.authenticate(api_key, api_secret)
+        return self.account_state
+
+    def authenticate(self, api_key, api_secret, timeout=10.0):
+        """
+        :param timeout: Seconds after which the returned future fails with `InvokeError`.
+        :type timeout: float
+        :return: A future resolved once the server has accepted the signed challenge.
+        """
+        self.credentials = {'api_key': api_key, 'signer': create_signer(api_secret), 'timeout': timeout}
+        future = Future()
+        event = SubscribeEvent(BittrexMethods.GET_AUTH_CONTENT, api_key, futures=[future])
+        self._submit(event)
+        return future
 
     def disconnect(self):
-        self.control_queue.put(CloseEvent())
+        self._submit(CloseEvent())
 
     # =======================
     # Private Channel Methods
     # =======================
 
-    async def _on_public(self, args):
-        msg = await process_message(args[0])
-        if 'D' in msg:
-            if len(msg['D'][0]) > 3:
-                msg['invoke_type'] = BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS
+    async def _decode(self, message, handler):
+        # Decodes inline, or through the decode pool which preserves the arrival order.
+        if self.decode_pool is None:
+            if self.metrics is None:
+                await handler(self.decoder.decode(message))
+            else:
+                await handler(self.decoder.decode_timed(message, self.metrics))
+        else:
+            self.decode_pool.submit(message, handler)
+
+    async def _on_public(self, args, channel=None):
+        if self.recorder is not None:
+            self.recorder.write(channel, args[0])
+        if self.metrics is not None:
+            self.metrics.on_receive(channel, len(args[0]), perf_counter())
+        if self.fanout is not None and self.fanout.encoding == FanoutEncodings.RAW:
+            self.fanout.publish_raw(channel, args[0])
+        if self.health is not None:
+            self.health.on_channel(channel, time.monotonic())
+        handler = self._public_handlers.get(channel, self._on_public_message)
+        if self.summary_filter is not None and channel in (BittrexParameters.SUMMARY_DELTA,
+                                                           BittrexParameters.SUMMARY_DELTA_LITE):
+            # Parsing only the wanted rows is cheap enough to stay inline, even with a decode pool.
+            await handler(self.summary_filter.decode(self.decoder, args[0]))
+        else:
+            await self._decode(args[0], handler)
+
+    async def _on_public_message(self, msg, invoke_type=None):
+        start = None if self.metrics is None else perf_counter()
+        if invoke_type is None:
+            # Without the callback name, lite summary rows are told apart by their size.
+            if 'D' not in msg:
+                invoke_type = BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS
+            elif msg['D'] and len(msg['D'][0]) <= 3:
+                invoke_type = BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS
             else:
-                msg['invoke_type'] = BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS
+                invoke_type = BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS
+        msg['invoke_type'] = invoke_type
+        if invoke_type == BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS:
+            if self.health is not None:
+                self.health.on_market(msg['M'], time.monotonic())
+            book = self.order_books.get(msg['M'])
+            if book is not None:
+                if book.on_delta(msg):
+                    self._resync_order_book(book.market)
+                if self.book_store is not None:
+                    self.book_store.on_delta(book, msg)
+                if self.shared_memory is not None:
+                    self.shared_memory.publish_book(book)
+            if self.fill_aggregator is not None:
+                self.fill_aggregator.on_fills(msg['M'], msg['f'])
         else:
-            msg['invoke_type'] = BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS
-        await self.on_public(msg)
+            if self.summary_table is not None:
+                self.summary_table.on_summary_delta(msg,
+                                                    invoke_type == BittrexMethods.SUBSCRIBE_TO_SUMMARY_LITE_DELTAS)
+            if self.shared_memory is not None:
+                self.shared_memory.publish_summaries(msg['D'])
+        if self.fanout is not None and self.fanout.encoding == FanoutEncodings.BINARY:
+            self.fanout.publish_message(invoke_type, msg)
+        await self._deliver_public(msg, start)
 
-    async def _on_private(self, args):
-        msg = await process_message(args[0])
-        await self.on_private(msg)
+    def _resync_order_book(self, ticker):
+        # Only the affected market is re-queried, deltas keep being buffered in the meantime.
+        logger.info('Resyncing order book for [{}].'.format(ticker))
+        event = SubscribeEvent(BittrexMethods.QUERY_EXCHANGE_STATE, [ticker])
+        self._submit(event)
+
+    async def _on_private(self, args, channel=None):
+        if self.recorder is not None:
+            self.recorder.write(channel, args[0])
+        if self.metrics is not None:
+            self.metrics.on_receive(channel, len(args[0]), perf_counter())
+        if self.fanout is not None and self.fanout.encoding == FanoutEncodings.RAW:
+            self.fanout.publish_raw(channel, args[0])
+        await self._decode(args[0], self._on_private_message)
+
+    async def _on_private_message(self, msg):
+        start = None if self.metrics is None else perf_counter()
+        if self.fanout is not None and self.fanout.encoding == FanoutEncodings.BINARY:
+            self.fanout.publish_message(BittrexParameters.BALANCE_DELTA if 'd' in msg else
+                                        BittrexParameters.ORDER_DELTA, msg)
+        if self.account_state is not None:
+            change = self.account_state.on_delta(msg)
+            if change is not None:
+                await self._dispatch(self.on_account_change, change, None, droppable=False)
+        if self.message_factory is not None:
+            msg = self.message_factory.private(msg)
+        if start is not None:
+            self.metrics.observe(MetricStages.DISPATCH, perf_counter() - start)
+        await self._dispatch(self.on_private, msg, None, start is not None, droppable=False)
 
     async def _on_debug(self, **kwargs):
         # `QueryExchangeState`, `QuerySummaryState` and `GetAuthContext` are received in the debug channel.
+        # So is every other frame, keep-alives included.
+        if self._connected_at is None:
+            self._connected_at = time.monotonic()
+        if self.health is not None:
+            self.health.on_frame(time.monotonic())
         await self._is_query_invoke(kwargs)
 
     async def _is_query_invoke(self, kwargs):
-        if 'R' in kwargs and type(kwargs['R']) is not bool:
-            invoke = self.invokes[int(kwargs['I'])]['invoke']
+        if 'I' not in kwargs or ('R' not in kwargs and 'E' not in kwargs):
+            return
+        invocation = self.invoker.on_response(int(kwargs['I']), kwargs.get('R'), kwargs.get('E'))
+        if invocation is not None and 'R' in kwargs and type(kwargs['R']) is not bool:
+            invoke = invocation.method
             if invoke == BittrexMethods.GET_AUTH_CONTENT:
-                signature = await create_signature(self.credentials['api_secret'], kwargs['R'])
-                event = SubscribeEvent(BittrexMethods.AUTHENTICATE, self.credentials['api_key'], signature)
-                self.control_queue.put(event)
+                self._authenticate(kwargs['R'])
             else:
-                msg = await process_message(kwargs['R'])
-                if msg is not None:
-                    msg['invoke_type'] = invoke
-                    msg['ticker'] = self.invokes[int(kwargs['I'])].get('ticker')
-                    await self.on_public(msg)
+                ticker = invocation.ticker
+                if self.recorder is not None and invoke in RecordChannels.QUERIES:
+                    self.recorder.write(invoke, kwargs['R'], ticker)
+                if self.fanout is not None and self.fanout.encoding == FanoutEncodings.RAW:
+                    self.fanout.publish_raw(invoke, kwargs['R'], ticker)
+                await self._decode(kwargs['R'], partial(self._on_query_message, invoke, ticker))
+
+    async def _on_query_message(self, invoke, ticker, msg):
+        if msg is not None:
+            start = None if self.metrics is None else perf_counter()
+            msg['invoke_type'] = invoke
+            msg['ticker'] = ticker
+            if invoke == BittrexMethods.QUERY_EXCHANGE_STATE:
+                book = self.order_books.get(ticker)
+                if book is not None:
+                    if book.on_snapshot(msg):
+                        self._resync_order_book(book.market)
+                    if self.book_store is not None:
+                        self.book_store.on_snapshot(book)
+                    if self.shared_memory is not None:
+                        self.shared_memory.publish_book(book)
+                if self.fill_aggregator is not None:
+                    self.fill_aggregator.on_fills(ticker, msg['f'])
+            elif invoke == BittrexMethods.QUERY_SUMMARY_STATE:
+                if self.summary_table is not None:
+                    self.summary_table.on_summary_state(msg)
+                if self.shared_memory is not None:
+                    self.shared_memory.publish_summaries(msg['s'])
+            if self.fanout is not None and self.fanout.encoding == FanoutEncodings.BINARY:
+                self.fanout.publish_message(invoke, msg, ticker)
+            await self._deliver_public(msg, start)
+
+    async def _deliver_public(self, msg, start=None):
+        # Internal state is always updated from the raw dict, users may get typed messages.
+        timed = start is not None
+        if timed:
+            # Observed once per message, however many handlers it goes to.
+            self.metrics.observe(MetricStages.DISPATCH, perf_counter() - start)
+        if self.market_handlers or self.channel_handlers:
+            await self._route(msg, timed)
+        if self.batcher is not None:
+            await self._batch_public(msg)
+            return
+        if getattr(self.on_public, '__func__', None) is BittrexSocket.on_public:
+            # Neither overridden in a subclass nor assigned on the instance, nothing to convert for.
+            return
+        key = merge = None
+        if self.delivery is not None:
+            # Summaries span all markets and are kept in order as a single stream.
+            key = msg.get('M') or msg.get('ticker') or msg['invoke_type']
+            if msg['invoke_type'] in BittrexMethods.SUMMARIES:
+                merge = merge_summaries
+        if self.message_factory is not None:
+            msg = self.message_factory.public(msg)
+        await self._dispatch(self.on_public, msg, key, timed, merge=merge)
+
+    async def _route(self, msg, timed=False):
+        # Messages nobody registered for are dropped here, before being converted.
+        factory = self.message_factory
+        invoke_type = msg['invoke_type']
+        item = None
+        merge = merge_summaries if invoke_type in BittrexMethods.SUMMARIES else None
+        for handler in self.channel_handlers.get(invoke_type, ()):
+            if item is None:
+                item = factory.public(msg) if factory is not None else msg
+            await self._dispatch(handler, item, invoke_type, timed, merge=merge)
+        if not self.market_handlers:
+            return
+        if invoke_type in BittrexMethods.SUMMARIES:
+            for row in msg['s'] if invoke_type == BittrexMethods.QUERY_SUMMARY_STATE else msg['D']:
+                handlers = self.market_handlers.get(row['M'])
+                if handlers:
+                    if factory is not None:
+                        row_item = factory.summary_delta(row)
+                    else:
+                        # Tagged on a copy, the message itself still goes to `on_public`.
+                        row_item = dict(row, invoke_type=invoke_type)
+                    for handler in handlers:
+                        await self._dispatch(handler, row_item, row['M'], timed)
+        else:
+            market = msg['M'] if msg.get('M') is not None else msg.get('ticker')
+            handlers = self.market_handlers.get(market)
+            if handlers:
+                if item is None:
+                    item = factory.public(msg) if factory is not None else msg
+                for handler in handlers:
+                    await self._dispatch(handler, item, market, timed)
+
+    async def _dispatch(self, handler, msg, key=None, timed=False, droppable=True, merge=None):
+        # Hands the message over to the callback, directly or through the delivery buffers.
+        if self.delivery is not None:
+            await self.delivery.put(key, handler, msg, droppable, merge)
+        elif not timed:
+            await handler(msg)
+        else:
+            start = perf_counter()
+            await handler(msg)
+            self.metrics.observe(MetricStages.HANDLER, perf_counter() - start)
+
+    async def _batch_public(self, msg):
+        factory = self.message_factory
+        invoke_type = msg['invoke_type']
+        if invoke_type in BittrexMethods.SUMMARIES:
+            # Summary messages are split into rows so that each lands in its market's batch.
+            for row in msg['s'] if invoke_type == BittrexMethods.QUERY_SUMMARY_STATE else msg['D']:
+                if factory is not None:
+                    item = factory.summary_delta(row)
+                else:
+                    item = dict(row, invoke_type=invoke_type)
+                await self.batcher.add_summary(row['M'], item)
+        else:
+            market = msg['M'] if msg.get('M') is not None else msg.get('ticker')
+            await self.batcher.add(market, factory.public(msg) if factory is not None else msg)
 
     # ======================
     # Public Channel Methods
@@ -213,9 +862,61 @@ class BittrexSocket(WebSocket):
     async def on_public(self, msg):
         pass
 
+    def on_market(self, market, handler):
+        """
+        Routes the public messages of a single market to `handler`: exchange deltas, its
+        `QueryExchangeState` snapshots and its rows of summary messages (tagged with `invoke_type`).
+
+        The same message object is passed to every handler and to `on_public`, so handlers
+        must treat it as read-only.
+
+        :param market: The ticker, e.g. 'BTC-ETH'.
+        :type market: str
+        :param handler: Coroutine function called with each message.
+        """
+        self.market_handlers.setdefault(market, []).append(handler)
+
+    def off_market(self, market, handler):
+        handlers = self.market_handlers.get(market, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.market_handlers.pop(market, None)
+
+    def on_channel(self, invoke_type, handler):
+        """
+        Routes every public message of a channel to `handler`. Messages are shared with the
+        other handlers and `on_public` and must be treated as read-only.
+
+        :param invoke_type: The `BittrexMethods` method the messages belong to.
+        :type invoke_type: str
+        :param handler: Coroutine function called with each message.
+        """
+        self.channel_handlers.setdefault(invoke_type, []).append(handler)
+
+    def off_channel(self, invoke_type, handler):
+        handlers = self.channel_handlers.get(invoke_type, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.channel_handlers.pop(invoke_type, None)
+
+    async def on_public_batch(self, market, msgs):
+        """
+        Receives batches of public messages for a single market when batching is enabled.
+        Summary messages are delivered as individual rows tagged with their `invoke_type`.
+        """
+        pass
+
     async def on_private(self, msg):
         pass
 
+    async def on_account_change(self, change):
+        """
+        Receives every `BalanceDelta` or `OrderDelta` applied to `account_state`.
+        """
+        pass
+
     async def on_error(self, args):
         logger.error(args)
 
@@ -223,6 +924,155 @@ class BittrexSocket(WebSocket):
     # Other Methods
     # =============
 
+    def configure_invoker(self, rate=None, burst=None, max_retries=None, timeout=None):
+        """
+        Tunes how invokes are paced and retried. Unset parameters keep their current value.
+
+        :param rate: Sustained invokes per second.
+        :type rate: float
+        :param burst: Invokes that can be sent back to back before `rate` applies.
+        :type burst: int
+        :param max_retries: Retries of a failed or unanswered invoke before giving up.
+        :type max_retries: int
+        :param timeout: Seconds to wait for a response before retrying.
+        :type timeout: float
+        """
+        invoker = self.invoker
+        invoker.rate = invoker.rate if rate is None else rate
+        invoker.burst = invoker.burst if burst is None else burst
+        invoker.max_retries = invoker.max_retries if max_retries is None else max_retries
+        invoker.timeout = invoker.timeout if timeout is None else timeout
+
+    def configure_reconnect(self, base_delay=None, max_delay=None):
+        """
+        Tunes the backoff between connection attempts. Unset parameters keep their current value.
+
+        :param base_delay: Upper bound in seconds of the wait before the first retry, doubled after every failure.
+        :type base_delay: float
+        :param max_delay: Upper bound in seconds of any wait.
+        :type max_delay: float
+        """
+        self.reconnect_base_delay = self.reconnect_base_delay if base_delay is None else base_delay
+        self.reconnect_max_delay = self.reconnect_max_delay if max_delay is None else max_delay
+
+    def enable_decode_pool(self, workers=None, use_processes=False):
+        """
+        Moves message decoding off the event loop onto a worker pool.
+        Messages are still delivered to the callbacks in the order they were received.
+
+        :param workers: Number of workers. Defaults to the executor's default.
+        :type workers: int
+        :param use_processes: Use a process pool instead of a thread pool.
+        :type use_processes: bool
+        """
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+        self.decode_pool = DecodePool(self.decoder, workers, use_processes)
+
+    def enable_batching(self, max_messages=100, interval=0.1, coalesce_summaries=False):
+        """
+        Delivers public messages through `on_public_batch` instead of `on_public`.
+        Handlers registered with `on_market`/`on_channel` keep receiving them one by one.
+
+        :param max_messages: Flush a market once it has this many messages.
+        :type max_messages: int
+        :param interval: Seconds between periodic flushes of all markets.
+        :type interval: float
+        :param coalesce_summaries: Deliver only the newest summary row of each market per flush.
+        :type coalesce_summaries: bool
+        """
+        if self.batcher is not None:
+            self.batcher.stop()
+        self.batcher = Batcher(self.on_public_batch, max_messages, interval, coalesce_summaries)
+
+    def enable_recording(self, directory, segment_size=64 * 1024 * 1024):
+        """
+        Appends every received payload, still compressed, to a segmented log that `Replayer` can play back.
+
+        :param directory: Where the log segments are written.
+        :type directory: str
+        :param segment_size: Size in bytes after which a new segment is started.
+        :type segment_size: int
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+        self.recorder = Recorder(directory, segment_size)
+
+    def enable_delivery_queue(self, max_size=1000, policy=DeliveryPolicies.BLOCK):
+        """
+        Decouples `on_public`/`on_private` from the socket reader through bounded per-market buffers,
+        so that a slow callback does not hold up reading from the socket.
+
+        :param max_size: Messages buffered per market.
+        :type max_size: int
+        :param policy: What happens once a market's buffer is full, one of `DeliveryPolicies`.
+            Account-level messages are never dropped.
+        :type policy: str
+        """
+        if self.delivery is not None:
+            self.delivery.stop()
+        self.delivery = DeliveryQueue(max_size, policy, self.metrics)
+
+    def enable_metrics(self, port=None, host='127.0.0.1'):
+        """
+        Starts recording per-stage timings and counters of the receive path, see `stats`.
+
+        :param port: Also serve the metrics in the Prometheus text format on http://host:port/metrics.
+        :type port: int
+        :param host: Interface the metrics endpoint listens on.
+        :type host: str
+        """
+        if self.metrics is None:
+            self.metrics = Metrics()
+        if self.delivery is not None:
+            self.delivery.metrics = self.metrics
+        if port is not None and self.metrics_server is None:
+            self.metrics_server = MetricsServer(self.stats, host, port)
+
+    def stats(self):
+        """
+        :return: Queue depths and order book state, plus stage histograms (seconds) and
+            message, byte and reconnect counters once `enable_metrics` has been called.
+        :rtype: dict
+        """
+        books = list(self.order_books.values())
+        gauges = {
+            'control_queue': 0 if self.control_queue is None else self.control_queue.qsize(),
+            'invokes_pending': self.invoker.pending(),
+            'invokes_in_flight': len(self.invokes.in_flight),
+            'decode_pool_pending': 0 if self.decode_pool is None else self.decode_pool.pending(),
+            'delivery_pending': 0 if self.delivery is None else self.delivery.pending(),
+            'nonce_gaps': sum(book.gaps for book in books),
+            'stale_books': sum(1 for book in books if book.stale),
+        }
+        stats = {'gauges': gauges, 'dropped': {} if self.delivery is None else dict(self.delivery.dropped)}
+        if self.health is not None:
+            health = stats['health'] = self.health.snapshot(time.monotonic())
+            gauges['last_frame_age'] = health['last_frame_age']
+            gauges['probe_latency'] = health['probe_latency']
+        if self.metrics is not None:
+            stats.update(self.metrics.snapshot())
+        return stats
+
+    def enable_summary_filter(self, markets):
+        """
+        Only decodes the rows of `markets` from summary deltas, the others are skipped without being parsed.
+        `QuerySummaryState` responses are still decoded in full.
+
+        :param markets: Tickers to keep, None to decode every row again.
+        :type markets: []
+        """
+        self.summary_filter = None if markets is None else SummaryFilter(markets)
+
+    def enable_typed_messages(self, use_decimal=False):
+        """
+        Delivers messages as the `__slots__` classes from `messages` instead of minified dicts.
+
+        :param use_decimal: Represent rates, quantities and balances as Decimal instead of float.
+        :type use_decimal: bool
+        """
+        self.message_factory = MessageFactory(use_decimal)
+
     @staticmethod
     def enable_log(file_name=None):
         """
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# /examples/async_ticker_updates.py
+# Stanislav Lazarov
+
+# Sample script showing how AsyncBittrexSocket runs inside your own event loop.
+
+# Overview:
+# ---------
+# 1) Connects from a coroutine, without any extra threads.
+# 2) Subscribes to N tickers and iterates over the incoming messages.
+# 3) Disconnects when it has received an update for each ticker.
+
+import asyncio
+from bittrex_websocket import AsyncBittrexSocket, BittrexMethods
+
+
+async def main():
+    tickers = ['BTC-ETH', 'BTC-NEO', 'BTC-ZEC', 'ETH-NEO', 'ETH-ZEC']
+    ticker_updates_container = {}
+
+    async with AsyncBittrexSocket() as ws:
+        ws.enable_log()
+        await ws.subscribe_to_exchange_deltas(tickers)
+        async for msg in ws:
+            if msg['invoke_type'] == BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS:
+                name = msg['M']
+                if name not in ticker_updates_container:
+                    ticker_updates_container[name] = msg
+                    print('Just received market update for {}.'.format(name))
+            if len(ticker_updates_container) == len(tickers):
+                print('We have received updates for all tickers. Closing...')
+                break
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,51 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# /examples/record_and_replay.py
+# Stanislav Lazarov
+
+# Sample script showing how enable_recording() and Replayer work.
+
+# Overview:
+# ---------
+# 1) Records the raw exchange deltas of a few tickers to ./recording for a minute.
+# 2) Replays the recording offline as fast as possible, counting the messages per ticker.
+
+from __future__ import print_function
+import asyncio
+from time import sleep
+from bittrex_websocket import BittrexSocket, AsyncBittrexSocket, Replayer
+
+
+def record(directory, tickers):
+    ws = BittrexSocket()
+    ws.enable_log()
+    ws.enable_recording(directory)
+    ws.subscribe_to_exchange_deltas(tickers)
+    sleep(60)
+    ws.disconnect()
+    sleep(5)
+
+
+def replay(directory):
+    class MySocket(AsyncBittrexSocket):
+
+        async def on_public(self, msg):
+            counts[msg['M']] = counts.get(msg['M'], 0) + 1
+
+    counts = {}
+    # The socket is never connected, it only receives what the replayer feeds it.
+    ws = MySocket()
+    loop = asyncio.new_event_loop()
+    total = loop.run_until_complete(Replayer(directory, speed=None).replay(ws))
+    print('Replayed {} messages: {}'.format(total, counts))
+
+
+def main():
+    directory = 'recording'
+    record(directory, ['BTC-ETH', 'BTC-NEO', 'BTC-ZEC'])
+    replay(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -35,14 +35,9 @@ def main():
     ws.enable_log()
     # Define tickers
     tickers = ['BTC-ETH', 'BTC-NEO', 'BTC-ZEC', 'ETH-NEO', 'ETH-ZEC']
-    # Subscribe to ticker information
-    for ticker in tickers:
-        sleep(0.01)
-        ws.subscribe_to_exchange_deltas([ticker])
-
-    # Users can also subscribe without introducing delays during invoking but
-    # it is the recommended way when you are subscribing to a large list of tickers.
-    # ws.subscribe_to_exchange_deltas(tickers)
+    # Subscribe to ticker information. Invokes are paced by the client,
+    # so even large ticker lists can be submitted at once.
+    ws.subscribe_to_exchange_deltas(tickers)
 
     while len(ticker_updates_container) < len(tickers):
         sleep(1)
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_async_client.py
+# Stanislav Lazarov
+
+import asyncio
+import unittest
+
+from bittrex_websocket._exceptions import InvokeError
+from bittrex_websocket.async_client import AsyncBittrexSocket
+from bittrex_websocket.constants import BittrexMethods
+
+
+class _Transport(object):
+    def __init__(self, loop):
+        self.ws_loop = loop
+
+
+class _Connection(object):
+    """
+    Stands in for the SignalR connection, answering every invoke with `result`.
+    """
+
+    def __init__(self, client, loop, result=True):
+        self.transport = _Transport(loop)
+        self.client = client
+        self.result = result
+        self.sent = []
+
+    def invoke(self, method, *args):
+        invoke_id = len(self.sent) + 1
+        self.sent.append((method, args))
+        self.transport.ws_loop.call_soon(self.client.invoker.on_response, invoke_id, self.result)
+        return invoke_id
+
+
+class AsyncBittrexSocketTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = AsyncBittrexSocket()
+
+    def tearDown(self):
+        self.client.invoker.stop()
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def connect(self, result=True):
+        self.connection = _Connection(self.client, self.loop, result)
+        self.client.connection = self.connection
+        self.client.invoker.attach(self.connection)
+
+    def test_subscribe_returns_once_acknowledged(self):
+        self.connect()
+        results = self.loop.run_until_complete(
+            asyncio.wait_for(self.client.subscribe_to_exchange_deltas(['BTC-ETH', 'BTC-LTC']), 1.0))
+        self.assertEqual(results, [True, True])
+        self.assertEqual(self.connection.sent, [(BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, ('BTC-ETH',)),
+                                                (BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, ('BTC-LTC',))])
+        self.assertIn((BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, 'BTC-LTC'), self.client.invokes.subscriptions)
+
+    def test_subscribe_raises_when_refused(self):
+        self.connect(result=False)
+        self.client.invoker.max_retries = 0
+        with self.assertRaises(InvokeError):
+            self.loop.run_until_complete(asyncio.wait_for(self.client.subscribe_to_summary_deltas(), 1.0))
+
+    def test_subscriptions_wait_for_the_connection(self):
+        async def scenario():
+            subscription = asyncio.ensure_future(self.client.subscribe_to_summary_deltas())
+            await asyncio.sleep(0.01)
+            self.assertFalse(subscription.done())
+            self.connect()
+            # What `_start_connection` does once the connection exists.
+            events, self.client._pending_events = self.client._pending_events, []
+            for event in events:
+                self.client._submit(event)
+            return await asyncio.wait_for(subscription, 1.0)
+        self.assertTrue(self.loop.run_until_complete(scenario()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_bars.py
+# Stanislav Lazarov
+
+import math
+import unittest
+
+from bittrex_websocket.bars import BarSeries, FillAggregator
+
+
+def fill(fill_id, seconds, price, quantity=1.0):
+    return {'I': fill_id, 'T': int(seconds * 1000), 'P': price, 'Q': quantity, 'OT': 'BUY'}
+
+
+class BarSeriesTest(unittest.TestCase):
+    def test_ohlc_follows_fill_time(self):
+        series = BarSeries('BTC-ETH', 60, 10)
+        series.add(130.0, 2.0, 1.0)
+        series.add(125.0, 1.0, 1.0)
+        series.add(150.0, 3.0, 2.0)
+        bar, = series.bars()
+        self.assertEqual((bar.open, bar.high, bar.low, bar.close), (1.0, 3.0, 1.0, 3.0))
+        self.assertEqual(bar.volume, 4.0)
+        self.assertAlmostEqual(bar.vwap, 9.0 / 4.0)
+
+    def test_empty_intervals_get_bars(self):
+        series = BarSeries('BTC-ETH', 60, 10)
+        series.add(0.0, 1.0, 1.0)
+        series.add(180.0, 2.0, 1.0)
+        bars = series.bars()
+        self.assertEqual([bar.trades for bar in bars], [1, 0, 0, 1])
+        self.assertTrue(math.isnan(bars[1].open))
+
+    def test_backfills_up_to_capacity(self):
+        series = BarSeries('BTC-ETH', 60, 3)
+        self.assertTrue(series.add(300.0, 1.0, 1.0))
+        self.assertTrue(series.add(190.0, 2.0, 1.0))
+        self.assertEqual(len(series), 3)
+        bars = series.bars()
+        self.assertEqual([bar.trades for bar in bars], [1, 0, 1])
+        self.assertEqual((bars[0].open, bars[2].open), (2.0, 1.0))
+        self.assertFalse(series.add(179.0, 3.0, 1.0))
+
+    def test_old_bars_roll_out(self):
+        series = BarSeries('BTC-ETH', 60, 2)
+        series.add(0.0, 1.0, 1.0)
+        series.add(120.0, 2.0, 1.0)
+        self.assertEqual([bar.open for bar in series.bars()][-1], 2.0)
+        self.assertEqual(len(series), 2)
+        self.assertFalse(series.add(30.0, 3.0, 1.0))
+
+
+class FillAggregatorTest(unittest.TestCase):
+    def test_snapshot_fills_newest_first(self):
+        aggregator = FillAggregator(interval=60, capacity=10)
+        fills = [fill(3, 250.0, 3.0), fill(2, 130.0, 2.0), fill(1, 10.0, 1.0)]
+        self.assertEqual(aggregator.on_fills('BTC-ETH', fills), 3)
+        self.assertEqual([bar.trades for bar in aggregator.bars('BTC-ETH')], [1, 0, 1, 0, 1])
+
+    def test_duplicates_are_skipped(self):
+        aggregator = FillAggregator(interval=60, capacity=10)
+        aggregator.on_fills('BTC-ETH', [fill(1, 10.0, 1.0)])
+        self.assertEqual(aggregator.on_fills('BTC-ETH', [fill(1, 10.0, 1.0), fill(2, 20.0, 2.0)]), 1)
+        self.assertEqual(aggregator.bars('BTC-ETH')[0].trades, 2)
+
+    def test_counts_only_kept_fills(self):
+        aggregator = FillAggregator(interval=60, capacity=2)
+        fills = [fill(i, i * 60.0, float(i)) for i in range(5)]
+        self.assertEqual(aggregator.on_fills('BTC-ETH', fills), 2)
+        self.assertEqual(aggregator.on_fills('BTC-ETH', [fill(9, 0.0, 1.0)]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
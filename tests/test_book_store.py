@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_book_store.py
+# Stanislav Lazarov
+
+import shutil
+import tempfile
+import unittest
+
+from bittrex_websocket.book_store import BookStore
+from bittrex_websocket.order_book import OrderBook
+
+MARKET = 'BTC-ETH'
+
+
+def snapshot(nonce):
+    return {'M': MARKET, 'N': nonce, 'Z': [{'R': 1.0, 'Q': 1.0}], 'S': [{'R': 2.0, 'Q': 1.0}], 'f': []}
+
+
+def delta(nonce):
+    # Each delta sets a bid level at a rate equal to its nonce, so the applied deltas are visible.
+    return {'M': MARKET, 'N': nonce, 'Z': [{'TY': 0, 'R': float(nonce), 'Q': 1.0}], 'S': [], 'f': []}
+
+
+class BookStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = BookStore(self.directory, checkpoint_interval=1000.0, checkpoint_deltas=1000)
+        self.book = OrderBook(MARKET)
+        self.book.on_snapshot(snapshot(10))
+        self.store.on_snapshot(self.book, 100.0)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def feed(self, nonce, timestamp):
+        msg = delta(nonce)
+        self.book.on_delta(msg)
+        self.store.on_delta(self.book, msg, timestamp)
+
+    def test_replays_deltas(self):
+        self.feed(11, 101.0)
+        self.feed(12, 102.0)
+        self.assertEqual(self.store.book_at(MARKET, 101.5).nonce, 11)
+        book = self.store.book_at(MARKET, 200.0)
+        self.assertEqual(book.nonce, 12)
+        self.assertEqual(list(book.bids.top()), list(self.book.bids.top()))
+
+    def test_stale_and_duplicate_deltas_are_skipped(self):
+        self.feed(11, 101.0)
+        self.feed(12, 102.0)
+        self.feed(11, 103.0)
+        self.feed(12, 104.0)
+        self.feed(13, 105.0)
+        self.feed(14, 106.0)
+        self.assertEqual(self.book.nonce, 14)
+        book = self.store.book_at(MARKET, 200.0)
+        self.assertEqual(book.nonce, 14)
+        self.assertEqual(list(book.bids.top()), list(self.book.bids.top()))
+
+    def test_gap_stops_until_next_snapshot(self):
+        self.feed(11, 101.0)
+        self.feed(13, 102.0)
+        self.assertFalse(self.book.synced)
+        self.feed(14, 103.0)
+        self.assertEqual(self.store.book_at(MARKET, 150.0).nonce, 11)
+        self.book.on_snapshot(snapshot(20))
+        self.store.on_snapshot(self.book, 160.0)
+        self.feed(21, 161.0)
+        self.assertEqual(self.store.checkpoints(MARKET), [100.0, 160.0])
+        self.assertEqual(self.store.book_at(MARKET, 200.0).nonce, 21)
+
+    def test_nothing_before_first_checkpoint(self):
+        self.assertIsNone(self.store.book_at(MARKET, 99.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
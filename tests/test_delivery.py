@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_delivery.py
+# Stanislav Lazarov
+
+import asyncio
+import unittest
+
+from bittrex_websocket._delivery import DeliveryQueue, merge_summaries
+from bittrex_websocket.constants import BittrexMethods, DeliveryPolicies
+from bittrex_websocket.messages import MessageFactory
+
+
+class DeliveryQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.received = []
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_scenario(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def handler(self, name):
+        async def handler(msg):
+            self.received.append((name, msg))
+        return handler
+
+    async def drain(self, queue):
+        while queue.pending():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        queue.stop()
+        # Lets the cancellation run before the loop closes.
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    def test_rejects_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            DeliveryQueue(policy='unknown')
+
+    def test_keeps_order_within_market(self):
+        async def scenario():
+            queue = DeliveryQueue(10, DeliveryPolicies.BLOCK)
+            handler = self.handler('a')
+            for i in range(5):
+                await queue.put('BTC-ETH', handler, i)
+            await self.drain(queue)
+        self.run_scenario(scenario())
+        self.assertEqual([msg for _, msg in self.received], [0, 1, 2, 3, 4])
+
+    def test_markets_take_turns(self):
+        async def scenario():
+            queue = DeliveryQueue(10, DeliveryPolicies.BLOCK)
+            handler = self.handler('a')
+            for i in range(3):
+                await queue.put('BTC-ETH', handler, 'eth{}'.format(i))
+            await queue.put('BTC-LTC', handler, 'ltc0')
+            await self.drain(queue)
+        self.run_scenario(scenario())
+        self.assertEqual([msg for _, msg in self.received], ['eth0', 'ltc0', 'eth1', 'eth2'])
+
+    def test_drop_oldest(self):
+        async def scenario():
+            queue = DeliveryQueue(2, DeliveryPolicies.DROP_OLDEST)
+            handler = self.handler('a')
+            for i in range(5):
+                await queue.put('BTC-ETH', handler, i)
+            await self.drain(queue)
+            return queue
+        queue = self.run_scenario(scenario())
+        self.assertEqual([msg for _, msg in self.received], [3, 4])
+        self.assertEqual(queue.dropped, {'BTC-ETH': 3})
+
+    def test_conflate_per_handler(self):
+        async def scenario():
+            queue = DeliveryQueue(10, DeliveryPolicies.CONFLATE)
+            first, second = self.handler('first'), self.handler('second')
+            await queue.put('BTC-ETH', first, 1)
+            await queue.put('BTC-ETH', second, 1)
+            await queue.put('BTC-ETH', first, 2)
+            await queue.put('BTC-ETH', first, 3)
+            await self.drain(queue)
+            return queue
+        queue = self.run_scenario(scenario())
+        self.assertEqual(sorted(self.received), [('first', 3), ('second', 1)])
+        self.assertEqual(queue.dropped, {'BTC-ETH': 2})
+
+    def test_conflate_never_drops_account_messages(self):
+        async def scenario():
+            queue = DeliveryQueue(10, DeliveryPolicies.CONFLATE)
+            handler = self.handler('a')
+            for i in range(3):
+                await queue.put(None, handler, i, droppable=False)
+            await self.drain(queue)
+        self.run_scenario(scenario())
+        self.assertEqual([msg for _, msg in self.received], [0, 1, 2])
+
+    def test_block_waits_for_room(self):
+        async def scenario():
+            queue = DeliveryQueue(1, DeliveryPolicies.BLOCK)
+            handler = self.handler('a')
+            await queue.put('BTC-ETH', handler, 0)
+            # Returns only once the first message has been handed over.
+            await asyncio.wait_for(queue.put('BTC-ETH', handler, 1), 1.0)
+            await self.drain(queue)
+        self.run_scenario(scenario())
+        self.assertEqual([msg for _, msg in self.received], [0, 1])
+
+    def test_handler_errors_do_not_stop_delivery(self):
+        async def failing(msg):
+            raise RuntimeError(msg)
+
+        async def scenario():
+            queue = DeliveryQueue(10, DeliveryPolicies.BLOCK)
+            await queue.put('BTC-ETH', failing, 0)
+            await queue.put('BTC-ETH', self.handler('a'), 1)
+            await self.drain(queue)
+        self.run_scenario(scenario())
+        self.assertEqual(self.received, [('a', 1)])
+
+    def test_conflate_merges_summaries(self):
+        invoke_type = BittrexMethods.SUBSCRIBE_TO_SUMMARY_DELTAS
+
+        async def scenario():
+            queue = DeliveryQueue(10, DeliveryPolicies.CONFLATE)
+            handler = self.handler('a')
+            await queue.put(invoke_type, handler, {'invoke_type': invoke_type, 'N': 1,
+                                                   'D': [{'M': 'A', 'l': 1}, {'M': 'B', 'l': 1}]},
+                            merge=merge_summaries)
+            await queue.put(invoke_type, handler, {'invoke_type': invoke_type, 'N': 2,
+                                                   'D': [{'M': 'A', 'l': 2}, {'M': 'C', 'l': 2}]},
+                            merge=merge_summaries)
+            await self.drain(queue)
+            return queue
+        queue = self.run_scenario(scenario())
+        self.assertEqual(queue.dropped, {})
+        (_, msg), = self.received
+        self.assertEqual(msg['N'], 2)
+        self.assertEqual(msg['D'], [{'M': 'A', 'l': 2}, {'M': 'B', 'l': 1}, {'M': 'C', 'l': 2}])
+
+
+class MergeSummariesTest(unittest.TestCase):
+    def test_typed_messages(self):
+        factory = MessageFactory()
+        invoke_type = BittrexMethods.QUERY_SUMMARY_STATE
+        pending = factory.public({'invoke_type': invoke_type, 'N': 1, 's': [{'M': 'A', 'l': 1}, {'M': 'B', 'l': 1}]})
+        msg = factory.public({'invoke_type': invoke_type, 'N': 2, 's': [{'M': 'B', 'l': 2}]})
+        merged = merge_summaries(pending, msg)
+        self.assertEqual(merged.nonce, 2)
+        self.assertEqual([(row.market, row.last) for row in merged.deltas], [('A', 1.0), ('B', 2.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
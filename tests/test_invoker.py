@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_invoker.py
+# Stanislav Lazarov
+
+import asyncio
+import unittest
+from concurrent.futures import Future
+
+from bittrex_websocket._exceptions import InvokeError
+from bittrex_websocket._invoker import InvokeScheduler, InvokeRegistry, Invocation
+from bittrex_websocket.constants import BittrexMethods
+
+
+class _Transport(object):
+    def __init__(self, loop):
+        self.ws_loop = loop
+
+
+class _Connection(object):
+    """
+    Records the invokes instead of sending them.
+    """
+
+    def __init__(self, loop, first_id=0):
+        self.transport = _Transport(loop)
+        self.sent = []
+        self._next_id = first_id
+
+    def invoke(self, method, *args):
+        self._next_id += 1
+        self.sent.append((self._next_id, method, args))
+        return self._next_id
+
+
+class InvokeSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.registry = InvokeRegistry()
+        self.acked = []
+        self.scheduler = InvokeScheduler(self.registry, rate=1000.0, burst=100, max_retries=2, timeout=0.05,
+                                         on_ack=self.acked.append)
+        self.connection = _Connection(self.loop)
+        self.scheduler.attach(self.connection)
+
+    def tearDown(self):
+        self.scheduler.stop()
+        self.run_for(0.01)
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_for(self, seconds):
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def submit(self, method=BittrexMethods.SUBSCRIBE_TO_EXCHANGE_DELTAS, ticker='BTC-ETH', replay=True, **kwargs):
+        future = Future()
+        self.scheduler.submit(Invocation(method, (ticker,), ticker, future, replay, **kwargs))
+        self.run_for(0.01)
+        return future
+
+    def test_ack_resolves_and_keeps_subscription(self):
+        future = self.submit()
+        invoke_id, method, args = self.connection.sent[0]
+        self.assertEqual(args, ('BTC-ETH',))
+        invocation = self.scheduler.on_response(invoke_id, result=True)
+        self.assertTrue(future.result(0))
+        self.assertEqual(self.acked, [invocation])
+        self.assertIn((method, 'BTC-ETH'), self.registry.subscriptions)
+        self.assertEqual(self.registry.in_flight, {})
+
+    def test_queries_are_not_kept(self):
+        future = self.submit(BittrexMethods.QUERY_EXCHANGE_STATE, replay=False)
+        self.scheduler.on_response(self.connection.sent[0][0], result='payload')
+        self.assertTrue(future.result(0))
+        self.assertEqual(self.registry.subscriptions, {})
+
+    def test_unknown_response_is_ignored(self):
+        self.assertIsNone(self.scheduler.on_response(42, result=True))
+
+    def test_errors_are_retried_then_fail(self):
+        future = self.submit()
+        for attempt in range(3):
+            self.assertFalse(future.done())
+            self.scheduler.on_response(self.connection.sent[-1][0], error='Boom')
+            self.run_for(0.01)
+        self.assertEqual(len(self.connection.sent), 3)
+        with self.assertRaises(InvokeError):
+            future.result(0)
+        self.assertEqual(self.registry.in_flight, {})
+
+    def test_false_result_is_retried(self):
+        future = self.submit()
+        self.scheduler.on_response(self.connection.sent[-1][0], result=False)
+        self.run_for(0.01)
+        self.assertEqual(len(self.connection.sent), 2)
+        self.scheduler.on_response(self.connection.sent[-1][0], result=True)
+        self.assertTrue(future.result(0))
+
+    def test_timeouts_are_retried(self):
+        future = self.submit()
+        self.run_for(0.2)
+        self.assertEqual(len(self.connection.sent), 3)
+        self.assertIsInstance(future.exception(0), InvokeError)
+
+    def test_per_invocation_timeout_and_retries(self):
+        future = self.submit(timeout=0.01, max_retries=0)
+        self.run_for(0.04)
+        self.assertEqual(len(self.connection.sent), 1)
+        self.assertIsInstance(future.exception(0), InvokeError)
+
+    def test_in_flight_invokes_are_resent_on_attach(self):
+        first = self.submit(ticker='BTC-ETH')
+        second = self.submit(ticker='BTC-LTC')
+        connection = _Connection(self.loop, first_id=100)
+        self.scheduler.attach(connection)
+        self.run_for(0.01)
+        self.assertEqual([args for _, _, args in connection.sent], [('BTC-ETH',), ('BTC-LTC',)])
+        for invoke_id, _, _ in connection.sent:
+            self.scheduler.on_response(invoke_id, result=True)
+        self.assertTrue(first.result(0) and second.result(0))
+
+    def test_push_goes_first(self):
+        self.scheduler.stop()
+        self.run_for(0.01)
+        scheduler = InvokeScheduler(InvokeRegistry(), rate=1000.0, burst=1)
+        connection = _Connection(self.loop)
+        scheduler.attach(connection)
+        for ticker in ('A', 'B', 'C'):
+            scheduler.submit(Invocation(BittrexMethods.QUERY_EXCHANGE_STATE, (ticker,), ticker))
+        # `push` runs on the loop, before the drain task first looks at the queue.
+        self.loop.call_soon(scheduler.push, Invocation(BittrexMethods.QUERY_EXCHANGE_STATE, ('P',), 'P'))
+        self.run_for(0.05)
+        scheduler.stop()
+        self.assertEqual([args[0] for _, _, args in connection.sent], ['P', 'A', 'B', 'C'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_order_book.py
+# Stanislav Lazarov
+
+import unittest
+
+from bittrex_websocket.constants import OrderBookDeltaTypes
+from bittrex_websocket.order_book import OrderBook
+
+MARKET = 'BTC-ETH'
+
+
+def snapshot(nonce, bids=((1.0, 1.0), (0.9, 2.0)), asks=((1.1, 1.0), (1.2, 2.0))):
+    return {'M': MARKET, 'N': nonce, 'Z': [{'R': rate, 'Q': quantity} for rate, quantity in bids],
+            'S': [{'R': rate, 'Q': quantity} for rate, quantity in asks], 'f': []}
+
+
+def delta(nonce, bids=(), asks=()):
+    return {'M': MARKET, 'N': nonce, 'Z': [{'TY': kind, 'R': rate, 'Q': quantity} for kind, rate, quantity in bids],
+            'S': [{'TY': kind, 'R': rate, 'Q': quantity} for kind, rate, quantity in asks], 'f': []}
+
+
+class OrderBookTest(unittest.TestCase):
+    def setUp(self):
+        self.book = OrderBook(MARKET)
+
+    def test_snapshot_sorts_sides(self):
+        self.assertFalse(self.book.on_snapshot(snapshot(10)))
+        self.assertTrue(self.book.synced)
+        self.assertEqual(self.book.best_bid(), (1.0, 1.0))
+        self.assertEqual(self.book.best_ask(), (1.1, 1.0))
+        self.assertEqual(list(self.book.top_bids(5)), [(1.0, 1.0), (0.9, 2.0)])
+        self.assertEqual(list(self.book.top_asks(1)), [(1.1, 1.0)])
+
+    def test_applies_deltas_in_sequence(self):
+        self.book.on_snapshot(snapshot(10))
+        self.assertFalse(self.book.on_delta(delta(11, bids=[(OrderBookDeltaTypes.ADD, 1.05, 3.0)],
+                                                  asks=[(OrderBookDeltaTypes.REMOVE, 1.1, 0.0)])))
+        self.assertFalse(self.book.on_delta(delta(12, bids=[(OrderBookDeltaTypes.UPDATE, 0.9, 5.0)])))
+        self.assertEqual(self.book.nonce, 12)
+        self.assertEqual(self.book.best_bid(), (1.05, 3.0))
+        self.assertEqual(self.book.best_ask(), (1.2, 2.0))
+        self.assertEqual(self.book.bid_depth_at(0.9), 5.0)
+
+    def test_stale_delta_is_dropped(self):
+        self.book.on_snapshot(snapshot(10))
+        self.book.on_delta(delta(11, bids=[(OrderBookDeltaTypes.ADD, 1.05, 3.0)]))
+        self.assertFalse(self.book.on_delta(delta(11, bids=[(OrderBookDeltaTypes.REMOVE, 1.05, 0.0)])))
+        self.assertFalse(self.book.on_delta(delta(9, bids=[(OrderBookDeltaTypes.REMOVE, 1.0, 0.0)])))
+        self.assertEqual(self.book.nonce, 11)
+        self.assertEqual(self.book.best_bid(), (1.05, 3.0))
+        self.assertTrue(self.book.synced)
+
+    def test_gap_requests_resync_and_buffers(self):
+        self.book.on_snapshot(snapshot(10))
+        self.assertTrue(self.book.on_delta(delta(12)))
+        self.assertFalse(self.book.synced)
+        self.assertTrue(self.book.stale)
+        self.assertEqual(self.book.gaps, 1)
+        self.assertFalse(self.book.on_delta(delta(13, bids=[(OrderBookDeltaTypes.ADD, 1.05, 3.0)])))
+        # The buffered deltas following the new snapshot are replayed on top of it.
+        self.assertFalse(self.book.on_snapshot(snapshot(12)))
+        self.assertTrue(self.book.synced)
+        self.assertFalse(self.book.stale)
+        self.assertEqual(self.book.nonce, 13)
+        self.assertEqual(self.book.best_bid(), (1.05, 3.0))
+
+    def test_deltas_before_snapshot_are_replayed(self):
+        self.book.on_delta(delta(9, bids=[(OrderBookDeltaTypes.ADD, 2.0, 1.0)]))
+        self.book.on_delta(delta(11, bids=[(OrderBookDeltaTypes.ADD, 1.05, 3.0)]))
+        self.book.on_delta(delta(12, asks=[(OrderBookDeltaTypes.ADD, 1.08, 1.0)]))
+        self.assertFalse(self.book.on_snapshot(snapshot(10)))
+        self.assertEqual(self.book.nonce, 12)
+        self.assertEqual(self.book.best_bid(), (1.05, 3.0))
+        self.assertEqual(self.book.best_ask(), (1.08, 1.0))
+
+    def test_snapshot_older_than_buffer_asks_again(self):
+        self.book.on_delta(delta(15))
+        self.assertTrue(self.book.on_snapshot(snapshot(10)))
+        self.assertFalse(self.book.synced)
+        self.assertFalse(self.book.on_snapshot(snapshot(14)))
+        self.assertEqual(self.book.nonce, 15)
+
+    def test_buffer_overflow_asks_again(self):
+        for nonce in range(OrderBook.MAX_BUFFER):
+            self.assertFalse(self.book.on_delta(delta(nonce)))
+        self.assertTrue(self.book.on_delta(delta(OrderBook.MAX_BUFFER)))
+
+    def test_invalidate_keeps_levels_as_stale(self):
+        self.book.on_snapshot(snapshot(10))
+        self.book.invalidate()
+        self.assertTrue(self.book.stale)
+        self.assertFalse(self.book.synced)
+        self.assertIsNone(self.book.nonce)
+        self.assertEqual(self.book.best_bid(), (1.0, 1.0))
+        self.book.on_snapshot(snapshot(3, bids=[(0.5, 1.0)]))
+        self.assertFalse(self.book.stale)
+        self.assertEqual(self.book.best_bid(), (0.5, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
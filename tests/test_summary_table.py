@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# tests/test_summary_table.py
+# Stanislav Lazarov
+
+import math
+import unittest
+
+from bittrex_websocket.summary_table import SummaryTable, numpy
+
+
+class SummaryTableTest(unittest.TestCase):
+    use_numpy = False
+
+    def setUp(self):
+        self.table = SummaryTable(self.use_numpy)
+
+    def last(self, market):
+        return self.table.row(market)['last']
+
+    def test_snapshot_then_deltas(self):
+        self.table.on_summary_state({'N': 10, 's': [{'M': 'BTC-ETH', 'l': 0.04, 'B': 0.039, 'A': 0.041},
+                                                    {'M': 'BTC-LTC', 'l': 0.01}]})
+        self.table.on_summary_delta({'N': 11, 'D': [{'M': 'BTC-ETH', 'l': 0.05}, {'M': 'BTC-XRP', 'l': 0.001}]})
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.markets, ['BTC-ETH', 'BTC-LTC', 'BTC-XRP'])
+        self.assertEqual(self.last('BTC-ETH'), 0.05)
+        self.assertTrue(math.isnan(self.table.row('BTC-LTC')['bid']))
+        self.assertEqual(self.table.nonce, 11)
+
+    def test_stale_delta_is_ignored(self):
+        self.table.on_summary_delta({'N': 11, 'D': [{'M': 'BTC-ETH', 'l': 0.05}]})
+        self.table.on_summary_delta({'N': 11, 'D': [{'M': 'BTC-ETH', 'l': 0.06}]})
+        self.table.on_summary_delta({'N': 10, 'D': [{'M': 'BTC-ETH', 'l': 0.07}]})
+        self.assertEqual(self.last('BTC-ETH'), 0.05)
+
+    def test_older_snapshot_keeps_newer_delta_rows(self):
+        self.table.invalidate()
+        self.table.on_summary_delta({'N': 11, 'D': [{'M': 'BTC-ETH', 'l': 0.05}]})
+        self.table.on_summary_state({'N': 10, 's': [{'M': 'BTC-ETH', 'l': 0.04}, {'M': 'BTC-LTC', 'l': 0.01}]})
+        self.assertEqual(self.last('BTC-ETH'), 0.05)
+        self.assertEqual(self.last('BTC-LTC'), 0.01)
+        self.assertEqual(self.table.nonce, 11)
+        self.assertFalse(self.table.stale)
+        self.table.on_summary_delta({'N': 12, 'D': [{'M': 'BTC-LTC', 'l': 0.02}]})
+        self.assertEqual(self.last('BTC-LTC'), 0.02)
+
+    def test_newer_snapshot_overwrites_rows(self):
+        self.table.on_summary_delta({'N': 11, 'D': [{'M': 'BTC-ETH', 'l': 0.05}]})
+        self.table.on_summary_state({'N': 12, 's': [{'M': 'BTC-ETH', 'l': 0.06}]})
+        self.assertEqual(self.last('BTC-ETH'), 0.06)
+        self.assertEqual(self.table.nonce, 12)
+
+    def test_lite_deltas_have_their_own_nonce(self):
+        self.table.on_summary_delta({'N': 50, 'D': [{'M': 'BTC-ETH', 'l': 0.05, 'H': 0.1}]})
+        self.table.on_summary_delta({'N': 3, 'D': [{'M': 'BTC-ETH', 'l': 0.06, 'm': 7.0}]}, lite=True)
+        row = self.table.row('BTC-ETH')
+        self.assertEqual((row['last'], row['base_volume'], row['high']), (0.06, 7.0, 0.1))
+
+    def test_invalidate_keeps_rows(self):
+        self.table.on_summary_delta({'N': 11, 'D': [{'M': 'BTC-ETH', 'l': 0.05}]})
+        self.table.invalidate()
+        self.assertTrue(self.table.stale)
+        self.assertEqual(self.last('BTC-ETH'), 0.05)
+        # The new connection restarts the nonce sequence.
+        self.table.on_summary_delta({'N': 1, 'D': [{'M': 'BTC-ETH', 'l': 0.06}]})
+        self.assertEqual(self.last('BTC-ETH'), 0.06)
+
+    def test_columns_grow(self):
+        rows = [{'M': 'M{}'.format(i), 'l': float(i), 'PD': 1.0} for i in range(40)]
+        self.table.on_summary_state({'N': 1, 's': rows})
+        self.assertEqual(list(self.table.column('last')), [float(i) for i in range(40)])
+        self.assertAlmostEqual(self.table.change()[2], 100.0)
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class NumpySummaryTableTest(SummaryTableTest):
+    use_numpy = True
+
+
+if __name__ == '__main__':
+    unittest.main()